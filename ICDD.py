@@ -1,11 +1,368 @@
-from rdflib import Graph, Literal
+from rdflib import Graph, Literal, URIRef, BNode
 import os
 import uuid
 import shutil
+import threading
+import re
+import zipfile
+import pathlib
+import struct
+import copy
+import hashlib
+import logging
+import time
+import marshal
+import asyncio
+import functools
+import mmap
+import collections
+
+
+# Instrumentation
+# Phases of create(), open(), save() and the linkset I/O are timed as spans and logged, with their counters, on
+# the 'ICDD' logger at DEBUG level. While that level is disabled _span() hands out a shared no-op span, so
+# nothing is measured or counted.
+logger = logging.getLogger('ICDD')
+_progress_callback = None
+
+def set_progress_callback(callback):
+    """Call `callback(phase, done, total)` as create(), open() and save() advance through payloads and linksets.
+    None removes it."""
+    global _progress_callback
+    _progress_callback = callback
+
+def _progress(phase: str, done: int, total: int):
+    if _progress_callback is not None: _progress_callback(phase, done, total)
+
+class _Span:
+    __slots__ = ('name', 'counters', 'start')
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.counters = {}
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def count(self, **counters):
+        for counter, value in counters.items(): self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        logger.debug('%s: %.3f s%s', self.name, elapsed, ''.join(f' {counter}={value}' for counter, value in self.counters.items()),
+                     extra = {'icdd_span': self.name, 'icdd_seconds': elapsed, 'icdd_counters': self.counters})
+        return False
+
+class _NoSpan:
+    __slots__ = ()
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+    def __bool__(self): return False
+    def count(self, **counters): pass
+
+_NO_SPAN = _NoSpan()
+
+def _span(name: str):
+    """A span timing one phase; false when disabled, so costly counters can be guarded with `if span:`."""
+    return _Span(name) if logger.isEnabledFor(logging.DEBUG) else _NO_SPAN
+
+
+# ICDD ontologies
+# The published Container.rdf and Linkset.rdf are read from a local cache directory, where fetch_ontologies()
+# stores them converted to N-Triples, or else downloaded from the ISO site (and stored in the cache directory, if
+# one is set), at most once per process and only when a container needs them. Without either, create() and
+# validate_container() raise a FileNotFoundError: no container is written or checked without them.
+ONTOLOGY_URLS = {
+    'Container': 'https://standards.iso.org/iso/21597/-1/ed-1/en/Container.rdf',
+    'Linkset': 'https://standards.iso.org/iso/21597/-1/ed-1/en/Linkset.rdf'
+}
+ONTOLOGY_TIMEOUT = 30   # seconds
+
+_ontology_cache_dir = os.environ.get('ICDD_ONTOLOGY_CACHE')
+_ontology_graphs = {}
+_ontology_turtle = {}
+_ontology_lock = threading.Lock()
+
+def set_ontology_cache_dir(path: str|None):
+    """Look up the published Container/Linkset ontologies in `path` (as .nt, .ttl or .rdf)."""
+    global _ontology_cache_dir, _validation_schema
+    with _ontology_lock:
+        _ontology_cache_dir = path
+        _ontology_graphs.clear()
+        _ontology_turtle.clear()
+        _validation_schema = None
+
+def _ontology_source(name: str):
+    """Path and rdflib format of the copy of an ontology in the cache directory, None if there is none."""
+    if not _ontology_cache_dir: return None
+    for ext, format in (('.nt', 'nt'), ('.ttl', 'turtle'), ('.rdf', 'xml')):
+        path = os.path.join(_ontology_cache_dir, name + ext)
+        if os.path.isfile(path): return path, format
+    return None
+
+def _download_ontology(name: str) -> Graph:
+    import urllib.request
+    url = ONTOLOGY_URLS[name]
+    with urllib.request.urlopen(url, timeout = ONTOLOGY_TIMEOUT) as response: data = response.read()
+    return Graph().parse(data = data, format = 'xml', publicID = url)
+
+def get_ontology(name: str) -> Graph:
+    """Process-wide shared graph of the published 'Container' or 'Linkset' ontology. Treat it as read-only.
+    Raises FileNotFoundError if it is neither in the cache directory nor downloadable."""
+    graph = _ontology_graphs.get(name)
+    if graph is None:
+        with _ontology_lock:
+            graph = _ontology_graphs.get(name)
+            if graph is None:
+                source = _ontology_source(name)
+                if source is not None: graph = Graph().parse(source[0], format = source[1])
+                else:
+                    try: graph = _download_ontology(name)
+                    except Exception as error:   # offline, or not the ontology
+                        raise FileNotFoundError(f"the published {name} ontology is not in the ontology cache directory and could not be "
+                                                f"downloaded from {ONTOLOGY_URLS[name]} ({error}): run fetch_ontologies() on a connected "
+                                                "machine and point set_ontology_cache_dir() or ICDD_ONTOLOGY_CACHE at it") from None
+                    if _ontology_cache_dir:
+                        os.makedirs(_ontology_cache_dir, exist_ok = True)
+                        graph.serialize(os.path.join(_ontology_cache_dir, name + '.nt'), format = 'nt', encoding = 'utf-8')
+                _ontology_graphs[name] = graph
+    return graph
+
+def get_ontology_turtle(name: str) -> bytes:
+    """Turtle serialization of an ontology, as written to "Ontology resources", computed once per process."""
+    data = _ontology_turtle.get(name)
+    if data is None:
+        data = get_ontology(name).serialize(format='ttl', encoding='utf-8')
+        _ontology_turtle[name] = data
+    return data
+
+def _ontology_resources() -> list:
+    """The (file name, Turtle) pairs create() writes to "Ontology resources"."""
+    return [(name + '.ttl', get_ontology_turtle(name)) for name in ONTOLOGY_URLS]
+
+def fetch_ontologies(path: str):
+    """Download Container.rdf/Linkset.rdf from the ISO site and store them, converted to N-Triples, in `path`."""
+    os.makedirs(path, exist_ok=True)
+    for name in ONTOLOGY_URLS:
+        _download_ontology(name).serialize(os.path.join(path, name + '.nt'), format='nt', encoding='utf-8')
+    if _ontology_cache_dir and os.path.abspath(path) == os.path.abspath(_ontology_cache_dir): set_ontology_cache_dir(path)
+
+class _Archive:
+    """A .icdd file read in place, shared by the documents of a lazily opened container."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._zip = None
+        self._lock = threading.Lock()
+
+    @property
+    def zip(self) -> zipfile.ZipFile:
+        if self._zip is None:
+            with self._lock:
+                if self._zip is None: self._zip = zipfile.ZipFile(self.path)
+        return self._zip
+
+    def open(self, member: str):
+        return self.zip.open(member)
+
+    def extract(self, member: str, path: str, chunk_size:int = 1 << 20):
+        """Extract a member, or every member below a folder member, to `path`."""
+        if member.endswith('/'):
+            for info in self.zip.infolist():
+                if info.filename.startswith(member) and not info.is_dir():
+                    self.extract(info.filename, os.path.join(path, info.filename[len(member):]), chunk_size)
+            os.makedirs(path, exist_ok=True)
+            return
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self.zip.open(member) as source, open(path + '.part', 'wb') as target:
+            shutil.copyfileobj(source, target, chunk_size)
+        os.replace(path + '.part', path)
+
+    def view(self, member: str) -> memoryview:
+        """Read-only memoryview over a stored (uncompressed) member, mapped straight from the archive file."""
+        info = self.zip.getinfo(member)
+        if info.compress_type != zipfile.ZIP_STORED or info.flag_bits & 0x1:
+            raise ValueError(f"{member} is compressed or encrypted in the archive, extract() it to map it")
+        with open(self.path, 'rb') as f: return _map_view(f, _member_data_offset(f, info), info.file_size)
+
+    def close(self):
+        if self._zip is not None: self._zip.close()
+        self._zip = None
+
+    # documents travel to worker processes with their archive, which reopens itself there on demand
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+
+def _member_data_offset(fp, info: zipfile.ZipInfo) -> int:
+    """Offset of a member's (compressed) data in the archive file, past its local header."""
+    fp.seek(info.header_offset)
+    header = fp.read(zipfile.sizeFileHeader)
+    if header[:4] != zipfile.stringFileHeader: raise zipfile.BadZipFile(f"bad local header for {info.filename}")
+    name_length, extra_length = struct.unpack('<HH', header[26:30])
+    return info.header_offset + zipfile.sizeFileHeader + name_length + extra_length
+
+def _map_view(file, offset:int = 0, length:int|None = None) -> memoryview:
+    """Read-only memoryview over `length` bytes of an open file from `offset`, memory-mapped. The mapping stays
+    valid, and open, for as long as the view or a slice of it is referenced; the file can be closed."""
+    if length is None: length = os.fstat(file.fileno()).st_size - offset
+    if length == 0: return memoryview(b'')
+    start = offset - offset % mmap.ALLOCATIONGRANULARITY
+    mapped = mmap.mmap(file.fileno(), length + offset - start, access = mmap.ACCESS_READ, offset = start)
+    return memoryview(mapped)[offset - start:]
+
+def _copy_member_raw(source: zipfile.ZipFile, target: zipfile.ZipFile, info: zipfile.ZipInfo, chunk_size:int = 1 << 20):
+    """Copy a member from one archive to another as stored, without decompressing and recompressing it."""
+    remaining = info.compress_size
+    source.fp.seek(_member_data_offset(source.fp, info))
+
+    member = copy.copy(info)
+    member.flag_bits &= ~0x08  # sizes and CRC are known: write them in the local header, without a data descriptor
+    # drop the zip64 extra field, FileHeader() adds a fresh one when needed
+    extra, stripped = member.extra, b''
+    while len(extra) >= 4:
+        field_id, field_length = struct.unpack('<HH', extra[:4])
+        if field_id != 0x0001: stripped += extra[:4 + field_length]
+        extra = extra[4 + field_length:]
+    member.extra = stripped
+
+    target.fp.seek(target.start_dir)
+    member.header_offset = target.fp.tell()
+    target.fp.write(member.FileHeader())
+    while remaining > 0:
+        data = source.fp.read(min(chunk_size, remaining))
+        if not data: raise zipfile.BadZipFile(f"truncated member {info.filename}")
+        target.fp.write(data)
+        remaining -= len(data)
+    target.filelist.append(member)
+    target.NameToInfo[member.filename] = member
+    target.start_dir = target.fp.tell()
+    target._didModify = True
+
+
+# Checksums of secured documents, cached by file path, size and modification time
+CHECKSUM_ALGORITHM = 'SHA-256'
+_checksum_cache = {}
+_checksum_lock = threading.Lock()
+
+def _hash_name(algorithm: str) -> str:
+    # checksumAlgorithm values such as 'SHA-256' or 'MD5' to hashlib names
+    return algorithm.replace('-', '').lower()
+
+def _checksum_key(path: str, algorithm: str):
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, _hash_name(algorithm))
+
+def _copy_hashing(source, target, algorithm: str, chunk_size:int = 1 << 20) -> str:
+    """Copy `source` to `target` (or just read it when None) in chunks, returning the hex digest of the bytes."""
+    hasher = hashlib.new(_hash_name(algorithm))
+    while chunk := source.read(chunk_size):
+        hasher.update(chunk)
+        if target is not None: target.write(chunk)
+    return hasher.hexdigest()
+
+def file_checksum(path: str, algorithm: str = CHECKSUM_ALGORITHM, chunk_size:int = 1 << 20) -> str:
+    """Hex digest of a file, read in chunks. Files that did not change since they were last hashed are not read."""
+    key = _checksum_key(path, algorithm)
+    with _checksum_lock: digest = _checksum_cache.get(key)
+    if digest is None:
+        with open(path, 'rb') as source: digest = _copy_hashing(source, None, algorithm, chunk_size)
+        with _checksum_lock: _checksum_cache[key] = digest
+    return digest
+
+def _in_archive(document) -> bool:
+    """True if the payload of a lazily opened container's document is only in its archive, not extracted."""
+    return document._archive is not None and not os.path.exists(document.path)
+
+def _payload_size(document) -> int:
+    if _in_archive(document): return document._archive.zip.getinfo(document._member).file_size
+    return os.path.getsize(document.path)
+
+def _copy_payload(document, target, chunk_size:int = 1 << 20):
+    """Copy a payload, from its file or from the archive it is still in, into an open binary stream; a secured
+    document gets its checksum from the same read."""
+    archived = _in_archive(document)
+    with document._archive.open(document._member) if archived else open(document.path, 'rb') as source:
+        if not isinstance(document, SecuredDocument):
+            shutil.copyfileobj(source, target, chunk_size)
+            return
+        if not document.checksum_algorithm: document.checksum_algorithm = CHECKSUM_ALGORITHM
+        # checksums are cached by file, not for archive members
+        key = None if archived else _checksum_key(document.path, document.checksum_algorithm)
+        with _checksum_lock: digest = _checksum_cache.get(key)
+        if digest is None:
+            digest = _copy_hashing(source, target, document.checksum_algorithm, chunk_size)
+            if key:
+                with _checksum_lock: _checksum_cache[key] = digest
+        else: shutil.copyfileobj(source, target, chunk_size)
+    document.checksum = digest
+
+FICLONE = 0x40049409    # Linux ioctl: share the extents of another file, copy-on-write
+
+def _stage_payload(document, path: str, hardlink:bool = False):
+    """Put a payload at `path` for a staged build without moving its bytes through Python where possible: a hard
+    link (if asked for), a reflink, or a kernel-side copy_file_range/sendfile copy. A secured document whose
+    checksum is not cached, or a payload still in the archive of a lazily opened container, is copied (and
+    hashed) in a single read instead."""
+    if os.path.lexists(path): os.remove(path)   # never write through an old hard link to a source file
+    if _in_archive(document):
+        with open(path, 'wb') as target: _copy_payload(document, target)
+        return
+    if isinstance(document, SecuredDocument):
+        algorithm = document.checksum_algorithm or CHECKSUM_ALGORITHM
+        with _checksum_lock: digest = _checksum_cache.get(_checksum_key(document.path, algorithm))
+        if digest is None:
+            with open(path, 'wb') as target: _copy_payload(document, target)
+            return
+        document.checksum_algorithm, document.checksum = algorithm, digest
+    if hardlink:
+        try:
+            os.link(document.path, path)
+            return
+        except OSError: pass
+    with open(document.path, 'rb') as source, open(path, 'wb') as target:
+        try:
+            import fcntl
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+            return
+        except (ImportError, OSError): pass
+        if hasattr(os, 'copy_file_range'):
+            try:
+                remaining = os.fstat(source.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(source.fileno(), target.fileno(), remaining)
+                    if copied == 0: break
+                    remaining -= copied
+                if remaining == 0: return
+            except OSError: pass
+    shutil.copyfile(document.path, path)
 
 
 # Documents 
 class Document:
+    # RDF property fragment -> attribute, shared by every instance; subclasses extend it
+    attr_frag_map = {
+        "address": "address",
+        "creationDate": "creation_date",
+        "conformanceIndicator": "conformance_indicator",
+        "description": "description",
+        "filetype" : "file_type",
+        "format": "format",
+        "modificationDate": "modification_date",
+        "name": "name",
+        "requested" : "requested",
+        "userID": "user_id",
+        "versionID": "version_id",
+        "versionDescription": "version_description",
+        "website": "website"
+    }
+    __slots__ = ('path', 'format', 'requested', 'file_type', 'id', '_archive', '_member', '_dirty', 'address', 'creation_date',
+                 'conformance_indicator', 'description', 'modification_date', 'name', 'user_id', 'version_id',
+                 'version_description', 'website')
 
     def __init__(self, path:str, format:str|None = None, requested:bool = False, id: uuid.UUID|str|None = None) -> None:
         self.path = path
@@ -15,99 +372,152 @@ class Document:
         if id: self.id =  id
         else: self.id = uuid.uuid4()
 
-        self.attr_frag_map = {
-            "address": "address",
-            "creationDate": "creation_date",
-            "conformanceIndicator": "conformance_indicator",
-            "description": "description",
-            "filetype" : "file_type",
-            "format": "format",
-            "modificationDate": "modification_date",
-            "name": "name",
-            "requested" : "requested",
-            "userID": "user_id",
-            "versionID": "version_id",
-            "versionDescription": "version_description",
-            "website": "website"
-        }
+        # set by Container.open(): the payload member in the .icdd file, and the archive itself when opened lazily
+        self._archive = None
+        self._member = None
+
+    def __setattr__(self, name, value):
+        # any public change makes the document dirty; a new path also detaches it from its archived payload
+        if name[0] != '_':
+            object.__setattr__(self, '_dirty', True)
+            if name == 'path': object.__setattr__(self, '_member', None)
+        object.__setattr__(self, name, value)
+
+    @property
+    def dirty(self) -> bool:
+        """True if the document was changed since Container.open()/save(), or was never saved."""
+        return self._dirty
+
+    def open_payload(self):
+        """Readable binary stream over the payload, straight from the archive while it is not extracted."""
+        if self._archive is not None and not os.path.exists(self.path):
+            return self._archive.open(self._member)
+        return open(self.path, 'rb')
+
+    def extract(self) -> str:
+        """Extract the payload to self.path, once, and return that path."""
+        if self._archive is not None and not os.path.exists(self.path):
+            self._archive.extract(self._member, self.path)
+        return self.path
+
+    def payload_view(self) -> memoryview:
+        """Read-only memoryview over the payload, memory-mapped instead of read: the file at self.path or, while
+        it is not extracted, the member in the archive, if it is stored uncompressed there."""
+        if self._archive is not None and not os.path.exists(self.path):
+            return self._archive.view(self._member)
+        with open(self.path, 'rb') as f: return _map_view(f)
 
 class FolderDocument(Document):
+    attr_frag_map = {**Document.attr_frag_map, 'foldername': 'folder_name'}
+    __slots__ = ('folder_name',)
 
     def __init__(self, path:str, folder_name: str, format:str|None = None, requested:bool = False, id: uuid.UUID|str|None = None) -> None:
         super().__init__(path=path, format = format, requested = requested, id = id)
         self.folder_name = folder_name
-        self.attr_frag_map['foldername'] = 'folder_name'
 
 class EncryptedDocument(Document):
+    attr_frag_map = {**Document.attr_frag_map, 'encryptionAlgorithm': 'encryption_algorithm'}
+    __slots__ = ('encryption_algorithm',)
 
     def __init__(self, path:str, encryption_algorithm: str, format:str|None = None, requested:bool = False, id: uuid.UUID|str|None = None ) -> None:
         super().__init__(path=path, format = format, requested = requested, id = id)
         self.encryption_algorithm = encryption_algorithm
-        self.attr_frag_map['encryptionAlgorithm'] = 'encryption_algorithm'
 
 class ExternalDocument(Document):
+    attr_frag_map = {**Document.attr_frag_map, 'url': 'url'}
+    __slots__ = ('url',)
 
     def __init__(self,   url: str, path:str ='/', format:str|None = None, requested:bool = False, id: uuid.UUID|str|None = None) -> None:
         super().__init__(path=path, format = format, requested = requested, id = id)
         self.url = url
         self.file_type = '.'+ self.url.split('.')[-1]
-        self.attr_frag_map['filetype'] = 'file_type'
-        self.attr_frag_map['url'] = 'url'
 
 class InternalDocument(Document):
+    attr_frag_map = {**Document.attr_frag_map, 'filename': 'file_name'}
+    __slots__ = ('file_name',)
 
     def __init__(self,  path:str, format:str|None = None, requested:bool = False, id: uuid.UUID|str|None = None) -> None:
         super().__init__(path=path, format = format, requested = requested, id = id)
         self.file_name = path.split('/')[-1].split('.')[0]
-        self.attr_frag_map['filename'] = 'file_name'
 
 class SecuredDocument(Document):
+    attr_frag_map = {**Document.attr_frag_map, 'checksum': 'checksum', 'checksumAlgorithm': 'checksum_algorithm'}
+    __slots__ = ('checksum', 'checksum_algorithm', '_verify')
 
     def __init__(self,  path:str, format:str|None = None, requested:bool = False, id: uuid.UUID|str|None = None) -> None:
         super().__init__(path=path, format = format, requested = requested, id = id)
         self.checksum = None
         self.checksum_algorithm =  None
-        self.attr_frag_map['checksum'] = 'checksum'
-        self.attr_frag_map['checksumAlgorithm'] = 'checksum_algorithm'
+        # set by Container.open(verify='lazy'): check the payload on first access
+        self._verify = False
+
+    def verify(self, chunk_size:int = 1 << 20) -> bool:
+        """True if the payload, extracted or still in the archive, matches self.checksum."""
+        if not self.checksum: raise ValueError(f"document {self.id} has no checksum")
+        algorithm = self.checksum_algorithm or CHECKSUM_ALGORITHM
+        if self._archive is not None and not os.path.exists(self.path):
+            with self._archive.open(self._member) as source: digest = _copy_hashing(source, None, algorithm, chunk_size)
+        else: digest = file_checksum(self.path, algorithm, chunk_size)
+        self._verify = False
+        return digest == self.checksum.lower()
+
+    def _check(self):
+        if self._verify and not self.verify(): raise ValueError(f"checksum mismatch for document {self.id}")
+
+    def open_payload(self):
+        self._check()
+        return super().open_payload()
+
+    def extract(self) -> str:
+        self._check()
+        return super().extract()
+
+    def payload_view(self) -> memoryview:
+        self._check()
+        return super().payload_view()
         
 
 #links, linksets, link elements and identifiers
 class Identifier:
+    attr_frag_map = {
+        "address": "address",
+        "name": "name",
+        "website": "website"
+    }
+    __slots__ = ('id', 'address', 'name', 'website')
 
-    def __init__(self) -> None:
-        self.id = uuid.uuid4()
-        self.attr_frag_map = {
-            "address": "address",
-            "name": "name",
-            "website": "website"
-        }
+    def __init__(self, id: uuid.UUID|str|None = None) -> None:
+        if not id: self.id = uuid.uuid4()
+        else: self.id  =  id
 
 class URIBasedIdentifier(Identifier):
+    attr_frag_map = {**Identifier.attr_frag_map, 'uri': 'uri'}
+    __slots__ = ('uri',)
 
-    def __init__(self, uri: str) -> None:
-        super().__init__()
+    def __init__(self, uri: str, id: uuid.UUID|str|None = None) -> None:
+        super().__init__(id = id)
         self.uri  =  uri
-        self.attr_frag_map['uri'] = 'uri'
 
 class StringBasedIdentifier(Identifier):
+    attr_frag_map = {**Identifier.attr_frag_map, 'identifier': 'identifier', 'identifierField': 'identifier_field'}
+    __slots__ = ('identifier', 'identifier_field')
 
-    def __init__(self, identifier: str, identifier_field: str|None = None) -> None:
-        super().__init__()
+    def __init__(self, identifier: str, identifier_field: str|None = None, id: uuid.UUID|str|None = None) -> None:
+        super().__init__(id = id)
         self.identifier = identifier
         self.identifier_field = identifier_field
-        self.attr_frag_map['identifier'] = 'identifier'
-        self.attr_frag_map['identifierField'] = 'identifier_field'
 
 class QueryBasedIdentifier(Identifier):
+    attr_frag_map = {**Identifier.attr_frag_map, 'queryLanguage': 'query_language', 'queryExpression': 'query_expression'}
+    __slots__ = ('query_language', 'query_expression')
 
-    def __init__(self, query_language : str, query_exression: str) -> None:
-        super().__init__()
+    def __init__(self, query_language : str, query_exression: str, id: uuid.UUID|str|None = None) -> None:
+        super().__init__(id = id)
         self.query_language = query_language
         self.query_expression = query_exression
-        self.attr_frag_map['queryLanguage'] = 'query_language'
-        self.attr_frag_map['queryExpression'] = 'query_expression'
 
 class LinkElement:
+    __slots__ = ('id', 'document', 'identifier')
 
     def __init__(self, document: Document|None, identifier: Identifier|None= None, id: uuid.UUID|str|None = None) -> None:
         if not id: self.id = uuid.uuid4()
@@ -116,7 +526,7 @@ class LinkElement:
         self.identifier = identifier
 
 class Link:
-    import uuid
+    __slots__ = ('id', 'a', 'b')
 
     def __init__(self, a:LinkElement, b:LinkElement, id: uuid.UUID|str|None = None) -> None:
         if not id: self.id = uuid.uuid4()
@@ -124,9 +534,899 @@ class Link:
         self.a = a
         self.b = b
 
+class _LinksetDecoder:
+    """Collects links, link elements and identifiers from linkset triples fed in any order, in one pass."""
+
+    RDF_TYPE = URIRef('http://www.w3.org/1999/02/22-rdf-syntax-ns#type')
+    IDENTIFIER_TYPES = {
+        "URIBasedIdentifier": lambda id: URIBasedIdentifier(uri = '', id = id),
+        "StringBasedIdentifier": lambda id: StringBasedIdentifier(identifier = '', id = id),
+        "QueryBasedIdentifier": lambda id: QueryBasedIdentifier(query_language = '', query_exression = '', id = id)
+    }
+
+    def __init__(self) -> None:
+        self.link_elements = {}         # link id -> link element ids
+        self.documents = {}             # link element id -> document id
+        self.identifiers = {}           # link element id -> identifier id
+        self.identifier_types = {}      # identifier id -> identifier class name
+        self.attributes = {}            # identifier id -> [(attribute fragment, value)]
+        self._fragments = {}
+        # set by links(): True if link elements or identifiers are shared between links (an interned linkset)
+        self.shared = False
+
+    def _fragment(self, uri) -> str:
+        fragment = self._fragments.get(uri)
+        if fragment is None:
+            fragment = self._fragments[uri] = uri.split('#')[-1] if '#' in uri else ''
+        return fragment
+
+    def add(self, s, p, o):
+        subject = s.split('/')[-1]
+        if p == self.RDF_TYPE:
+            fragment = self._fragment(o)
+            if fragment in self.IDENTIFIER_TYPES: self.identifier_types[subject] = fragment
+            return
+        fragment = self._fragment(p)
+        if fragment == 'hasLinkElement':
+            if subject not in self.link_elements: self.link_elements[subject] = []
+            self.link_elements[subject].append(o.split('/')[-1])
+        elif fragment == 'hasDocument':
+            self.documents[subject] = o.split('/')[-1]
+        elif fragment == 'hasIdentifier':
+            self.identifiers[subject] = o.split('/')[-1]
+        elif fragment:
+            if subject not in self.attributes: self.attributes[subject] = []
+            self.attributes[subject].append((fragment, getattr(o, 'value', o)))
+
+    def dump(self) -> tuple:
+        """The decoded linkset as plain containers, for marshal."""
+        attributes = {identifier_id: [(fragment, value if type(value) in (str, int, float, bool) else str(value)) for fragment, value in values]
+                      for identifier_id, values in self.attributes.items()}
+        return (self.link_elements, self.documents, self.identifiers, self.identifier_types, attributes)
+
+    @classmethod
+    def load(cls, state: tuple) -> '_LinksetDecoder':
+        decoder = cls()
+        decoder.link_elements, decoder.documents, decoder.identifiers, decoder.identifier_types, decoder.attributes = state
+        return decoder
+
+    def _identifier(self, identifier_id) -> Identifier|None:
+        if identifier_id not in self.identifier_types: return None
+        identifier = self.IDENTIFIER_TYPES[self.identifier_types[identifier_id]](identifier_id)
+        for fragment, value in self.attributes.get(identifier_id, ()):
+            if fragment in identifier.attr_frag_map:
+                identifier.__setattr__(identifier.attr_frag_map[fragment], value)
+        return identifier
+
+    def links(self, documents: dict|None = None) -> list:
+        """Build the Link objects. Link elements and identifiers shared between links are built once."""
+        if documents is None: documents = {}
+        identifiers = {}
+        link_elements = {}
+
+        def get_identifier(identifier_id):
+            identifier = identifiers.get(identifier_id)
+            if identifier is None and identifier_id in self.identifier_types:
+                identifier = identifiers[identifier_id] = self._identifier(identifier_id)
+            return identifier
+
+        def get_link_element(link_element_id):
+            link_element = link_elements.get(link_element_id)
+            if link_element is None:
+                identifier_id = self.identifiers.get(link_element_id)
+                link_element = LinkElement(
+                    id = link_element_id,
+                    document = documents.get(self.documents.get(link_element_id)),
+                    identifier = get_identifier(identifier_id) if identifier_id else None)
+                link_elements[link_element_id] = link_element
+            return link_element
+
+        links = []
+        for link_id, link_element_ids in self.link_elements.items():
+            if len(link_element_ids) < 2:
+                raise ValueError(f"link {link_id} has {len(link_element_ids)} link element(s), expected 2")
+            links.append(Link(id = link_id, a = get_link_element(link_element_ids[0]), b = get_link_element(link_element_ids[1])))
+        self.shared = len(link_elements) < 2 * len(links) or len(identifiers) < sum(1 for element in link_elements.values() if element.identifier)
+        return links
+
+class _TripleSink(Graph):
+    """Graph that hands every parsed triple to a callback instead of storing it."""
+
+    def __init__(self, callback) -> None:
+        super().__init__()
+        self._callback = callback
+
+    def add(self, triple):
+        self._callback(*triple)
+        return self
+
+# Disk-backed linksets
+# A Linkset created with `storage` keeps its links in a SQLite database, one row per link with both link
+# elements and their identifiers inline. Link objects are rebuilt from the rows on access, so memory use does not
+# grow with the number of links; lookup indexes are only created on the first lookup.
+_LINK_COLUMNS = ('id', 'a_id', 'a_document', 'a_identifier', 'a_kind', 'a_value', 'a_extra',
+                 'b_id', 'b_document', 'b_identifier', 'b_kind', 'b_value', 'b_extra')
+
+# identifier kind codes of the a_kind/b_kind columns, by code, identifier class, class name or short name
+_IDENTIFIER_KINDS = {
+    None: None, '': None,
+    1: 1, URIBasedIdentifier: 1, 'URIBasedIdentifier': 1, 'uri': 1,
+    2: 2, StringBasedIdentifier: 2, 'StringBasedIdentifier': 2, 'string': 2,
+    3: 3, QueryBasedIdentifier: 3, 'QueryBasedIdentifier': 3, 'query': 3,
+}
+
+def _element_values(link_element: LinkElement) -> tuple:
+    """(id, document id, identifier id, kind, value, extra) of a link element, as in _LINK_COLUMNS, with the ids
+    as they are."""
+    identifier = link_element.identifier
+    document = None if link_element.document is None else link_element.document.id
+    if identifier is None: return (link_element.id, document, None, None, None, None)
+    if isinstance(identifier, URIBasedIdentifier): kind, value, extra = 1, identifier.uri, None
+    elif isinstance(identifier, StringBasedIdentifier): kind, value, extra = 2, identifier.identifier, identifier.identifier_field
+    else: kind, value, extra = 3, identifier.query_expression, identifier.query_language
+    return (link_element.id, document, identifier.id, kind, value, extra)
+
+def _element_row(link_element: LinkElement) -> tuple:
+    element_id, document_id, identifier_id, kind, value, extra = _element_values(link_element)
+    return (str(element_id), None if document_id is None else str(document_id), None if identifier_id is None else str(identifier_id), kind, value, extra)
+
+def _link_from_row(row: tuple, document) -> Link:
+    """The Link of a row in _LINK_COLUMNS order; document(id) returns the Document of a document id."""
+    def element(link_element_id, document_id, identifier_id, kind, value, extra):
+        if kind == 1: identifier = URIBasedIdentifier(uri = value, id = identifier_id)
+        elif kind == 2: identifier = StringBasedIdentifier(identifier = value, identifier_field = extra, id = identifier_id)
+        elif kind == 3: identifier = QueryBasedIdentifier(query_language = extra, query_exression = value, id = identifier_id)
+        else: identifier = None
+        return LinkElement(document = document(document_id), identifier = identifier, id = link_element_id)
+    return Link(element(*row[1:7]), element(*row[7:13]), id = row[0])
+
+def _uuid4_strings(count: int) -> list:
+    """`count` random (version 4) UUIDs as strings, from a single os.urandom() call instead of one uuid4() each."""
+    data = bytearray(os.urandom(16 * count))
+    data[6::16] = bytes(byte & 0x0f | 0x40 for byte in data[6::16])
+    data[8::16] = bytes(byte & 0x3f | 0x80 for byte in data[8::16])
+    digits = data.hex()
+    return [f'{digits[i:i + 8]}-{digits[i + 8:i + 12]}-{digits[i + 12:i + 16]}-{digits[i + 16:i + 20]}-{digits[i + 20:i + 32]}'
+            for i in range(0, 32 * count, 32)]
+
+class _LinkColumns:
+    """Links added by Linkset.add_links(), kept as one list per column of _LINK_COLUMNS instead of Link objects.
+    Linkset.write() serializes the rows as they are; Link objects are only built by links()."""
+    __slots__ = ('columns', 'documents')
+
+    def __init__(self, columns: list, documents: dict) -> None:
+        self.columns = columns
+        # document id -> Document, for links(); unknown ids get a bare Document
+        self.documents = documents
+
+    def __len__(self) -> int:
+        return len(self.columns[0])
+
+    def rows(self):
+        return zip(*self.columns)
+
+    def _document(self, document_id):
+        if document_id is None: return None
+        document = self.documents.get(document_id)
+        if document is None: document = self.documents[document_id] = Document(path = '', id = document_id)
+        return document
+
+    def links(self) -> list:
+        return [_link_from_row(row, self._document) for row in self.rows()]
+
+class _SQLiteLinks:
+    """List-like view over the links of a disk-backed Linkset: append(), len(), iteration and indexing."""
+    BATCH = 10000
+
+    def __init__(self, path: str, documents: dict) -> None:
+        import sqlite3
+
+        self.path = path
+        # document id -> Document, to resolve the link elements read back; unknown ids get a bare Document
+        self.documents = documents
+        self._db = sqlite3.connect(path, check_same_thread = False)
+        self._db.execute('PRAGMA journal_mode = WAL')
+        self._db.execute('PRAGMA synchronous = NORMAL')
+        self._db.execute(f"CREATE TABLE IF NOT EXISTS links (rowid INTEGER PRIMARY KEY, {', '.join(_LINK_COLUMNS)})")
+        self._count = self._db.execute('SELECT COUNT(*) FROM links').fetchone()[0]
+        self._pending = []
+        self._indexed = False
+
+    def append(self, link: Link):
+        self._pending.append((str(link.id),) + _element_row(link.a) + _element_row(link.b))
+        if len(self._pending) >= self.BATCH: self.flush()
+
+    def extend(self, links):
+        for link in links: self.append(link)
+
+    def flush(self):
+        if self._pending:
+            self._db.executemany(f"INSERT INTO links ({', '.join(_LINK_COLUMNS)}) VALUES ({', '.join('?' * len(_LINK_COLUMNS))})", self._pending)
+            self._count += len(self._pending)
+            self._pending = []
+        self._db.commit()
+
+    def __len__(self) -> int:
+        return self._count + len(self._pending)
+
+    def _document(self, document_id):
+        if document_id is None: return None
+        document = self.documents.get(document_id)
+        if document is None: document = self.documents[document_id] = Document(path = '', id = document_id)
+        return document
+
+    def extend_rows(self, rows, count: int):
+        """Insert `count` rows in _LINK_COLUMNS order, without building Link objects."""
+        self.flush()
+        self._db.executemany(f"INSERT INTO links ({', '.join(_LINK_COLUMNS)}) VALUES ({', '.join('?' * len(_LINK_COLUMNS))})", rows)
+        self._count += count
+        self._db.commit()
+
+    def rows(self, where: str = '', parameters: tuple = ()):
+        """The link rows, in _LINK_COLUMNS order and insertion order."""
+        self.flush()
+        cursor = self._db.execute(f"SELECT {', '.join(_LINK_COLUMNS)} FROM links {where} ORDER BY rowid", parameters)
+        while rows := cursor.fetchmany(self.BATCH):
+            yield from rows
+
+    def _select(self, where: str = '', parameters: tuple = ()):
+        for row in self.rows(where, parameters): yield _link_from_row(row, self._document)
+
+    def __iter__(self):
+        return self._select()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice): return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0: index += len(self)
+        if not 0 <= index < len(self): raise IndexError('link index out of range')
+        # rows are only ever appended, so the rowid of the i-th link is i + 1
+        return next(self._select('WHERE rowid = ?', (index + 1,)))
+
+    def _ensure_indexes(self):
+        if not self._indexed:
+            for column in ('id', 'a_document', 'b_document', 'a_value', 'b_value'):
+                self._db.execute(f'CREATE INDEX IF NOT EXISTS links_{column} ON links ({column})')
+            self._indexed = True
+
+    def find(self, columns: tuple, value) -> list:
+        """Links whose value in any of `columns` is `value`."""
+        self.flush()
+        self._ensure_indexes()
+        return list(self._select('WHERE ' + ' OR '.join(f'{column} = ?' for column in columns), (value,) * len(columns)))
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+class _SQLiteDecoder:
+    """Linkset decoder for disk-backed linksets: the triples are staged in the linkset database and joined there
+    into link rows, so decoding does not hold the linkset in memory either."""
+    TABLES = {
+        'staging_elements': ('link', 'element'),
+        'staging_documents': ('element', 'document'),
+        'staging_identifiers': ('element', 'identifier'),
+        'staging_types': ('identifier', 'kind'),
+        'staging_attributes': ('identifier', 'fragment', 'value'),
+    }
+    KINDS = {'URIBasedIdentifier': 1, 'StringBasedIdentifier': 2, 'QueryBasedIdentifier': 3}
+
+    def __init__(self, links: _SQLiteLinks) -> None:
+        self.links = links
+        self._db = links._db
+        for table, columns in self.TABLES.items():
+            self._db.execute(f'DROP TABLE IF EXISTS {table}')
+            self._db.execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+        self._pending = {table: [] for table in self.TABLES}
+        self._fragments = {}
+        # set by finish(), as in _LinksetDecoder.links()
+        self.shared = False
+
+    def _fragment(self, uri) -> str:
+        fragment = self._fragments.get(uri)
+        if fragment is None:
+            fragment = self._fragments[uri] = uri.split('#')[-1] if '#' in uri else ''
+        return fragment
+
+    def _stage(self, table: str, row: tuple):
+        pending = self._pending[table]
+        pending.append(row)
+        if len(pending) >= _SQLiteLinks.BATCH: self._flush(table)
+
+    def _flush(self, table: str):
+        pending = self._pending[table]
+        if pending:
+            self._db.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' * len(self.TABLES[table]))})", pending)
+            pending.clear()
+
+    def add(self, s, p, o):
+        subject = s.split('/')[-1]
+        if p == _LinksetDecoder.RDF_TYPE:
+            kind = self.KINDS.get(self._fragment(o))
+            if kind: self._stage('staging_types', (subject, kind))
+            return
+        fragment = self._fragment(p)
+        if fragment == 'hasLinkElement': self._stage('staging_elements', (subject, o.split('/')[-1]))
+        elif fragment == 'hasDocument': self._stage('staging_documents', (subject, o.split('/')[-1]))
+        elif fragment == 'hasIdentifier': self._stage('staging_identifiers', (subject, o.split('/')[-1]))
+        elif fragment: self._stage('staging_attributes', (subject, fragment, str(o)))
+
+    def finish(self) -> int:
+        """Join the staged triples into link rows, in the order the links were read; returns the number of links."""
+        for table in self.TABLES: self._flush(table)
+        db = self._db
+        db.execute('CREATE INDEX staging_elements_link ON staging_elements (link)')
+        db.execute('CREATE INDEX staging_attributes_identifier ON staging_attributes (identifier)')
+        incomplete = db.execute('SELECT link, COUNT(*) FROM staging_elements GROUP BY link HAVING COUNT(*) < 2 LIMIT 1').fetchone()
+        if incomplete: raise ValueError(f"link {incomplete[0]} has {incomplete[1]} link element(s), expected 2")
+        self.shared = bool(db.execute('SELECT COUNT(DISTINCT element) < COUNT(*) FROM staging_elements').fetchone()[0]
+                           or db.execute('SELECT COUNT(DISTINCT identifier) < COUNT(*) FROM staging_identifiers').fetchone()[0])
+        db.execute('''CREATE TABLE staging_resolved AS
+            SELECT e.element AS element, d.document AS document, i.identifier AS identifier, t.kind AS kind,
+                   (SELECT value FROM staging_attributes WHERE identifier = i.identifier AND fragment IN ('uri', 'identifier', 'queryExpression')) AS value,
+                   (SELECT value FROM staging_attributes WHERE identifier = i.identifier AND fragment IN ('identifierField', 'queryLanguage')) AS extra
+            FROM (SELECT DISTINCT element FROM staging_elements) AS e
+            LEFT JOIN staging_documents AS d ON d.element = e.element
+            LEFT JOIN staging_identifiers AS i ON i.element = e.element
+            LEFT JOIN staging_types AS t ON t.identifier = i.identifier''')
+        db.execute('CREATE INDEX staging_resolved_element ON staging_resolved (element)')
+        links = self.links
+        links.flush()
+        count = db.execute(f'''INSERT INTO links ({', '.join(_LINK_COLUMNS)})
+            SELECT l.link, a.element, a.document, CASE WHEN a.kind THEN a.identifier END, a.kind, a.value, a.extra,
+                   b.element, b.document, CASE WHEN b.kind THEN b.identifier END, b.kind, b.value, b.extra
+            FROM (SELECT link, first, (SELECT MIN(rowid) FROM staging_elements AS n WHERE n.link = g.link AND n.rowid > g.first) AS second
+                  FROM (SELECT link, MIN(rowid) AS first FROM staging_elements GROUP BY link) AS g) AS l
+            JOIN staging_elements AS ea ON ea.rowid = l.first JOIN staging_resolved AS a ON a.element = ea.element
+            JOIN staging_elements AS eb ON eb.rowid = l.second JOIN staging_resolved AS b ON b.element = eb.element
+            ORDER BY l.first''').rowcount
+        for table in list(self.TABLES) + ['staging_resolved']: db.execute(f'DROP TABLE {table}')
+        links._count += count
+        links._indexed = False
+        db.commit()
+        return count
+
+_LITERAL_ESCAPES = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n', '\r': '\\r'})
+_IRI_SAFE = re.compile(r'^[^\x00-\x20<>"{}|^`\\]*$')
+_LOCAL_NAME = re.compile(r'^[A-Za-z0-9_][A-Za-z0-9_-]*$')
+
+def _escape_literal(value) -> str:
+    value = str(value)
+    if '\\' in value or '"' in value or '\n' in value or '\r' in value: return value.translate(_LITERAL_ESCAPES)
+    return value
+
+def _escape_iri(value) -> str:
+    value = str(value)
+    if _IRI_SAFE.match(value): return value
+    from urllib.parse import quote
+    return quote(value, safe="!#$%&'()*+,-./:;=?@[]~_")
+
+# RDF serializations of the index and the linksets: format -> (file extension, rdflib format name)
+RDF_FORMATS = {'nt': ('.nt', 'nt'), 'ttl': ('.ttl', 'turtle'), 'xml': ('.rdf', 'xml')}
+_RDF_FORMAT_NAMES = {'ntriples': 'nt', 'nt11': 'nt', 'turtle': 'ttl', 'rdf': 'xml', 'rdfxml': 'xml', 'pretty-xml': 'xml'}
+
+def _rdf_format(format: str) -> str:
+    name = _RDF_FORMAT_NAMES.get(format, format)
+    if name not in RDF_FORMATS: raise ValueError(f"unsupported RDF format {format}, expected one of {', '.join(RDF_FORMATS)}")
+    return name
+
+def _format_of(name: str, head = None) -> str:
+    """The RDF format of a file, from its extension or, failing that, from its first bytes as returned by `head()`."""
+    extension = os.path.splitext(name)[1].lower()
+    for format, (format_extension, _) in RDF_FORMATS.items():
+        if extension == format_extension: return format
+    if extension in ('.xml', '.owl'): return 'xml'
+    data = head() if head else b''
+    data = data.lstrip(b'\xef\xbb\xbf \t\r\n')
+    if data.startswith(b'<?xml') or data.startswith(b'<rdf:RDF'): return 'xml'
+    for line in data.decode('utf-8', 'replace').split('\n'):
+        line = line.strip()
+        if not line or line.startswith('#'): continue
+        triple = _TRIPLE_LINE.match(line)
+        # prefixed names, and the 'a' keyword, are Turtle
+        return 'nt' if triple and all(triple.group(i) is None for i in (3, 7, 8, 11, 16)) else 'ttl'
+    return 'ttl'
+
+def _linkset_members(linkset_id: str, filename: str|None) -> list:
+    """The archive members a linkset may be stored as: the file name the index gives it, then <id>.ttl/.nt/.rdf."""
+    candidates = [filename] if filename else []
+    return ['Payload triples/' + name for name in candidates + [linkset_id + extension for extension, _ in RDF_FORMATS.values()]]
+
+# Line-oriented fast path
+# N-Triples, and Turtle written one triple per line (as Linkset.write() does), are read with one regular
+# expression per line instead of rdflib's parsers. IRIs are handed over as plain strings, as written (the linkset
+# decoders only read their last segment), and literals as their value, except typed literals other than strings,
+# which stay rdflib Literals. Anything else in the file (a ';'
+# or ',' list, a multi-line string, a number without quotes...) raises _NotLineBased, and the caller parses the
+# whole file again with rdflib.
+_IRI_TERM = r'<([^<>"{}|^`\\\s]*)>'
+_NAME_TERM = r'([A-Za-z][\w-]*)?:([\w-]*(?:\.[\w-]+)*)'
+_TRIPLE_LINE = re.compile(
+    r'[ \t]*(?:' + _IRI_TERM + '|' + _NAME_TERM + r'|_:([\w-]+))'
+    r'[ \t]+(?:' + _IRI_TERM + '|' + _NAME_TERM + r'|(a))'
+    r'[ \t]+(?:' + _IRI_TERM + '|' + _NAME_TERM + r'|_:([\w-]+)'
+    r'|"((?:[^"\\\n]|\\.)*)"(?:\^\^(?:' + _IRI_TERM + '|' + _NAME_TERM + r')|@([A-Za-z]+(?:-[A-Za-z0-9]+)*))?)'
+    r'[ \t]*\.[ \t]*(?:#.*)?\r?$')
+_PREFIX_LINE = re.compile(r'\s*(?:@prefix\s+([A-Za-z][\w-]*)?:\s*<([^<>\s]*)>\s*\.|(?i:prefix)\s+([A-Za-z][\w-]*)?:\s*<([^<>\s]*)>)\s*$')
+_BASE_LINE = re.compile(r'\s*(?:@base\s+<[^<>\s]*>\s*\.|(?i:base)\s+<[^<>\s]*>)\s*$')
+_TERM = re.compile(_IRI_TERM + '|' + _NAME_TERM + r'|_:([\w-]+)')
+_STRING_ESCAPE = re.compile(r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|([tbnrf"\'\\]))')
+_STRING_ESCAPES = {'t': '\t', 'b': '\b', 'n': '\n', 'r': '\r', 'f': '\f', '"': '"', "'": "'", '\\': '\\'}
+_RDF_TYPE = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#type'
+_RDF_FIRST = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#first'
+_RDF_REST = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#rest'
+_PLAIN_DATATYPES = (None, 'http://www.w3.org/2001/XMLSchema#string', 'http://www.w3.org/2001/XMLSchema#anyURI')
+
+class _PlainLiteral(str):
+    """A plain (or xsd:string/anyURI) literal value, as handed to the callback of _read_lines(literal=_PlainLiteral)
+    to tell it from an IRI; by default both are plain strings."""
+    __slots__ = ()
+
+class _NotLineBased(Exception):
+    pass
+
+def _unescape(value: str) -> str:
+    unescaped = _STRING_ESCAPE.sub(lambda m: chr(int(m.group(1) or m.group(2), 16)) if m.group(3) is None else _STRING_ESCAPES[m.group(3)], value)
+    if '\\' in _STRING_ESCAPE.sub('', value): raise _NotLineBased(f"unsupported escape in {value!r}")
+    return unescaped
+
+def _read_lines(stream, callback, chunk_size: int = 1 << 20, literal = None):
+    """Feed each triple of an N-Triples or flat Turtle binary stream to callback(s, p, o), reading it in chunks.
+
+    Lines of the form `term term term .`, with single spaces and a plain or typed literal without quotes or
+    escapes, are split on spaces and only their terms are matched; any other line goes through _TRIPLE_LINE.
+    Plain literal values are passed as strings, like IRIs, or wrapped in `literal` if it is given.
+    """
+    for _ in _line_chunks(stream, callback, chunk_size, literal): pass
+
+def _line_chunks(stream, callback, chunk_size: int = 1 << 20, literal = None):
+    """_read_lines() as a generator that pauses after each chunk, so the caller can hand out what the callback
+    collected before reading on."""
+    prefixes = {}
+    predicates = {}
+    datatypes = {}
+    term = _TERM.fullmatch
+    match = _TRIPLE_LINE.match
+
+    def expand(prefix, name):
+        try: return prefixes[prefix or ''] + name
+        except KeyError: raise _NotLineBased(f"undefined prefix {prefix or ''}:") from None
+
+    def predicate_of(token):
+        m = term(token) if token != 'a' else None
+        if token == 'a': predicate = _RDF_TYPE
+        elif m is None or m.group(4) is not None: return None
+        else: predicate = m.group(1) if m.group(1) is not None else expand(m.group(2), m.group(3))
+        predicates[token] = URIRef(predicate)
+        return predicates[token]
+
+    def datatype_of(tail):
+        # the datatype IRI of a literal tail '^^<iri>' or '^^prefix:name', None if it is not a plain or string one
+        m = term(tail[2:]) if tail.startswith('^^') else None
+        datatype = None if m is None or m.group(4) is not None else m.group(1) if m.group(1) is not None else expand(m.group(2), m.group(3))
+        datatypes[tail] = datatype if datatype in _PLAIN_DATATYPES else None
+        return datatypes[tail]
+
+    def parse_line(line):
+        m = match(line)
+        if m is None:
+            stripped = line.strip()
+            if not stripped or stripped.startswith('#') or _BASE_LINE.match(stripped): return
+            prefix = _PREFIX_LINE.match(stripped)
+            if prefix is None: raise _NotLineBased(f"not a triple on a single line: {stripped[:200]}")
+            prefixes[prefix.group(1) or prefix.group(3) or ''] = prefix.group(2) if prefix.group(2) is not None else prefix.group(4)
+            # expansions made with the previous prefixes
+            predicates.clear()
+            datatypes.clear()
+            return
+        (s_iri, s_prefix, s_name, s_bnode, p_iri, p_prefix, p_name, p_a, o_iri, o_prefix, o_name, o_bnode,
+         value, datatype_iri, datatype_prefix, datatype_name, language) = m.groups()
+        s = s_iri if s_iri is not None else expand(s_prefix, s_name) if s_name is not None else s_bnode
+        p = p_iri if p_iri is not None else expand(p_prefix, p_name) if p_name is not None else _RDF_TYPE
+        if value is None:
+            o = o_iri if o_iri is not None else expand(o_prefix, o_name) if o_name is not None else o_bnode
+        else:
+            o = _unescape(value) if '\\' in value else value
+            datatype = datatype_iri if datatype_iri is not None else expand(datatype_prefix, datatype_name) if datatype_name is not None else None
+            if language or datatype not in _PLAIN_DATATYPES:
+                o = Literal(o, lang = language, datatype = URIRef(datatype) if datatype else None)
+            elif literal is not None: o = literal(o)
+        callback(s, URIRef(p), o)
+
+    rest = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if chunk:
+            data = rest + chunk
+            end = data.rfind(b'\n') + 1
+            rest = data[end:]
+            lines = data[:end].decode('utf-8').split('\n')
+        elif rest: lines, rest = [rest.decode('utf-8')], b''
+        else: break
+        for line in lines:
+            triple = line[:-2].split(' ', 2) if line[-2:] == ' .' else ()
+            if len(triple) == 3:
+                s, p, o = triple
+                m = term(s)
+                predicate = (predicates.get(p) or predicate_of(p)) if m is not None else None
+                if predicate is not None:
+                    iri, prefix, name, bnode = m.groups()
+                    s = iri if iri is not None else expand(prefix, name) if name is not None else bnode
+                    if o[:1] == '"':
+                        end = o.rfind('"')
+                        value = o[1:end]
+                        if end > 0 and '"' not in value and '\\' not in value:
+                            tail = o[end + 1:]
+                            if not tail or (datatypes[tail] if tail in datatypes else datatype_of(tail)):
+                                callback(s, predicate, value if literal is None else literal(value))
+                                continue
+                    else:
+                        m = term(o)
+                        if m is not None:
+                            iri, prefix, name, bnode = m.groups()
+                            callback(s, predicate, iri if iri is not None else expand(prefix, name) if name is not None else bnode)
+                            continue
+            parse_line(line)
+        yield
+
+def _read_rdf(source, format: str|None, publicID: str|None, new_decoder, literal = None):
+    """Feed the triples of a file path or binary stream to a decoder made by new_decoder(), and return it.
+
+    N-Triples and Turtle go through the line-oriented fast path first, see _read_lines() for `literal`. A Turtle
+    file that is not flat is parsed again from the start by rdflib, with a new decoder; streams must be
+    seekable for that.
+    """
+    is_path = isinstance(source, (str, os.PathLike))
+    if format is None: format = _format_of(str(source)) if is_path else 'ttl'
+    format = _rdf_format(format)
+    if format in ('nt', 'ttl'):
+        decoder = new_decoder()
+        try:
+            if is_path:
+                with open(source, 'rb') as stream: _read_lines(stream, decoder.add, literal = literal)
+            else: _read_lines(source, decoder.add, literal = literal)
+            return decoder
+        except _NotLineBased as error:
+            logger.debug('%s: %s, parsing it with rdflib', source, error)
+            if not is_path: source.seek(0)
+    decoder = new_decoder()
+    _TripleSink(decoder.add).parse(source, format = RDF_FORMATS[format][1], publicID = publicID)
+    return decoder
+
+def _nt_lines(graph: Graph, base: str = 'file:///'):
+    """Yield the triples of a graph as N-Triples, with its relative IRIs (such as the './' of the index) made
+    absolute against `base`, which rdflib's serializer would leave relative."""
+    def term(node):
+        if isinstance(node, URIRef):
+            iri = str(node)
+            if ':' not in iri.split('/')[0]: iri = base + (iri[2:] if iri.startswith('./') else iri)
+            return '<' + _escape_iri(iri) + '>'
+        if isinstance(node, Literal):
+            # Literal.n3() writes a multi-line value in Turtle's long quotes, which N-Triples does not have
+            if node.language: return '"' + _escape_literal(node) + '"@' + node.language
+            if node.datatype: return '"' + _escape_literal(node) + '"^^<' + _escape_iri(node.datatype) + '>'
+            return '"' + _escape_literal(node) + '"'
+        return node.n3()
+    for s, p, o in graph:
+        yield term(s) + ' ' + term(p) + ' ' + term(o) + ' .\n'
+
+def _write_linkset(linkset_id, links: list|None, path: str, format: str = 'ttl', storage: str|None = None, columns: list|None = None,
+                   intern: bool = False):
+    """Serialize links and the _LinkColumns blocks `columns`, or the disk-backed linkset at `storage`, to `path`,
+    writing shared link elements and identifiers once if the linkset is interned. Runs in the worker processes
+    of Container.create(workers=...)."""
+    linkset = Linkset(id = linkset_id, storage = storage, intern = intern)
+    if storage is None: linkset._links, linkset._columns = links, columns or []
+    linkset.write(path, format = format)
+    linkset.close()
+
+def _submit_linkset(pool, linkset, path: str, format: str = 'ttl'):
+    # disk-backed linksets are read from their database by the worker, instead of being pickled
+    if linkset.storage:
+        linkset.links.flush()
+        return pool.submit(_write_linkset, linkset.id, None, path, format, storage = linkset.storage, intern = linkset.intern)
+    return pool.submit(_write_linkset, linkset.id, linkset._links, path, format, columns = linkset._columns, intern = linkset.intern)
+
+def _decode_linkset(source, format: str|None = None, publicID: str|None = None) -> _LinksetDecoder:
+    with _span('linkset.parse'):
+        decoder = _read_rdf(source, format, publicID, _LinksetDecoder)
+    decoder._fragments = {}
+    return decoder
+
+def _parse_linkset(source: str, format: str|None = None, archive_path: str|None = None, publicID: str|None = None) -> _LinksetDecoder:
+    """Decode a linkset file, or a member of the archive at `archive_path`. Runs in the worker processes of
+    Container.open(workers=...); the decoder is sent back and its links are resolved against the documents there."""
+    if archive_path is None: return _decode_linkset(source, format, publicID)
+    with zipfile.ZipFile(archive_path) as archive, archive.open(source) as member:
+        return _decode_linkset(member, format or _format_of(source), publicID)
+
+
+# Streaming link reader
+# Container.iter_links() hands out the links of a linkset while it is read. A link is final once `window` more
+# links have started after it: Linkset.write() puts all triples of a link, its link elements and their identifiers
+# before the next link, so only the document table and a few links are held. Link elements and identifiers are
+# dropped with their link, unless the linkset refers back to one (an interned linkset): it is then read again from
+# the start keeping them, skipping the links it already handed out. A linkset in any other order is held until
+# its end, as Container.open() would hold it; one that describes a link after it was handed out is an error.
+class _Restart(Exception):
+    pass
+
+class _LinkStream(_LinksetDecoder):
+    """Assembles links from linkset triples in file order, see Container.iter_links()."""
+
+    def __init__(self, documents: dict, window: int = 64, keep: bool = False, skip: int = 0) -> None:
+        super().__init__()
+        self._documents_by_id = documents
+        self.window = window
+        self.keep = keep            # keep the link elements and identifiers of final links
+        self.skip = skip            # final links not to hand out again, yielded by a previous read
+        self.buffer = False         # the triples are not grouped by link: nothing is final before the end
+        self.group = None           # the link being read
+        self.closed = collections.deque()
+        self.seen = set()           # link elements and identifiers with triples of their own
+        self.referenced = {}        # link element or identifier id -> number of pending links or link elements using it
+        self.finished = set()       # ids of final links and of their link elements and identifiers
+        self.ready = []
+        self.final = 0
+        self.yielded = 0
+
+    def _disorder(self):
+        # a triple, or a reference, the link order does not explain
+        if self.final and not self.keep: raise _Restart()
+        self.buffer = True
+
+    def _node(self, subject):
+        if subject in self.finished: raise ValueError(f"{subject} is described after the link using it was handed out, read the linkset with Container.open()")
+        if subject not in self.referenced: self._disorder()
+        self.seen.add(subject)
+
+    def _reference(self, node):
+        self.referenced[node] = self.referenced.get(node, 0) + 1
+
+    def _release(self, node):
+        count = self.referenced.pop(node, 1) - 1
+        if count: self.referenced[node] = count
+        elif node in self.identifiers: self._release(self.identifiers[node])
+
+    def _link(self, subject):
+        if subject == self.group or subject in self.link_elements: return
+        if subject in self.finished: raise ValueError(f"link {subject} is described after it was handed out, read the linkset with Container.open()")
+        if self.group is not None: self.closed.append(self.group)
+        self.group = subject
+        self.link_elements[subject] = []
+        while len(self.closed) > self.window and not self.buffer:
+            link_id = self.closed[0]
+            element_ids = self.link_elements[link_id]
+            if len(element_ids) < 2 or any(element_id not in self.seen or self.identifiers.get(element_id, element_id) not in self.seen
+                                           for element_id in element_ids[:2]):
+                self._disorder()
+                break
+            self.closed.popleft()
+            self._finish_link(link_id)
+
+    def _finish_link(self, link_id):
+        element_ids = self.link_elements.pop(link_id)
+        if len(element_ids) < 2: raise ValueError(f"link {link_id} has {len(element_ids)} link element(s), expected 2")
+        self.finished.add(link_id)
+        for element_id in element_ids:
+            self._release(element_id)
+            self.finished.add(element_id)
+            if element_id in self.identifiers: self.finished.add(self.identifiers[element_id])
+        self.final += 1
+        if self.final > self.skip: self.ready.append((link_id, element_ids))
+
+    def add(self, s, p, o):
+        subject = s.split('/')[-1]
+        if p == self.RDF_TYPE:
+            fragment = self._fragment(o)
+            if fragment.endswith('Link'): self._link(subject)
+            elif subject not in self.link_elements:
+                self._node(subject)
+                if fragment in self.IDENTIFIER_TYPES: self.identifier_types[subject] = fragment
+            return
+        fragment = self._fragment(p)
+        if fragment == 'hasLinkElement':
+            self._link(subject)
+            element_id = o.split('/')[-1]
+            self.link_elements[subject].append(element_id)
+            self._reference(element_id)
+        elif subject in self.link_elements: pass
+        elif fragment == 'hasDocument':
+            self._node(subject)
+            self.documents[subject] = o.split('/')[-1]
+        elif fragment == 'hasIdentifier':
+            self._node(subject)
+            self.identifiers[subject] = o.split('/')[-1]
+            self._reference(self.identifiers[subject])
+        elif fragment:
+            self._node(subject)
+            if subject not in self.attributes: self.attributes[subject] = []
+            self.attributes[subject].append((fragment, getattr(o, 'value', o)))
+
+    def finish(self):
+        """The end of the linkset: every pending link is final."""
+        for link_id in list(self.link_elements): self._finish_link(link_id)
+
+    def take(self):
+        """Yield the final links not handed out yet, then drop what only they used, unless self.keep."""
+        ready, self.ready = self.ready, []
+        for link_id, element_ids in ready:
+            elements = [LinkElement(id = element_id, document = self._documents_by_id.get(self.documents.get(element_id)),
+                                    identifier = self._identifier(self.identifiers.get(element_id)))
+                        for element_id in element_ids[:2]]
+            self.yielded += 1
+            yield Link(elements[0], elements[1], id = link_id)
+        if self.keep: return
+        # link elements and identifiers may be shared by the links of a batch, so they go once it is handed out
+        for link_id, element_ids in ready:
+            self.finished.discard(link_id)
+            for element_id in element_ids:
+                if element_id in self.referenced: continue
+                identifier_id = self.identifiers.pop(element_id, None)
+                self.documents.pop(element_id, None)
+                self.seen.discard(element_id)
+                self.finished.discard(element_id)
+                if identifier_id is None or identifier_id in self.referenced: continue
+                self.identifier_types.pop(identifier_id, None)
+                self.attributes.pop(identifier_id, None)
+                self.seen.discard(identifier_id)
+                self.finished.discard(identifier_id)
+
+def _stream_links(archive: zipfile.ZipFile, member: str, documents: dict, window: int = 64):
+    """Yield the links of a linkset member of an open archive as they are read, see Container.iter_links()."""
+    def head():
+        with archive.open(member) as stream: return stream.read(4096)
+    format = _format_of(member, head)
+    line_based = format in ('nt', 'ttl')
+    # rdflib parses the whole file before anything is handed out, so it may as well keep everything
+    keep, skip = not line_based, 0
+    while True:
+        links = _LinkStream(documents, window, keep, skip)
+        try:
+            with archive.open(member) as source:
+                if line_based:
+                    for _ in _line_chunks(source, links.add): yield from links.take()
+                else: _TripleSink(links.add).parse(source, format = RDF_FORMATS[format][1], publicID = 'file:///' + member.replace(' ', '%20'))
+            links.finish()
+            yield from links.take()
+            return
+        except _Restart:
+            logger.debug('%s refers back to link elements of earlier links, reading it again keeping them', member)
+        except _NotLineBased as error:
+            logger.debug('%s: %s, parsing it with rdflib', member, error)
+            line_based = False
+        keep, skip = True, links.yielded
+
+
+# Parsed linkset cache
+# Container.open() keeps the decoded linksets and index triples of the archives it reads in a directory, one
+# marshal file per zip member, keyed by the CRC-32 and size recorded for it in the zip directory. A changed
+# member gets a new key; entries are checked against their key when read and the least recently used ones are
+# evicted past the size limit. Disabled unless a directory is set.
+LINKSET_CACHE_VERSION = 1
+_linkset_cache_dir = os.environ.get('ICDD_LINKSET_CACHE')
+_linkset_cache_size = 1 << 30
+
+def set_linkset_cache(path: str|None, max_bytes:int = 1 << 30):
+    """Cache parsed linksets in `path`, keeping at most about `max_bytes` there. None disables the cache."""
+    global _linkset_cache_dir, _linkset_cache_size
+    _linkset_cache_dir, _linkset_cache_size = path, max_bytes
+    if path and os.path.isdir(path): _cache_evict()
+
+def _cache_key(kind: str, info: zipfile.ZipInfo) -> tuple:
+    return (LINKSET_CACHE_VERSION, kind, info.CRC, info.file_size)
+
+def _cache_path(key: tuple) -> str:
+    version, kind, crc, size = key
+    return os.path.join(_linkset_cache_dir, f'{kind}-{crc:08x}-{size}.v{version}')
+
+def _cache_load(kind: str, info: zipfile.ZipInfo|None):
+    """The cached value of a member, or None."""
+    if not _linkset_cache_dir or info is None: return None
+    key = _cache_key(kind, info)
+    path = _cache_path(key)
+    try:
+        with open(path, 'rb') as f: entry = marshal.load(f)
+    except FileNotFoundError: return None
+    except (EOFError, ValueError, TypeError, OSError): entry = None
+    if type(entry) is not tuple or len(entry) != 2 or entry[0] != key:
+        # unreadable, truncated or from another version: drop it
+        try: os.remove(path)
+        except OSError: pass
+        return None
+    try: os.utime(path)     # mtime orders the entries for eviction
+    except OSError: pass
+    return entry[1]
+
+def _cache_store(kind: str, info: zipfile.ZipInfo|None, value):
+    if not _linkset_cache_dir or info is None: return
+    key = _cache_key(kind, info)
+    path = _cache_path(key)
+    partial_path = f'{path}.{os.getpid()}.{threading.get_ident()}.part'
+    try:
+        os.makedirs(_linkset_cache_dir, exist_ok = True)
+        with open(partial_path, 'wb') as f: marshal.dump((key, value), f)
+        os.replace(partial_path, path)
+    except OSError as error:
+        logger.warning("could not write the linkset cache: %s", error)
+        if os.path.exists(partial_path): os.remove(partial_path)
+        return
+    _cache_evict()
+
+def _cache_evict():
+    """Remove the least recently used entries until the cache fits its size limit."""
+    entries = []
+    with os.scandir(_linkset_cache_dir) as scan:
+        for entry in scan:
+            if entry.name.endswith('.part'): continue
+            try: stat = entry.stat()
+            except FileNotFoundError: continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for mtime, size, path in entries)
+    for mtime, size, path in sorted(entries):
+        if total <= _linkset_cache_size: break
+        try: os.remove(path)
+        except FileNotFoundError: pass
+        total -= size
+
+def _dump_triples(triples, base: str) -> list:
+    """Index triples as marshal-friendly tuples, with IRIs below `base` kept relative to it."""
+    rows = []
+    for triple in triples:
+        row = []
+        for term in triple:
+            if isinstance(term, Literal): row.append((2, str(term), term.datatype and str(term.datatype), term.language))
+            elif isinstance(term, BNode): row.append((1, str(term)))
+            elif term.startswith(base): row.append((3, term[len(base):]))
+            else: row.append((0, str(term)))
+        rows.append(tuple(row))
+    return rows
+
+def _load_triples(rows: list, base: str) -> list:
+    terms = {}
+    def term(value):
+        node = terms.get(value)
+        if node is None:
+            kind = value[0]
+            if kind == 3: node = URIRef(base + value[1])
+            elif kind == 0: node = URIRef(value[1])
+            elif kind == 1: node = BNode(value[1])
+            else: node = Literal(value[1], datatype = value[2] and URIRef(value[2]), lang = value[3])
+            terms[value] = node
+        return node
+    return [(term(s), term(p), term(o)) for s, p, o in rows]
+
+def _process_pool(workers: int|None, jobs: int, initializer = None):
+    """A process pool for `jobs` independent tasks, or None when they should just run here."""
+    if not workers or workers < 2 or jobs < 2: return None
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers = min(workers, jobs), initializer = initializer)
+
+class _TrackedList(list):
+    """A list that counts the calls that change it in `changes`, so that its owner can tell when it was changed
+    in place and its lookup indexes or clean state no longer hold."""
+    changes = 0
+
+def _tracked(method):
+    def change(self, *args, **kwargs):
+        self.changes += 1
+        return method(self, *args, **kwargs)
+    change.__name__ = method.__name__
+    return change
+
+for _method in ('append', 'extend', 'insert', 'pop', 'remove', 'clear', 'sort', 'reverse', '__setitem__', '__delitem__', '__iadd__', '__imul__'):
+    setattr(_TrackedList, _method, _tracked(getattr(list, _method)))
+del _method
+
 class Linkset:
 
-    def __init__(self, id: uuid.UUID|str|None = None) -> None:
+    def __init__(self, id: uuid.UUID|str|None = None, storage: str|None = None, documents: dict|None = None,
+                 rdf_format: str|None = None, intern: bool = False) -> None:
+        """With `storage`, the path of a SQLite database, the links are kept on disk instead of in a list, see
+        _SQLiteLinks; an existing database is reopened. `documents` maps document ids to the Document objects
+        the link elements read back from it should point to. `rdf_format` (one of RDF_FORMATS) is the format
+        of the linkset file in a container, by default the container's.
+        With `intern=True`, identical identifiers (same kind and values) and link elements (same document and
+        identifier) are kept once and shared by the links that use them, and written once."""
 
         from rdflib import Graph, URIRef, Namespace, Literal
         import os
@@ -134,8 +1434,26 @@ class Linkset:
         import datetime
 
 
-        self.links =  []
+        self.storage = storage
+        self.rdf_format = rdf_format
+        self.intern = intern
+        # interned identifier (kind, value, extra) and link element (document id, identifier id) -> id, and
+        # id -> shared object (not kept for disk-backed linksets); built on the first add while interning
+        self._intern_ids = None
+        self._intern_objects = None
+        self._links = _SQLiteLinks(storage, {} if documents is None else dict(documents)) if storage else _TrackedList()
+        # blocks of links added by add_links() and not built as Link objects yet, see _LinkColumns
+        self._columns = []
         self.linkset = Graph()
+        # document id -> links and identifier value -> links, built on first lookup and then kept up to date by
+        # add_link(); `_indexed` is the `changes` count of the links they were built for
+        self._links_by_document = None
+        self._links_by_identifier = None
+        self._indexed = 0
+        # calls to add_link(), add_links() and the links setter, see _state()
+        self._changes = 0
+        # _state() when last read or saved by a Container, None if it never was
+        self._clean = None
         if id: self.id =  id
         else: self.id = uuid.uuid4()
         self.linkset_url =  URIRef("./")
@@ -167,62 +1485,891 @@ class Linkset:
         self.linkset.bind('rdf', self.RDF)
         self.linkset.bind('rdfs', self.RDFS)
 
+    @property
+    def links(self):
+        """The links, as a list (a list-like view over the database of a disk-backed linkset). Links added by
+        add_links() are built as Link objects here, on first access."""
+        if self._columns:
+            columns, self._columns = self._columns, []
+            for block in columns:
+                links = block.links()
+                if self.intern and self._intern_ids is not None:
+                    for link in links: self._intern_link(link)
+                # the links were already there, as columns: not a change
+                if self.storage: self._links.extend(links)
+                else: list.extend(self._links, links)
+            self._links_by_document = self._links_by_identifier = None
+        return self._links
+
+    @links.setter
+    def links(self, links):
+        self._links = links if self.storage or isinstance(links, _TrackedList) else _TrackedList(links)
+        self._columns = []
+        self._changes += 1
+        self._links_by_document = self._links_by_identifier = None
+
+    def _link_count(self) -> int:
+        return len(self._links) + sum(len(block) for block in self._columns)
+
+    def _rows(self):
+        """The links as rows in _LINK_COLUMNS order (ids not converted to str), without building Link objects
+        for the ones added by add_links() or stored on disk."""
+        if self.storage: yield from self._links.rows()
+        else:
+            for link in self._links: yield (link.id,) + _element_values(link.a) + _element_values(link.b)
+        for block in self._columns: yield from block.rows()
+
+    def _ensure_interned(self):
+        """Build the interning tables from the links added so far, sharing their identical link elements."""
+        if self._intern_ids is not None: return
+        self._intern_ids = {}
+        if self.storage:
+            for row in self._links.rows(): self._register_row(row)
+            return
+        self._intern_objects = {}
+        for link in self._links: self._intern_link(link)
+        for block in self._columns:
+            for row in block.rows(): self._register_row(row)
+
+    def _register_row(self, row: tuple):
+        ids = self._intern_ids
+        for element_id, document_id, identifier_id, kind, value, extra in (row[1:7], row[7:13]):
+            if kind: ids.setdefault((kind, value, None if kind == 1 else extra), identifier_id)
+            ids.setdefault((document_id, identifier_id), element_id)
+
+    def _intern_element(self, link_element: LinkElement) -> LinkElement:
+        """The shared link element with the same document and identifier as `link_element`, which becomes it
+        (and gets the shared id) if there is none yet."""
+        element_id, document_id, identifier_id, kind, value, extra = _element_values(link_element)
+        ids, objects = self._intern_ids, self._intern_objects
+        identifier = link_element.identifier
+        if kind:
+            identifier_id = ids.setdefault((kind, value, extra), str(identifier_id))
+            if objects is not None: identifier = objects.setdefault(identifier_id, identifier)
+            if str(identifier.id) != identifier_id: identifier.id = identifier_id
+        element_id = ids.setdefault((None if document_id is None else str(document_id), identifier_id), str(element_id))
+        if objects is not None: link_element = objects.setdefault(element_id, link_element)
+        if link_element.identifier is not identifier: link_element.identifier = identifier
+        if str(link_element.id) != element_id: link_element.id = element_id
+        return link_element
+
+    def _intern_link(self, link: Link):
+        link.a = self._intern_element(link.a)
+        link.b = self._intern_element(link.b)
+
     def add_link(self, link:Link):
-        self.links.append(link)
+        if self.intern:
+            self._ensure_interned()
+            self._intern_link(link)
+        links = self.links
+        self._changes += 1
+        if self.storage:
+            links.append(link)
+            # keep the documents, so that the links read back from disk point to them
+            for link_element in (link.a, link.b):
+                if link_element.document is not None: links.documents.setdefault(str(link_element.document.id), link_element.document)
+            return
+        # an index that was up to date stays so
+        indexed = self._links_by_document is not None and self._indexed == links.changes
+        links.append(link)
+        if indexed:
+            self._index_link(link)
+            self._indexed = links.changes
+
+    def add_links(self, a_documents, b_documents, a_kinds = None, a_values = None, b_kinds = None, b_values = None,
+                  a_extras = None, b_extras = None, documents: dict|None = None) -> list:
+        """Add links from columns: parallel sequences (or NumPy arrays) with one item per link. Returns their ids.
+
+        `a_documents`/`b_documents` hold the Document (or document id) of each side. `a_kinds`/`b_kinds` hold
+        identifier kinds, as identifier classes, class names, 'uri', 'string' or 'query', or None for a link
+        element on the whole document; a single kind applies to every link. `a_values`/`b_values` hold the URIs,
+        string identifiers or query expressions, and `a_extras`/`b_extras` the identifier fields or query
+        languages (one value or one per link). `documents` maps document ids to the Documents the links should
+        point to once built. The ids of the links, link elements and identifiers are generated in one batch,
+        and no Link object is built until `links` is read or the linkset is looked up: write() serializes the
+        columns directly, and a disk-backed linkset inserts them as rows.
+        """
+        count = len(a_documents)
+        known = {} if documents is None else {str(document_id): document for document_id, document in documents.items()}
+
+        def column(values, name):
+            if values is None or isinstance(values, (str, type, int)): return [values] * count
+            values = values.tolist() if hasattr(values, 'tolist') else list(values)
+            if len(values) != count: raise ValueError(f"{name} has {len(values)} items, expected {count}")
+            return values
+
+        resolved = {}
+        def document_id(document):
+            # the id of a Document or id, each distinct one converted once
+            document_id = resolved.get(document)
+            if document_id is None and document is not None:
+                if isinstance(document, Document):
+                    document_id = str(document.id)
+                    known.setdefault(document_id, document)
+                else: document_id = str(document)
+                resolved[document] = document_id
+            return document_id
+
+        def kinds(values, name):
+            try: return [_IDENTIFIER_KINDS[kind] for kind in column(values, name)]
+            except (KeyError, TypeError) as error: raise ValueError(f"unknown identifier kind {error} in {name}") from None
+
+        sides = []
+        for side, side_documents, side_kinds, side_values, side_extras in (('a', a_documents, a_kinds, a_values, a_extras),
+                                                                           ('b', b_documents, b_kinds, b_values, b_extras)):
+            side_kinds = kinds(side_kinds, side + '_kinds')
+            sides.append(([document_id(document) for document in column(side_documents, side + '_documents')], side_kinds,
+                          column(side_values, side + '_values'), column(side_extras, side + '_extras')))
+
+        identifiers = sum(kind is not None for side in sides for kind in side[1])
+        ids = iter(_uuid4_strings(3 * count + identifiers))
+        link_ids = [next(ids) for _ in range(count)]
+        columns = [link_ids]
+        if self.intern:
+            self._ensure_interned()
+            interned = self._intern_ids
+        for side_documents, side_kinds, side_values, side_extras in sides:
+            if not self.intern:
+                columns += [[next(ids) for _ in range(count)], side_documents,
+                            [None if kind is None else next(ids) for kind in side_kinds], side_kinds, side_values, side_extras]
+                continue
+            # identical identifiers and link elements get the id they already have
+            element_ids, identifier_ids = [], []
+            for document_id, kind, value, extra in zip(side_documents, side_kinds, side_values, side_extras):
+                identifier_id = None
+                if kind:
+                    key = (kind, value, None if kind == 1 else extra)
+                    identifier_id = interned.get(key)
+                    if identifier_id is None: identifier_id = interned[key] = next(ids)
+                key = (document_id, identifier_id)
+                element_id = interned.get(key)
+                if element_id is None: element_id = interned[key] = next(ids)
+                element_ids.append(element_id)
+                identifier_ids.append(identifier_id)
+            columns += [element_ids, side_documents, identifier_ids, side_kinds, side_values, side_extras]
+        block = _LinkColumns(columns, known)
+        self._changes += 1
+
+        if self.storage:
+            for document_id, document in known.items(): self._links.documents.setdefault(document_id, document)
+            self._links.extend_rows(block.rows(), count)
+        else:
+            self._columns.append(block)
+        return link_ids
+
+    def close(self):
+        """Write pending links and close the database of a disk-backed linkset."""
+        if self.storage: self.links.close()
+
+    def _state(self) -> tuple:
+        # what changes whenever links are added, removed, replaced or reordered
+        return (self._changes, getattr(self._links, 'changes', None), self._link_count())
+
+    @property
+    def dirty(self) -> bool:
+        """True if links were added, removed, replaced or reordered since the linkset was read or saved by a
+        Container, or if it never was. Changes made to the Link objects themselves are not detected, call
+        mark_dirty() after them."""
+        return self._clean != self._state()
+
+    def mark_dirty(self):
+        self._clean = None
+
+    def _mark_clean(self):
+        self._clean = self._state()
+
+    @staticmethod
+    def identifier_value(identifier: Identifier|None):
+        """The value an identifier points with: its URI, string identifier or query expression."""
+        if isinstance(identifier, URIBasedIdentifier): return identifier.uri
+        if isinstance(identifier, StringBasedIdentifier): return identifier.identifier
+        if isinstance(identifier, QueryBasedIdentifier): return identifier.query_expression
+        return None
+
+    def _index_link(self, link: Link):
+        a, b = link.a, link.b
+        by_document, by_identifier = self._links_by_document, self._links_by_identifier
+        if a.document is not None: by_document.setdefault(str(a.document.id), []).append(link)
+        if b.document is not None and b.document is not a.document:
+            by_document.setdefault(str(b.document.id), []).append(link)
+        a_value = self.identifier_value(a.identifier) if a.identifier is not None else None
+        b_value = self.identifier_value(b.identifier) if b.identifier is not None else None
+        if a_value is not None: by_identifier.setdefault(a_value, []).append(link)
+        if b_value is not None and b_value != a_value: by_identifier.setdefault(b_value, []).append(link)
+
+    def _ensure_index(self):
+        # (re)build when missing, or when self.links was changed in place since
+        links = self.links
+        if self._links_by_document is None or self._indexed != links.changes:
+            self._links_by_document, self._links_by_identifier = {}, {}
+            for link in links:
+                self._index_link(link)
+            self._indexed = links.changes
+
+    def get_links_by_document(self, document: Document|uuid.UUID|str) -> list:
+        """All links with a link element on the given document (or document id)."""
+        if isinstance(document, Document): document = document.id
+        if self.storage: return self.links.find(('a_document', 'b_document'), str(document))
+        self._ensure_index()
+        return list(self._links_by_document.get(str(document), ()))
+
+    def get_links_by_identifier(self, value: str) -> list:
+        """All links with a link element identified by `value` (a URI, string identifier or query expression)."""
+        if self.storage: return self.links.find(('a_value', 'b_value'), value)
+        self._ensure_index()
+        return list(self._links_by_identifier.get(value, ()))
+
+    def get_link(self, id: uuid.UUID|str) -> Link|None:
+        """The link with the given id, None if there is none."""
+        if self.storage:
+            links = self.links.find(('id',), str(id))
+            return links[0] if links else None
+        id = str(id)
+        return next((link for link in self.links if str(link.id) == id), None)
+
+    def get_link_elements_by_identifier(self, value: str) -> list:
+        """All link elements identified by `value` (a URI, string identifier or query expression)."""
+        return [link_element for link in self.get_links_by_identifier(value) for link_element in (link.a, link.b)
+                if self.identifier_value(link_element.identifier) == value]
+
+    def parse(self, source, format:str|None = None, documents: dict|None = None, publicID: str|None = None):
+        """Read links from a linkset file or binary stream, streaming its triples instead of loading them into self.linkset.
+
+        `documents` maps document ids to the Document objects the link elements should point to. `format` is
+        one of RDF_FORMATS (or an rdflib name for them), by default taken from the file extension. N-Triples
+        and Turtle with one triple per line are read line by line, without rdflib's parsers.
+        """
+        if self.storage:
+            if documents is not None: self.links.documents.update(documents)
+            with _span('linkset.parse') as span:
+                decoder = _read_rdf(source, format, publicID, lambda: _SQLiteDecoder(self.links))
+                span.count(links = decoder.finish())
+            if decoder.shared: self.intern = True
+            return
+        self._add_decoded(_decode_linkset(source, format, publicID), documents)
+
+    def _add_decoded(self, decoder: _LinksetDecoder, documents: dict|None = None):
+        with _span('linkset.links') as span:
+            links = decoder.links(documents)
+            for link in links:
+                self.add_link(link)
+            span.count(links = len(links))
+        # a linkset that was written interned stays interned: the decoder already shares its link elements
+        if decoder.shared: self.intern = True
     
+    # formats written line by line by write(), without going through self.linkset
+    STREAM_FORMATS = {'nt': 'nt', 'ntriples': 'nt', 'nt11': 'nt', 'ttl': 'ttl', 'turtle': 'ttl'}
+
+    def _lines(self, format: str, base: str):
+        """Yield the linkset triples as N-Triples or flat Turtle lines, straight from the link rows (see _rows())."""
+        RDF = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#'
+        XSD = 'http://www.w3.org/2001/XMLSchema#'
+        LINKSET = 'https://standards.iso.org/iso/21597/-1/ed-1/en/Linkset#'
+        if format == 'ttl':
+            yield '@prefix inst: <' + str(self.linkset_url) + '> .\n'
+            yield '@prefix linkset: <' + LINKSET + '> .\n'
+            yield '@prefix rdf: <' + RDF + '> .\n'
+            yield '@prefix xsd: <' + XSD + '> .\n\n'
+            def term(id):
+                if type(id) is uuid.UUID: return 'inst:' + str(id)
+                id = str(id)
+                if _LOCAL_NAME.match(id): return 'inst:' + id
+                return '<' + str(self.linkset_url) + _escape_iri(id) + '>'
+            iri = lambda prefix, name: prefix + ':' + name
+            rdf, xsd, linkset = 'rdf', 'xsd', 'linkset'
+        else:
+            term = lambda id: '<' + base + (str(id) if type(id) is uuid.UUID else _escape_iri(id)) + '>'
+            iri = lambda namespace, name: '<' + namespace + name + '>'
+            rdf, xsd, linkset = RDF, XSD, LINKSET
+
+        TYPE = ' ' + iri(rdf, 'type') + ' '
+        LINK = TYPE + iri(linkset, 'Link') + ' .\n'
+        LINK_ELEMENT = TYPE + iri(linkset, 'LinkElement') + ' .\n'
+        HAS_LINK_ELEMENT = ' ' + iri(linkset, 'hasLinkElement') + ' '
+        HAS_IDENTIFIER = ' ' + iri(linkset, 'hasIdentifier') + ' '
+        HAS_DOCUMENT = ' ' + iri(linkset, 'hasDocument') + ' '
+        URI_BASED = TYPE + iri(linkset, 'URIBasedIdentifier') + ' .\n'
+        STRING_BASED = TYPE + iri(linkset, 'StringBasedIdentifier') + ' .\n'
+        QUERY_BASED = TYPE + iri(linkset, 'QueryBasedIdentifier') + ' .\n'
+        URI = ' ' + iri(linkset, 'uri') + ' "'
+        IDENTIFIER = ' ' + iri(linkset, 'identifier') + ' "'
+        IDENTIFIER_FIELD = ' ' + iri(linkset, 'identifierField') + ' "'
+        QUERY_LANGUAGE = ' ' + iri(linkset, 'queryLanguage') + ' "'
+        QUERY_EXPRESSION = ' ' + iri(linkset, 'queryExpression') + ' "'
+        ANY_URI = '"^^' + iri(xsd, 'anyURI') + ' .\n'
+        STRING = '"^^' + iri(xsd, 'string') + ' .\n'
+
+        # ids of the link elements and identifiers already written, when they are shared
+        written = set() if self.intern else None
+
+        def identifier(identifier_node, kind, value, extra):
+            if kind == 1:
+                return identifier_node + URI_BASED + identifier_node + URI + _escape_literal(value) + ANY_URI
+            if kind == 2:
+                return (identifier_node + STRING_BASED + identifier_node + IDENTIFIER + _escape_literal(value) + STRING
+                        + (identifier_node + IDENTIFIER_FIELD + _escape_literal(extra) + STRING if extra else ''))
+            return (identifier_node + QUERY_BASED + identifier_node + QUERY_LANGUAGE + _escape_literal(extra) + STRING
+                    + identifier_node + QUERY_EXPRESSION + _escape_literal(value) + STRING)
+
+        def element(element_id, document_id, identifier_id, kind, value, extra):
+            if written is not None:
+                if element_id in written: return ''
+                written.add(element_id)
+            node = term(element_id)
+            lines = [node + LINK_ELEMENT]
+            if kind:
+                identifier_node = term(identifier_id)
+                lines.append(node + HAS_IDENTIFIER + identifier_node + ' .\n')
+                if written is None or identifier_id not in written:
+                    if written is not None: written.add(identifier_id)
+                    lines.append(identifier(identifier_node, kind, value, extra))
+            if document_id is not None: lines.append(node + HAS_DOCUMENT + term(document_id) + ' .\n')
+            return ''.join(lines)
+
+        for row in self._rows():
+            node = term(row[0])
+            yield (node + LINK
+                + node + HAS_LINK_ELEMENT + term(row[1]) + ' .\n' + element(*row[1:7])
+                + node + HAS_LINK_ELEMENT + term(row[7]) + ' .\n' + element(*row[7:13]))
+
+    def write(self, destination, format:str = 'nt', base:str = 'file:///', chunk_size:int = 1 << 20):
+        """Stream the linkset as N-Triples or flat Turtle to a file path or a binary stream.
+
+        Triples are generated from the links, or the columns of add_links(), and written in chunks of about
+        `chunk_size` characters, without building self.linkset. Shared link elements and identifiers of an
+        interned linkset are written once. N-Triples needs absolute IRIs, so instances are written relative to `base`
+        there; Turtle keeps them relative to the linkset, as serialize() always did.
+        RDF/XML ('xml') cannot be written line by line: it goes through a temporary rdflib graph.
+        """
+        if _rdf_format(format) == 'xml':
+            graph = Graph()
+            for prefix, namespace in self.linkset.namespaces(): graph.bind(prefix, namespace)
+            with _span('linkset.write') as span:
+                graph = self._add_triples(graph)
+                graph.serialize(destination, format = 'xml')
+                span.count(links = self._link_count(), triples = len(graph))
+            return
+        format = self.STREAM_FORMATS[format]
+        if isinstance(destination, (str, os.PathLike)):
+            with open(destination, 'wb') as stream:
+                return self.write(stream, format = format, base = base, chunk_size = chunk_size)
+
+        with _span('linkset.write') as span:
+            chunk, size, written = [], 0, 0
+            for line in self._lines(format, base):
+                chunk.append(line)
+                size += len(line)
+                if size >= chunk_size:
+                    data = ''.join(chunk).encode('utf-8')
+                    destination.write(data)
+                    written += len(data)
+                    chunk, size = [], 0
+            if chunk:
+                data = ''.join(chunk).encode('utf-8')
+                destination.write(data)
+                written += len(data)
+            span.count(links = self._link_count(), bytes = written)
+
     def serialize(self, path, format):
+        if format in self.STREAM_FORMATS: return self.write(path, format = format)
+        self._add_triples(self.linkset).serialize(path, format = format)
 
+    def _add_triples(self, graph: Graph) -> Graph:
+        """Add the linkset triples to `graph`, for the formats that rdflib writes."""
         for link in self.links:
-            self.linkset.add((self.INST[str(link.id)], self.RDF.type, self.LINKSET.Link))
+            graph.add((self.INST[str(link.id)], self.RDF.type, self.LINKSET.Link))
             
-            print('creating link: ' + str(link.id))
             # a element
-            self.linkset.add((self.INST[str(link.id)], self.LINKSET.hasLinkElement, self.INST[str(link.a.id)] ))
-            self.linkset.add((self.INST[str(link.a.id)], self.RDF.type, self.LINKSET.LinkElement  ))
-            if link.a.identifier: self.linkset.add((self.INST[str(link.a.id)], self.LINKSET.hasIdentifier, self.INST[str(link.a.identifier.id)]))
+            graph.add((self.INST[str(link.id)], self.LINKSET.hasLinkElement, self.INST[str(link.a.id)] ))
+            graph.add((self.INST[str(link.a.id)], self.RDF.type, self.LINKSET.LinkElement  ))
+            if link.a.identifier: graph.add((self.INST[str(link.a.id)], self.LINKSET.hasIdentifier, self.INST[str(link.a.identifier.id)]))
             
             if isinstance(link.a.identifier, URIBasedIdentifier ) and  link.a.identifier: 
-                self.linkset.add((self.INST[str(link.a.identifier.id)], self.RDF.type, self.LINKSET.URIBasedIdentifier))
-                if link.a.identifier: self.linkset.add((self.INST[str(link.a.identifier.id)], self.LINKSET.uri, Literal(link.a.identifier.uri, datatype=self.XSD.anyURI)))
+                graph.add((self.INST[str(link.a.identifier.id)], self.RDF.type, self.LINKSET.URIBasedIdentifier))
+                if link.a.identifier: graph.add((self.INST[str(link.a.identifier.id)], self.LINKSET.uri, Literal(link.a.identifier.uri, datatype=self.XSD.anyURI)))
             
             if isinstance(link.a.identifier, StringBasedIdentifier ) and link.a.identifier: 
-                self.linkset.add((self.INST[str(link.a.identifier.id)], self.RDF.type, self.LINKSET.StringBasedIdentifier))
-                self.linkset.add((self.INST[str(link.a.identifier.id)], self.LINKSET.identifier, Literal(link.a.identifier.identifier, datatype=self.XSD.string)))
-                if link.a.identifier.identifier_field: self.linkset.add((self.INST[str(link.a.identifier.id)], self.LINKSET.identifierField, Literal(link.a.identifier.identifier_field, datatype=self.XSD.string)))
+                graph.add((self.INST[str(link.a.identifier.id)], self.RDF.type, self.LINKSET.StringBasedIdentifier))
+                graph.add((self.INST[str(link.a.identifier.id)], self.LINKSET.identifier, Literal(link.a.identifier.identifier, datatype=self.XSD.string)))
+                if link.a.identifier.identifier_field: graph.add((self.INST[str(link.a.identifier.id)], self.LINKSET.identifierField, Literal(link.a.identifier.identifier_field, datatype=self.XSD.string)))
             
             if isinstance(link.a.identifier, QueryBasedIdentifier ) and  link.a.identifier: 
-                self.linkset.add((self.INST[str(link.a.identifier.id)], self.RDF.type, self.LINKSET.QueryBasedIdentifier))
-                self.linkset.add((self.INST[str(link.a.identifier.id)], self.LINKSET.queryLanguage, Literal(link.a.identifier.query_language, datatype=self.XSD.string)))
-                self.linkset.add((self.INST[str(link.a.identifier.id)], self.LINKSET.queryExpression, Literal(link.a.identifier.query_expression, datatype=self.XSD.string)))
+                graph.add((self.INST[str(link.a.identifier.id)], self.RDF.type, self.LINKSET.QueryBasedIdentifier))
+                graph.add((self.INST[str(link.a.identifier.id)], self.LINKSET.queryLanguage, Literal(link.a.identifier.query_language, datatype=self.XSD.string)))
+                graph.add((self.INST[str(link.a.identifier.id)], self.LINKSET.queryExpression, Literal(link.a.identifier.query_expression, datatype=self.XSD.string)))
 
-            if link.a.document: self.linkset.add((self.INST[str(link.a.id)], self.LINKSET.hasDocument, self.INST[str(link.a.document.id)]))
+            if link.a.document: graph.add((self.INST[str(link.a.id)], self.LINKSET.hasDocument, self.INST[str(link.a.document.id)]))
 
             # b element
-            self.linkset.add((self.INST[str(link.id)], self.LINKSET.hasLinkElement, self.INST[str(link.b.id)] ))
-            self.linkset.add((self.INST[str(link.b.id)], self.RDF.type, self.LINKSET.LinkElement  ))
-            if link.b.identifier: self.linkset.add((self.INST[str(link.b.id)], self.LINKSET.hasIdentifier, self.INST[str(link.b.identifier.id)]))
+            graph.add((self.INST[str(link.id)], self.LINKSET.hasLinkElement, self.INST[str(link.b.id)] ))
+            graph.add((self.INST[str(link.b.id)], self.RDF.type, self.LINKSET.LinkElement  ))
+            if link.b.identifier: graph.add((self.INST[str(link.b.id)], self.LINKSET.hasIdentifier, self.INST[str(link.b.identifier.id)]))
             
-            if isinstance(link.a.identifier, URIBasedIdentifier ) and link.b.identifier: 
-                self.linkset.add((self.INST[str(link.b.identifier.id)], self.RDF.type, self.LINKSET.URIBasedIdentifier))
-                self.linkset.add((self.INST[str(link.b.identifier.id)], self.LINKSET.uri, Literal(link.b.identifier.uri, datatype=self.XSD.anyURI)))
+            if isinstance(link.b.identifier, URIBasedIdentifier ): 
+                graph.add((self.INST[str(link.b.identifier.id)], self.RDF.type, self.LINKSET.URIBasedIdentifier))
+                graph.add((self.INST[str(link.b.identifier.id)], self.LINKSET.uri, Literal(link.b.identifier.uri, datatype=self.XSD.anyURI)))
             
-            if isinstance(link.a.identifier, StringBasedIdentifier ) and link.b.identifier:
-                self.linkset.add((self.INST[str(link.b.identifier.id)], self.RDF.type, self.LINKSET.StringBasedIdentifier))
-                self.linkset.add((self.INST[str(link.b.identifier.id)], self.LINKSET.identifier, Literal(link.b.identifier.identifier, datatype=self.XSD.string)))
-                if link.a.identifier.identifier_field: self.linkset.add((self.INST[str(link.b.identifier.id)], self.LINKSET.identifierField, Literal(link.b.identifier.identifier_field, datatype=self.XSD.string)))
+            if isinstance(link.b.identifier, StringBasedIdentifier ):
+                graph.add((self.INST[str(link.b.identifier.id)], self.RDF.type, self.LINKSET.StringBasedIdentifier))
+                graph.add((self.INST[str(link.b.identifier.id)], self.LINKSET.identifier, Literal(link.b.identifier.identifier, datatype=self.XSD.string)))
+                if link.b.identifier.identifier_field: graph.add((self.INST[str(link.b.identifier.id)], self.LINKSET.identifierField, Literal(link.b.identifier.identifier_field, datatype=self.XSD.string)))
             
-            if isinstance(link.a.identifier, QueryBasedIdentifier ) and link.b.identifier: 
-                self.linkset.add((self.INST[str(link.b.identifier.id)], self.RDF.type, self.LINKSET.QueryBasedIdentifier))
-                self.linkset.add((self.INST[str(link.b.identifier.id)], self.LINKSET.queryLanguage, Literal(link.b.identifier.query_language, datatype=self.XSD.string)))
-                self.linkset.add((self.INST[str(link.b.identifier.id)], self.LINKSET.queryExpression, Literal(link.b.identifier.query_expression, datatype=self.XSD.string)))
+            if isinstance(link.b.identifier, QueryBasedIdentifier ): 
+                graph.add((self.INST[str(link.b.identifier.id)], self.RDF.type, self.LINKSET.QueryBasedIdentifier))
+                graph.add((self.INST[str(link.b.identifier.id)], self.LINKSET.queryLanguage, Literal(link.b.identifier.query_language, datatype=self.XSD.string)))
+                graph.add((self.INST[str(link.b.identifier.id)], self.LINKSET.queryExpression, Literal(link.b.identifier.query_expression, datatype=self.XSD.string)))
             
-            if link.b.document: self.linkset.add((self.INST[str(link.b.id)], self.LINKSET.hasDocument, self.INST[str(link.b.document.id)]))
+            if link.b.document: graph.add((self.INST[str(link.b.id)], self.LINKSET.hasDocument, self.INST[str(link.b.document.id)]))
             
-        self.linkset.serialize(path, format = format)
+        return graph
+
+    def fingerprints(self) -> dict:
+        """Link id -> link_fingerprint(), computed from the link rows without building Link objects."""
+        return {str(row[0]): _row_fingerprint(row) for row in self._rows()}
+
+    def diff(self, other: 'Linkset') -> 'Diff':
+        """The links of `other` (a newer version of this linkset) that were added, removed or changed, by id.
+
+        Links are compared by content, see link_fingerprint(): a link that exists in both under different ids is
+        unchanged, and a link with the same id but other content is changed. Runs in time linear in the number
+        of links, with their fingerprints in dicts.
+        """
+        with _span('linkset.diff') as span:
+            old, new = self.fingerprints(), other.fingerprints()
+            old_content, new_content = set(old.values()), set(new.values())
+            diff = Diff()
+            for link_id, fingerprint in new.items():
+                previous = old.get(link_id)
+                if previous is None:
+                    if fingerprint not in old_content: diff.added.append(link_id)
+                elif previous != fingerprint: diff.changed.append(link_id)
+            diff.removed = [link_id for link_id, fingerprint in old.items() if link_id not in new and fingerprint not in new_content]
+            span.count(links = len(old) + len(new), added = len(diff.added), removed = len(diff.removed), changed = len(diff.changed))
+        return diff
+
+
+# Diff and merge
+# Documents and links are compared by fingerprints: 16-byte BLAKE2b digests of their content, kept in dicts and
+# sets, so comparing two containers or linksets is linear in their size instead of pairwise.
+class Diff:
+    """Ids (as strings) of the items added, removed and changed between two versions, see Linkset.diff() and
+    Container.diff()."""
+    __slots__ = ('added', 'removed', 'changed')
+
+    def __init__(self, added: list|None = None, removed: list|None = None, changed: list|None = None) -> None:
+        self.added = added or []
+        self.removed = removed or []
+        self.changed = changed or []
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def __repr__(self) -> str:
+        return f"Diff(added={len(self.added)}, removed={len(self.removed)}, changed={len(self.changed)})"
+
+def _fingerprint(values) -> bytes:
+    return hashlib.blake2b('\x1f'.join(values).encode('utf-8', 'surrogatepass'), digest_size = 16).digest()
+
+def _element_key(document_id, kind, value, extra) -> str:
+    # a URI-based identifier has no extra value; None and '' are the same
+    if kind == 1: extra = None
+    return f"{document_id or ''}\x1e{kind or ''}\x1e{value or ''}\x1e{extra or ''}"
+
+def _row_fingerprint(row: tuple) -> bytes:
+    a, b = _element_key(row[2], row[4], row[5], row[6]), _element_key(row[8], row[10], row[11], row[12])
+    # link elements are not ordered (both are linkset:hasLinkElement), so neither are they here
+    return _fingerprint((a, b) if a <= b else (b, a))
+
+def link_fingerprint(link: Link) -> bytes:
+    """Digest of what a link links: the documents and identifier kinds and values of its two link elements,
+    in either order. Ids of the link, its link elements and identifiers are left out."""
+    return _row_fingerprint((link.id,) + _element_values(link.a) + _element_values(link.b))
+
+def _attribute_text(value) -> str:
+    if value is None: return ''
+    # dates read from an index are datetime objects, those set by hand usually ISO strings
+    if hasattr(value, 'isoformat'): return value.isoformat()
+    return str(value)
+
+def document_fingerprint(document: Document, payload: bool = False) -> bytes:
+    """Digest of a document's type, id and attributes (those of its attr_frag_map, not its local path), and
+    with `payload=True` of its payload bytes, read from the file or from the archive of a lazily opened
+    container. Folder and external documents have no payload of their own."""
+    values = [type(document).__name__, str(document.id)]
+    for attribute in sorted(set(document.attr_frag_map.values())):
+        values.append(attribute + '=' + _attribute_text(getattr(document, attribute, None)))
+    if payload and not isinstance(document, (FolderDocument, ExternalDocument)):
+        if os.path.isfile(document.path): values.append(file_checksum(document.path))
+        else:
+            with document.open_payload() as source: values.append(_copy_hashing(source, None, CHECKSUM_ALGORITHM))
+    return _fingerprint(values)
+
+def _text_columns(columns: list) -> list:
+    """Columns in _LINK_COLUMNS order with their ids (UUIDs in Link objects) as strings, for a _LinkColumns block."""
+    for index, name in enumerate(_LINK_COLUMNS):
+        if name == 'id' or name[2:] in ('id', 'document', 'identifier'):
+            columns[index] = [value if value is None or type(value) is str else str(value) for value in columns[index]]
+    return columns
+
+
+# Validation
+# The class, property, domain/range, cardinality and disjointness axioms of the published Container and Linkset
+# ontologies are compiled once per process into plain dicts (_Schema). A container is then checked in one pass
+# over the triples of its index and linksets: every subject only keeps the id of its "shape" (its classes,
+# property counts and the properties it is the value of), and shapes move on through a memoized transition
+# table, so the rules are evaluated once per distinct shape instead of once per subject.
+CONTAINER_NAMESPACE = 'https://standards.iso.org/iso/21597/-1/ed-1/en/Container#'
+LINKSET_NAMESPACE = 'https://standards.iso.org/iso/21597/-1/ed-1/en/Linkset#'
+_OWL = 'http://www.w3.org/2002/07/owl#'
+_RDFS = 'http://www.w3.org/2000/01/rdf-schema#'
+_XSD = 'http://www.w3.org/2001/XMLSchema#'
+_STRING_RANGES = (_XSD + 'string', _XSD + 'anyURI')
+
+_validation_schema = None
+
+class Violation:
+    """A rule of the ICDD ontologies broken by a container: the archive member, the id of the subject (the last
+    segment of its IRI) and what is wrong with it."""
+    __slots__ = ('member', 'subject', 'message')
+
+    def __init__(self, member: str, subject: str|None, message: str) -> None:
+        self.member = member
+        self.subject = subject
+        self.message = message
+
+    def __str__(self) -> str:
+        return f"{self.member}: {self.subject}: {self.message}" if self.subject is not None else f"{self.member}: {self.message}"
+
+    def __repr__(self) -> str:
+        return f"Violation({self.member!r}, {self.subject!r}, {self.message!r})"
+
+_PREFIXES = ((CONTAINER_NAMESPACE, 'container:'), (LINKSET_NAMESPACE, 'linkset:'), (_XSD, 'xsd:'))
+
+def _name(iri: str) -> str:
+    # prefixed name of an ontology term, for messages
+    for namespace, prefix in _PREFIXES:
+        if iri.startswith(namespace): return prefix + iri[len(namespace):]
+    return iri
+
+# cardinality properties of a restriction -> whether they set its minimum and its maximum
+_CARDINALITIES = {_OWL + 'cardinality': (True, True), _OWL + 'minCardinality': (True, False), _OWL + 'maxCardinality': (False, True),
+                  _OWL + 'qualifiedCardinality': (True, True), _OWL + 'minQualifiedCardinality': (True, False),
+                  _OWL + 'maxQualifiedCardinality': (False, True)}
+
+class _Schema:
+    """The rules of the ICDD ontologies, by class and property IRI (as str).
+
+    Domains and ranges are kept as lists of class expressions a subject or value must all match, each one the
+    set of named classes it allows (one class, or the members of an owl:unionOf); other class expressions are
+    not checked. A qualified cardinality (owl:onClass or owl:onDataRange) is checked like a plain one when the
+    range of the property only allows values of its class or datatype, since other values are reported as out
+    of range anyway, and skipped otherwise.
+    """
+    __slots__ = ('classes', 'superclasses', 'datatype_properties', 'object_properties', 'superproperties', 'domains',
+                 'ranges', 'datatypes', 'cardinalities', 'disjoint')
+
+    def __init__(self, graphs) -> None:
+        types, parents, parent_properties, on_property, bounds, qualifiers = {}, {}, {}, {}, {}, {}
+        domains, ranges, firsts, rests, unions, members = {}, {}, {}, {}, {}, {}
+        self.disjoint = set()
+        for graph in graphs:
+            for s, p, o in graph:
+                p = str(p)
+                if p == _RDF_TYPE: types.setdefault(s, set()).add(str(o))
+                elif p == _RDFS + 'subClassOf': parents.setdefault(s, []).append(o)
+                elif p == _RDFS + 'subPropertyOf': parent_properties.setdefault(str(s), []).append(str(o))
+                elif p == _RDFS + 'domain': domains.setdefault(str(s), []).append(o)
+                elif p == _RDFS + 'range': ranges.setdefault(str(s), []).append(o)
+                elif p == _RDF_FIRST: firsts[s] = o
+                elif p == _RDF_REST: rests[s] = o
+                elif p == _OWL + 'unionOf': unions[s] = o
+                elif p == _OWL + 'members': members[s] = o
+                elif p == _OWL + 'disjointWith': self.disjoint.add((str(s), str(o)))
+                elif p == _OWL + 'onProperty': on_property[s] = str(o)
+                elif p in (_OWL + 'onClass', _OWL + 'onDataRange'): qualifiers[s] = str(o)
+                elif p in _CARDINALITIES:
+                    sets_low, sets_high = _CARDINALITIES[p]
+                    low, high = bounds.get(s, (0, None))
+                    bounds[s] = (int(o) if sets_low else low, int(o) if sets_high else high)
+
+        def closure(start, parents):
+            seen, stack = set(), [start]
+            while stack:
+                node = stack.pop()
+                if node not in seen:
+                    seen.add(node)
+                    stack.extend(parents.get(node, ()))
+            return frozenset(seen)
+
+        def items(node):
+            # the members of an RDF list
+            values = []
+            while node in firsts:
+                values.append(firsts[node])
+                node = rests.get(node)
+            return values
+
+        def allowed(node):
+            # the named classes a class expression allows, None for one that is not checked
+            if isinstance(node, URIRef): return frozenset((str(node),))
+            named = items(unions[node]) if node in unions else ()
+            if named and all(isinstance(member, URIRef) for member in named): return frozenset(str(member) for member in named)
+            return None
+
+        self.classes = {str(node) for node, kinds in types.items() if _OWL + 'Class' in kinds and isinstance(node, URIRef)}
+        named_parents = {str(node): [str(parent) for parent in nodes if isinstance(parent, URIRef)] for node, nodes in parents.items()}
+        self.superclasses = {name: closure(name, named_parents) for name in self.classes}
+        self.datatype_properties = {str(node) for node, kinds in types.items() if _OWL + 'DatatypeProperty' in kinds}
+        self.object_properties = {str(node) for node, kinds in types.items() if _OWL + 'ObjectProperty' in kinds}
+        self.superproperties = {name: closure(name, parent_properties) for name in self.datatype_properties | self.object_properties}
+        for node in members:
+            disjoint = [str(member) for member in items(members[node]) if isinstance(member, URIRef)]
+            self.disjoint.update((a, b) for i, a in enumerate(disjoint) for b in disjoint[i + 1:])
+
+        self.domains = {prop: [classes for classes in map(allowed, nodes) if classes] for prop, nodes in domains.items()}
+        self.ranges = {prop: [classes for classes in map(allowed, nodes) if classes] for prop, nodes in ranges.items()
+                       if prop not in self.datatype_properties}
+        # datatype property -> the datatype of its values, for those with a single named one
+        self.datatypes = {prop: str(nodes[0]) for prop, nodes in ranges.items()
+                          if prop in self.datatype_properties and len(nodes) == 1 and isinstance(nodes[0], URIRef)}
+
+        def covers(qualifier, prop):
+            # True if every value in the range of prop is a `qualifier`
+            if qualifier in (_OWL + 'Thing', _RDFS + 'Literal'): return True
+            if prop in self.datatype_properties: return self.datatypes.get(prop) == qualifier
+            return any(all(qualifier in self.superclasses.get(name, (name,)) for name in classes) for classes in self.ranges.get(prop, ()))
+
+        # class -> {property: (min, max)}, with the restrictions of the superclasses
+        restrictions = {}
+        for node, nodes in parents.items():
+            for restriction in nodes:
+                if restriction not in on_property or restriction not in bounds: continue
+                prop = on_property[restriction]
+                if restriction in qualifiers and not covers(qualifiers[restriction], prop): continue
+                restrictions.setdefault(str(node), []).append((prop, bounds[restriction]))
+        self.cardinalities = {}
+        for name, superclasses in self.superclasses.items():
+            merged = {}
+            for superclass in superclasses:
+                for prop, (low, high) in restrictions.get(superclass, ()):
+                    old_low, old_high = merged.get(prop, (0, None))
+                    merged[prop] = (max(low, old_low), high if old_high is None else old_high if high is None else min(high, old_high))
+            if merged: self.cardinalities[name] = merged
+
+def _schema() -> _Schema:
+    """The compiled rules of the published Container and Linkset ontologies, built once per process. Raises
+    FileNotFoundError when they are not available, see get_ontology()."""
+    global _validation_schema
+    schema = _validation_schema
+    if schema is None:
+        schema = _Schema([get_ontology('Container'), get_ontology('Linkset')])
+        with _ontology_lock: _validation_schema = schema
+    return schema
+
+class _Checker:
+    """Checks the triples of one RDF file against a _Schema, fed through add(s, p, o) in a single pass."""
+
+    def __init__(self, schema: _Schema, member: str) -> None:
+        self.schema = schema
+        self.member = member
+        self.violations = []
+        self.subjects = {}              # subject id -> shape id
+        # shape id -> (classes, {property: count}, properties it is the value of), and shape id -> {event: shape id};
+        # an event is ('t', class), ('p', property) or ('r', property) for a subject that is the value of property
+        self.shapes = [(frozenset(), {}, frozenset())]
+        self._shape_ids = {(frozenset(), frozenset(), frozenset()): 0}
+        self._transitions = [{}]
+        self._predicates = {}           # predicate -> (name, kind, events of the subject, event of the value)
+        self._class_events = {}
+        # linkset file names and linksets listed by an index
+        self.filenames = {}
+        self.linksets = []
+
+    def _predicate(self, p):
+        name = str(p)
+        schema = self.schema
+        if name == _RDF_TYPE: kind = 'type'
+        elif name in schema.object_properties: kind = 'object'
+        elif name in schema.datatype_properties: kind = 'datatype'
+        elif name.startswith((CONTAINER_NAMESPACE, LINKSET_NAMESPACE)): kind = 'unknown'
+        else: kind = None
+        info = self._predicates[p] = (name, kind, tuple(('p', prop) for prop in schema.superproperties.get(name, ())), ('r', name))
+        return info
+
+    def _transition(self, shape: int, event: tuple) -> int:
+        classes, counts, referenced = self.shapes[shape]
+        if event[0] == 't': classes = classes | {event[1]}
+        elif event[0] == 'p': counts = {**counts, event[1]: counts.get(event[1], 0) + 1}
+        else: referenced = referenced | {event[1]}
+        key = (classes, frozenset(counts.items()), referenced)
+        target = self._shape_ids.get(key)
+        if target is None:
+            target = self._shape_ids[key] = len(self.shapes)
+            self.shapes.append((classes, counts, referenced))
+            self._transitions.append({})
+        self._transitions[shape][event] = target
+        return target
+
+    def add(self, s, p, o):
+        name, kind, events, value_event = self._predicates.get(p) or self._predicate(p)
+        if kind is None: return
+        # ids are the last IRI segment, as in the decoders; the container description './' keeps its IRI
+        subject = s.rsplit('/', 1)[-1] or str(s)
+        if kind == 'type':
+            events = (self._class_events.get(o) or self._class_events.setdefault(o, ('t', str(o))),)
+        elif kind == 'unknown':
+            self.violations.append(Violation(self.member, subject, f"unknown property {_name(name)}"))
+            return
+        subjects, transitions = self.subjects, self._transitions
+        shape = subjects.get(subject, 0)
+        for event in events: shape = transitions[shape].get(event) or self._transition(shape, event)
+        subjects[subject] = shape
+        if kind == 'type': return
+
+        is_literal = type(o) is _PlainLiteral or isinstance(o, Literal)
+        if kind == 'object':
+            if is_literal:
+                self.violations.append(Violation(self.member, subject, f"{_name(name)} has the literal {str(o)!r} as value, not a resource"))
+                return
+            value = o.rsplit('/', 1)[-1] or str(o)
+            shape = subjects.get(value, 0)
+            subjects[value] = transitions[shape].get(value_event) or self._transition(shape, value_event)
+            if name == CONTAINER_NAMESPACE + 'containsLinkset': self.linksets.append(value)
+            return
+        if not is_literal:
+            self.violations.append(Violation(self.member, subject, f"{_name(name)} has the resource {str(o)!r} as value, not a literal"))
+            return
+        if name == CONTAINER_NAMESPACE + 'filename': self.filenames[subject] = str(o)
+        expected = self.schema.datatypes.get(name)
+        if expected is None or type(o) is _PlainLiteral and expected in _STRING_RANGES: return
+        datatype = str(o.datatype) if isinstance(o, Literal) and o.datatype is not None else None
+        if expected in _STRING_RANGES:
+            if datatype is not None and datatype not in _STRING_RANGES:
+                self.violations.append(Violation(self.member, subject, f"{_name(name)} is an {_name(datatype)}, expected an {_name(expected)}"))
+        elif datatype != expected:
+            self.violations.append(Violation(self.member, subject, f"{_name(name)} value {str(o)!r} is not an {_name(expected)}"))
+        elif getattr(o, 'ill_typed', False):
+            self.violations.append(Violation(self.member, subject, f"{_name(name)} value {str(o)!r} is not a valid {_name(expected)}"))
+
+    def classes(self) -> dict:
+        """Subject id -> its classes and their superclasses, for the subjects with a class."""
+        superclasses = self.schema.superclasses
+        closures = {}
+        for subject, shape in self.subjects.items():
+            classes = self.shapes[shape][0]
+            if classes: closures[subject] = frozenset().union(*(superclasses.get(name, (name,)) for name in classes))
+        return closures
+
+    def _messages(self, shape: int, external: frozenset|None) -> list:
+        schema = self.schema
+        classes, counts, referenced = self.shapes[shape]
+        closure = frozenset().union(*(schema.superclasses.get(name, (name,)) for name in classes))
+        messages = [f"unknown class {_name(name)}" for name in sorted(classes)
+                    if name not in schema.classes and name.startswith((CONTAINER_NAMESPACE, LINKSET_NAMESPACE))]
+        messages += [f"is both a {_name(a)} and a {_name(b)}" for a, b in sorted(schema.disjoint) if a in closure and b in closure]
+        for prop in sorted(counts):
+            for classes in schema.domains.get(prop, ()):
+                if not classes & closure: messages.append(f"has {_name(prop)} but is not a {' or a '.join(map(_name, sorted(classes)))}")
+        bounds = {}
+        for name in closure:
+            for prop, (low, high) in schema.cardinalities.get(name, {}).items():
+                old_low, old_high = bounds.get(prop, (0, None))
+                bounds[prop] = (max(low, old_low), high if old_high is None else old_high if high is None else min(high, old_high))
+        for prop, (low, high) in sorted(bounds.items()):
+            count = counts.get(prop, 0)
+            if count < low or high is not None and count > high:
+                expected = f"exactly {low}" if low == high else f"at least {low}" if high is None else f"at most {high}" if not low else f"{low} to {high}"
+                messages.append(f"has {count} {_name(prop)}, expected {expected}")
+        # the object model only has binary links (Link.a and Link.b): more link elements would be dropped on read
+        if LINKSET_NAMESPACE + 'Link' in closure and counts.get(LINKSET_NAMESPACE + 'hasLinkElement', 0) > 2:
+            messages.append(f"has {counts[LINKSET_NAMESPACE + 'hasLinkElement']} link elements, only binary links are supported")
+        # a node described in another file (a document of the index, for a linkset) is checked against its classes there
+        if not classes and external is not None: closure = external
+        for prop in sorted(referenced):
+            for classes in schema.ranges.get(prop, ()):
+                if not classes & closure:
+                    messages.append(f"is the {_name(prop)} of another node but not a {' or a '.join(map(_name, sorted(classes)))}")
+        return messages
+
+    def finish(self, external: dict|None = None) -> list:
+        """All violations of the file, with those of the subjects added to the ones found while reading.
+        `external` maps the ids of nodes described in other files to their classes, see classes()."""
+        external = external or {}
+        memo = {}
+        violations = self.violations
+        for subject, shape in self.subjects.items():
+            outside = external.get(subject)
+            key = (shape, outside)
+            messages = memo.get(key)
+            if messages is None: messages = memo[key] = self._messages(shape, outside)
+            for message in messages: violations.append(Violation(self.member, subject, message))
+        return violations
+
+def validate_container(icdd_path: str) -> list:
+    """Check the index and linksets of an .icdd file against the published Container and Linkset ontologies,
+    read from the ontology cache directory or downloaded (see get_ontology()); a FileNotFoundError says when
+    neither works.
+
+    Returns every Violation found (an empty list for a valid container): unknown classes and properties,
+    values of the wrong kind or datatype, subjects outside the domain of their properties, property values
+    outside their range, cardinalities, disjoint classes, links with more than two link elements, and linkset
+    files the index lists but the archive does not hold. The archive is read in place, each file once.
+    """
+    schema = _schema()
+    violations = []
+    with _span('validate') as span, zipfile.ZipFile(icdd_path) as archive:
+        names = set(archive.namelist())
+        index_member = next((name for name in ('index' + extension for extension, _ in RDF_FORMATS.values()) if name in names), None)
+        if index_member is None: return [Violation(os.path.basename(icdd_path), None, "no index.ttl, index.nt or index.rdf")]
+
+        def check(member, format):
+            with archive.open(member) as stream:
+                return _read_rdf(stream, format, 'file:///' + member.replace(' ', '%20'), lambda: _Checker(schema, member), literal = _PlainLiteral)
+
+        index = check(index_member, _format_of(index_member))
+        violations += index.finish()
+        documents = index.classes()
+        for linkset_id in index.linksets:
+            filename = index.filenames.get(linkset_id)
+            member = next((name for name in _linkset_members(linkset_id, filename) if name in names), None)
+            if member is None:
+                violations.append(Violation(index_member, linkset_id, f"linkset file {filename or linkset_id} is not in the archive"))
+                continue
+            def head():
+                with archive.open(member) as stream: return stream.read(4096)
+            violations += check(member, _format_of(member, head)).finish(documents)
+        span.count(linksets = len(index.linksets), violations = len(violations))
+    return violations
+
+def _require_valid(icdd_path: str):
+    """Raise a ValueError listing the violations of an .icdd file, if validate_container() finds any."""
+    violations = validate_container(icdd_path)
+    if violations:
+        shown = '\n'.join(str(violation) for violation in violations[:20])
+        more = f"\n... and {len(violations) - 20} more" if len(violations) > 20 else ''
+        raise ValueError(f"{icdd_path} is not a valid container:\n{shown}{more}")
 
 
 #Container
 class Container:
+    # RDF property fragment -> attribute of the container description, read by open() and written by
+    # _initialize_container(); the date properties are xsd:dateTime, the others xsd:string
+    attr_frag_map = {
+        "address": "address",
+        "checksum": "checksum",
+        "checksumAlgorithm": "checksum_algorithm",
+        "creationDate": "creation_date",
+        "conformanceIndicator": "conformance_indicator",
+        "description": "description",
+        "name": "name",
+        "modificationDate": "modification_date",
+        "publishedBy": "published_by",
+        "userID": "user_id",
+        "versionID": "version_id",
+        "versionDescription": "version_description",
+        "website": "website"
+    }
+    DATE_PROPERTIES = ('creationDate', 'modificationDate')
 
     def  __init__(self,  conformance_indicator = "ICDD-Part1-Container", id:uuid.UUID|str|None = None) -> None:
         from rdflib import Graph, URIRef, Namespace, Literal
@@ -245,18 +2392,19 @@ class Container:
         self.RDFS = Namespace("http://www.w3.org/2000/01/rdf-schema#")
         self.OWL = Namespace("http://www.w3.org/2002/07/owl#")
 
-        # ICDD ontologies
-        self.container_ont = Graph()
-        self.container_ont.parse('https://standards.iso.org/iso/21597/-1/ed-1/en/Container.rdf')
-        self.linkset_ont = Graph()
-        self.linkset_ont.parse('https://standards.iso.org/iso/21597/-1/ed-1/en/Linkset.rdf')
-
         # ICDD graphs
         self.index = Graph()
+        self._archive = None
+        # the .icdd file this container was read from or saved to, and the payload members it held then
+        self._source_path = None
+        self._source_payloads = set()
+        self._source_linksets = {}
+        # RDF format of the index, and of the linksets that do not set their own (see RDF_FORMATS)
+        self.rdf_format = 'ttl'
 
         # ICDD Container data
         self.address = None
-        self.cheksum = None
+        self.checksum = None
         self.checksum_algorithm = None
         self.conformance_indicator = conformance_indicator
         self.creation_date = datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
@@ -282,22 +2430,6 @@ class Container:
 
         self._initialize_container()
 
-        self.attr_frag_map = {
-            "address": "address",
-            "checksum": "checksum",
-            "checksumAlgorithm": "checksum_algorithm",
-            "creationDate": "creation_date",
-            "conformanceIndicator": "conformance_indicator",
-            "description": "description",
-            "name": "name",
-            "modificationDate": "modification_date",
-            "publishedBy": "published_by",
-            "userID": "user_id",
-            "versionID": "version_id",
-            "versionDescription": "version_description",
-            "website": "website"
-        }
-
     def reset_index_graph(self):
         self.index = Graph()
 
@@ -310,46 +2442,84 @@ class Container:
         self.index.bind('xsd', self.XSD)
         self.index.bind('inst', self.INST)
 
+    # ICDD ontologies, loaded on first use and shared by every container
+    @property
+    def container_ont(self) -> Graph:
+        return get_ontology('Container')
+
+    @property
+    def linkset_ont(self) -> Graph:
+        return get_ontology('Linkset')
 
     def _initialize_container(self):
+        """Add the container description to self.index, with every attribute of attr_frag_map that is set."""
         self.index.add((self.container_url, self.RDF.type, self.CONTAINER.ContainerDescription))
-        self.index.add((self.container_url, self.CONTAINER.conformanceIndicator, Literal(self.conformance_indicator, datatype=self.XSD.string)))
-        if self.description: self.index.add((self.container_url, self.CONTAINER.description, Literal(self.description, datatype=self.XSD.string)))
-        if  self.version_description: self.index.add((self.container_url, self.CONTAINER.versionDescription, Literal(self.version_description, datatype=self.XSD.string)))
-        if self.version_id: self.index.add((self.container_url, self.CONTAINER.version, Literal(self.version_id, datatype=self.XSD.string)))
-        self.index.add((self.container_url, self.CONTAINER.creationDate, Literal(self.creation_date, datatype=self.XSD.dateTime)))
+        for fragment, attribute in self.attr_frag_map.items():
+            value = getattr(self, attribute)
+            if value is None or value == '': continue
+            # publishedBy may name a Party node, read back as such
+            if isinstance(value, (URIRef, BNode)): self.index.add((self.container_url, self.CONTAINER[fragment], value))
+            else: self.index.add((self.container_url, self.CONTAINER[fragment], Literal(value, datatype = self.XSD.dateTime if fragment in self.DATE_PROPERTIES else self.XSD.string)))
+
+    @property
+    def documents(self) -> list:
+        return self._documents
+
+    @documents.setter
+    def documents(self, documents):
+        self._documents = documents if isinstance(documents, _TrackedList) else _TrackedList(documents)
+        # document id -> document, built on first lookup and then kept up to date by add_document(); `_indexed`
+        # is the `changes` count of the documents it was built for
+        self._documents_by_id = None
+        self._indexed = 0
+
+    def _document_index(self) -> dict:
+        # (re)build when missing, or when self.documents was changed in place since
+        documents = self.documents
+        if self._documents_by_id is None or self._indexed != documents.changes:
+            self._documents_by_id = {str(document.id): document for document in documents}
+            self._indexed = documents.changes
+        return self._documents_by_id
 
     def add_document(self, document: Document):
-        self.documents.append(document)
+        documents = self.documents
+        # an index that was up to date stays so
+        indexed = self._documents_by_id is not None and self._indexed == documents.changes
+        documents.append(document)
+        if indexed:
+            self._documents_by_id[str(document.id)] = document
+            self._indexed = documents.changes
 
     def get_document_by_id(self, id: uuid.UUID|str):
-        for document in self.documents:
-            if str(document.id) == str(id):
-                return document
+        return self._document_index().get(str(id))
 
     def add_linkset(self, linkset: Linkset):
         self.linksets.append(linkset)
 
-    def create(self, root_path:str|None = None):
-         
-        if root_path:
-            if not root_path.endswith('/'): root_path+='/'
-            main_folder = root_path + self.container_id
-        else: main_folder = self.container_id
+    # payload extensions that are already compressed and are stored as-is in the archive by create(direct=True)
+    STORED_EXTENSIONS = ('.ifczip', '.zip', '.icdd', '.pdf', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.gz', '.bz2', '.xz',
+                         '.7z', '.rar', '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.laz', '.e57', '.mp4', '.mov')
 
-        # Create the main folder
-        os.makedirs(main_folder, exist_ok=True)
+    def _linkset_filename(self, linkset: Linkset) -> str:
+        return str(linkset.id) + RDF_FORMATS[_rdf_format(linkset.rdf_format or self.rdf_format)][0]
 
-        # Create three subfolders within the main folder
-        subfolders = ["Ontology resources", "Payload documents", "Payload triples"]
-        for subfolder in subfolders:
-            os.makedirs(os.path.join(main_folder, subfolder), exist_ok=True)
+    def _linkset_format(self, linkset: Linkset) -> str:
+        return _rdf_format(linkset.rdf_format or self.rdf_format)
+
+    def _index_member(self) -> str:
+        return 'index' + RDF_FORMATS[_rdf_format(self.rdf_format)][0]
 
-        self.container_ont.serialize(self.container_id + '/Ontology resources/Container.ttl', format = 'ttl')
-        self.linkset_ont.serialize(self.container_id + '/Ontology resources/Linkset.ttl', format = 'ttl')
+    def _serialize_index(self) -> bytes:
+        format = _rdf_format(self.rdf_format)
+        if format == 'nt': return ''.join(_nt_lines(self.index)).encode('utf-8')
+        return self.index.serialize(format = RDF_FORMATS[format][1], encoding = 'utf-8')
 
-        # add documents
+    def _index_documents(self) -> list:
+        """Add the document and linkset descriptions to self.index.
 
+        Returns the (document, archive member name) pairs of the payloads to store in "Payload documents".
+        """
+        payloads = []
         for document in self.documents:
 
             if isinstance(document, FolderDocument):
@@ -363,16 +2533,20 @@ class Container:
             elif isinstance(document, EncryptedDocument):
                 self.index.add((self.INST[str(document.id)], self.RDF.type, self.CONTAINER.EncryptedDocument))
                 self.index.add((self.INST[str(document.id)], self.CONTAINER.encryptionAlgorithm, Literal(document.encryption_algorithm, datatype=self.XSD.string)))
-                shutil.copy(document.path, self.container_id + '/Payload documents')
+                payloads.append((document, 'Payload documents/' + str(document.id)))
 
             elif isinstance(document, InternalDocument):
                 self.index.add((self.INST[str(document.id)], self.RDF.type, self.CONTAINER.InternalDocument))
                 self.index.add((self.INST[str(document.id)], self.CONTAINER.filename, Literal(document.file_name, datatype=self.XSD.string)))
-                shutil.copy(document.path, self.container_id + '/Payload documents')
+                payloads.append((document, 'Payload documents/' + os.path.basename(document.path)))
             
+            elif isinstance(document, SecuredDocument):
+                self.index.add((self.INST[str(document.id)], self.RDF.type, self.CONTAINER.SecuredDocument))
+                payloads.append((document, 'Payload documents/' + str(document.id)))
+
             else:
                 self.index.add((self.INST[str(document.id)], self.RDF.type, self.CONTAINER.Document))
-                shutil.copy(document.path, self.container_id + '/Payload documents')
+                payloads.append((document, 'Payload documents/' + str(document.id)))
 
 
             if document.requested: self.index.add((self.INST[str(document.id)], self.CONTAINER.requested, Literal(True, datatype=self.XSD.boolean)))
@@ -386,234 +2560,879 @@ class Container:
             self.index.add((self.container_url, self.CONTAINER.containsDocument, self.INST[str(document.id)]))
             self.index.add((self.INST[str(document.id)], self.CONTAINER.belongsToContainer, self.container_url))
 
-        # add linksets
         for linkset in self.linksets:
 
             self.index.add((self.INST[str(linkset.id)], self.RDF.type, self.CONTAINER.Linkset))
             self.index.add((self.container_url, self.CONTAINER.containsLinkset, self.INST[str(linkset.id)]))
             self.index.add((self.INST[str(linkset.id)], self.CONTAINER.containedInContainer, self.container_url))
-            self.index.add((self.INST[str(linkset.id)], self.CONTAINER.filename, Literal(str(linkset.id) +'.ttl', datatype= self.XSD.string)))
+            self.index.add((self.INST[str(linkset.id)], self.CONTAINER.filename, Literal(self._linkset_filename(linkset), datatype= self.XSD.string)))
 
-            linkset.serialize(self.container_id + '/Payload triples/' + str(linkset.id) +'.ttl', format = 'ttl')
-        
+        return payloads
 
-        self.index.serialize(self.container_id + '/' + 'index.ttl', format  ='ttl')
+    def _index_checksums(self):
+        """Add the checksums of the secured documents to self.index, once their payloads were copied."""
+        for document in self.documents:
+            if isinstance(document, SecuredDocument) and document.checksum:
+                self.index.add((self.INST[str(document.id)], self.CONTAINER.checksum, Literal(document.checksum, datatype=self.XSD.string)))
+                self.index.add((self.INST[str(document.id)], self.CONTAINER.checksumAlgorithm, Literal(document.checksum_algorithm, datatype=self.XSD.string)))
+
+    def create(self, root_path:str|None = None, direct:bool = False, compression: dict|None = None, workers:int|None = None,
+               threads:int|None = None, hardlink:bool = False, rdf_format: str|None = None):
+        """Write the container to <root_path>/<container_id>.icdd.
+
+        By default the container is staged as a folder tree next to the archive, which is then zipped.
+        With `direct=True` every member is streamed straight into the archive instead, and no folder is
+        written. `compression` maps file extensions to zipfile.ZIP_STORED/ZIP_DEFLATED and overrides the
+        default choice of storing STORED_EXTENSIONS and deflating everything else.
+        With `workers` > 1 the linksets are serialized in a pool of that many processes while the payloads
+        are copied. A staged container copies its payloads in a pool of `threads` threads (by default sized
+        by the thread pool executor), as reflinks or kernel-side copies where the filesystem allows, or as hard
+        links to the source files with `hardlink=True`.
+        `rdf_format` (one of RDF_FORMATS: 'nt', 'ttl' or 'xml') sets self.rdf_format, the format of the index
+        and of the linksets without an rdf_format of their own.
+        The published ontologies are written to "Ontology resources": a FileNotFoundError is raised, before
+        anything is written, when they are not available (see get_ontology()).
+        """
+        if rdf_format: self.rdf_format = _rdf_format(rdf_format)
+        if root_path:
+            if not root_path.endswith('/'): root_path+='/'
+            main_folder = root_path + self.container_id
+        else: main_folder = self.container_id
+        # the published ontologies go into every container: fail before writing anything without them
+        _ontology_resources()
+
+        with _span('create.index'):
+            # the description as it is now, attributes set since __init__ included
+            self.index.remove((self.container_url, None, None))
+            self._initialize_container()
+            payloads = self._index_documents()
+
+        pool = _process_pool(workers, len(self.linksets))
+        linkset_jobs = None
+        try:
+            if not direct: return self._create_staged(main_folder, payloads, pool, threads, hardlink)
+
+            if root_path: os.makedirs(root_path, exist_ok = True)
+            if pool:
+                linkset_jobs = []
+                for linkset in self.linksets:
+                    path = main_folder + '.icdd.' + str(linkset.id) + '.part'
+                    linkset_jobs.append((_submit_linkset(pool, linkset, path, self._linkset_format(linkset)), path))
+            self._write_archive(main_folder + '.icdd', payloads, compression, linkset_jobs = linkset_jobs)
+            logger.info("container created: %s.icdd", main_folder)
+        finally:
+            if pool: pool.shutdown(cancel_futures = True)
+            for future, path in linkset_jobs or ():
+                if os.path.exists(path): os.remove(path)
+
+    def _create_staged(self, main_folder: str, payloads: list, pool = None, threads:int|None = None, hardlink:bool = False):
+
+        # Create the main folder
+        os.makedirs(main_folder, exist_ok=True)
+
+        # Create three subfolders within the main folder
+        subfolders = ["Ontology resources", "Payload documents", "Payload triples"]
+        for subfolder in subfolders:
+            os.makedirs(os.path.join(main_folder, subfolder), exist_ok=True)
+
+        for name, data in _ontology_resources():
+            with open(main_folder + '/Ontology resources/' + name, 'wb') as f:
+                f.write(data)
+
+        # add linksets, in the pool while the documents are copied
+        linkset_paths = [main_folder + '/Payload triples/' + self._linkset_filename(linkset) for linkset in self.linksets]
+        if pool: futures = [_submit_linkset(pool, linkset, path, self._linkset_format(linkset)) for linkset, path in zip(self.linksets, linkset_paths)]
+
+        # add documents, in a thread pool, linked or copied by the OS where possible
+        from concurrent.futures import ThreadPoolExecutor
+        with _span('create.payloads') as span, ThreadPoolExecutor(max_workers = threads) as copies:
+            futures_payloads = [copies.submit(_stage_payload, document, main_folder + '/' + member, hardlink) for document, member in payloads]
+            for i, future in enumerate(futures_payloads):
+                future.result()
+                _progress('payloads', i + 1, len(payloads))
+            if span: span.count(documents = len(payloads), bytes = sum(_payload_size(document) for document, member in payloads))
+
+        with _span('create.linksets') as span:
+            for i, (linkset, path) in enumerate(zip(self.linksets, linkset_paths)):
+                if pool: futures[i].result()
+                else: linkset.write(path, format = self._linkset_format(linkset))
+                _progress('linksets', i + 1, len(self.linksets))
+            span.count(linksets = len(self.linksets))
+
+        self._index_checksums()
+        with open(main_folder + '/' + self._index_member(), 'wb') as f: f.write(self._serialize_index())
         # Create a zip file
-        shutil.make_archive(str(self.container_id), 'zip', str(self.container_id))
+        with _span('create.zip'):
+            shutil.make_archive(main_folder, 'zip', main_folder)
         # Rename the zip file to have the custom extension
-        os.rename(f"{self.container_id}.zip", f"{self.container_id}.icdd")
+        os.replace(f"{main_folder}.zip", f"{main_folder}.icdd")
         
-        # Print a success message
-        print(f"container created: {main_folder}")
-
-    def open(self, icdd_path:str, temp_path: str|None = None):
+        logger.info("container created: %s", main_folder)
+
+    def _member_info_factory(self, compression: dict|None = None):
+        """ZipInfo builder choosing each member's compression from its extension, see create()."""
+        import time
+
+        compress_types = {extension: zipfile.ZIP_STORED for extension in self.STORED_EXTENSIONS}
+        if compression: compress_types.update({extension.lower(): value for extension, value in compression.items()})
+        def member_info(name, compress_type = None, extension = None):
+            info = zipfile.ZipInfo(name, date_time = time.localtime()[:6])
+            if extension is None: extension = os.path.splitext(name)[1]
+            if compress_type is None: compress_type = compress_types.get(extension.lower(), zipfile.ZIP_DEFLATED)
+            info.compress_type = compress_type
+            return info
+        return member_info
+
+    def _write_archive(self, icdd_path: str, payloads: list, compression: dict|None = None, chunk_size:int = 1 << 20, linkset_jobs: list|None = None,
+                       source: zipfile.ZipFile|None = None, skipped = ()):
+        """Stream the ontologies, payloads, linksets and index straight into a new .icdd archive.
+
+        `linkset_jobs` holds a (future, path) pair per linkset serialized by a worker process; the file at
+        `path` is copied into the archive once the future is done.
+        The members of a `source` archive that are not written otherwise, nor in `skipped` (such as the contents
+        of folder documents), are copied as well: as stored or, with `compression`, recompressed.
+        """
+        member_info = self._member_info_factory(compression)
+
+        # write next to the target and move it in place once complete, so a failure leaves nothing behind
+        partial_path = icdd_path + '.part'
+        try:
+            with zipfile.ZipFile(partial_path, 'w', allowZip64 = True) as archive:
+                for folder in ("Ontology resources/", "Payload documents/", "Payload triples/"):
+                    archive.writestr(member_info(folder, zipfile.ZIP_STORED), b'')
+
+                # a source archive brings its own ontologies, copied with its other members
+                if source is None or not any(name.startswith('Ontology resources/') and not name.endswith('/') for name in source.namelist()):
+                    for name, data in _ontology_resources():
+                        archive.writestr(member_info('Ontology resources/' + name), data)
+
+                with _span('create.payloads') as span:
+                    for i, (document, member) in enumerate(payloads):
+                        size = _payload_size(document)
+                        info = member_info(member, extension = document.file_type)
+                        with archive.open(info, 'w', force_zip64 = size * 1.01 > zipfile.ZIP64_LIMIT) as target:
+                            _copy_payload(document, target, chunk_size)
+                        span.count(documents = 1, bytes = size)
+                        _progress('payloads', i + 1, len(payloads))
+
+                with _span('create.linksets') as span:
+                    for i, linkset in enumerate(self.linksets):
+                        with archive.open(member_info('Payload triples/' + self._linkset_filename(linkset)), 'w', force_zip64 = True) as target:
+                            if linkset_jobs is None:
+                                linkset.write(target, format = self._linkset_format(linkset), chunk_size = chunk_size)
+                            else:
+                                future, path = linkset_jobs[i]
+                                future.result()
+                                with open(path, 'rb') as data: shutil.copyfileobj(data, target, chunk_size)
+                                os.remove(path)
+                        _progress('linksets', i + 1, len(self.linksets))
+                    span.count(linksets = len(self.linksets))
+
+                if source is not None:
+                    with _span('create.copy') as span:
+                        for info in source.infolist():
+                            if info.filename in archive.NameToInfo or info.filename in skipped: continue
+                            target_info = member_info(info.filename)
+                            if compression is None or info.is_dir() or target_info.compress_type == info.compress_type:
+                                _copy_member_raw(source, archive, info, chunk_size)
+                            else:
+                                with source.open(info) as data, archive.open(target_info, 'w', force_zip64 = info.file_size * 1.01 > zipfile.ZIP64_LIMIT) as target:
+                                    shutil.copyfileobj(data, target, chunk_size)
+                            span.count(members = 1, bytes = info.compress_size)
+
+                self._index_checksums()
+                archive.writestr(member_info(self._index_member()), self._serialize_index())
+            os.replace(partial_path, icdd_path)
+        finally:
+            if os.path.exists(partial_path): os.remove(partial_path)
+
+    def _decode_index(self, temp_path: str, triples = None):
+        """Read the container attributes and documents from self.index (or `triples`), walking its triples once.
+
+        Returns the (URI, file name) pairs of the linksets listed by the container description, with None for
+        a linkset the index gives no file name for. Documents and linksets are sorted by URI: an RDF graph has
+        no order, and the one rdflib iterates in changes from one process to the next.
+        """
+        fragments = {}
+        def fragment(uri):
+            if uri not in fragments: fragments[uri] = uri.fragment
+            return fragments[uri]
+
+        # group the index triples by subject
+        subjects = {}
+        descriptions = []
+        for s, p, o in self.index if triples is None else triples:
+            if s not in subjects: subjects[s] = []
+            subjects[s].append((p, o))
+            if p == self.RDF.type and o == self.CONTAINER.ContainerDescription: descriptions.append(s)
+
+        documents, linksets = [], []
+        for description in descriptions:
+            for p, o in subjects[description]:
+                if fragment(p) in self.attr_frag_map:
+                    self.__setattr__(self.attr_frag_map[fragment(p)], o.value if isinstance(o, Literal) else o)
+                # container:version, written for the version id by earlier releases
+                elif fragment(p) == 'version' and self.version_id is None: self.version_id = o.value
+                elif fragment(p) == 'containsDocument': documents.append(o)
+                elif fragment(p) == 'containsLinkset':
+                    filename = next((str(value) for q, value in subjects.get(o, ()) if fragment(q) == 'filename'), None)
+                    linksets.append((o, filename))
+        for document in sorted(documents, key = str): self.add_document(self._decode_document(document, subjects.get(document, []), fragment, temp_path))
+        linksets.sort(key = lambda linkset: str(linkset[0]))
+        return linksets
+
+    def _decode_document(self, document_uri, properties: list, fragment, temp_path: str) -> Document:
+        document_id = document_uri.split('/')[-1]
+
+        doc_type = None
+        for p, o in properties:
+            if p == self.RDF.type: doc_type = fragment(o)
+
+        if doc_type == "FolderDocument": document = FolderDocument(path = '', folder_name = '', id=document_id)
+        elif doc_type == "EncryptedDocument": document = EncryptedDocument(path = '', encryption_algorithm="", id=document_id)
+        elif doc_type == "ExternalDocument": document = ExternalDocument(url = "", id=document_id)
+        elif doc_type == "InternalDocument": document = InternalDocument(path = '', id=document_id)
+        elif doc_type == "SecuredDocument": document = SecuredDocument(path = '', id=document_id)
+        else: document = Document(path='', id=document_id)
+
+        for p, o in properties:
+            if fragment(p) in document.attr_frag_map:
+                document.__setattr__(document.attr_frag_map[fragment(p)], o.value)
+
+        if doc_type == "FolderDocument": document.path = temp_path + 'Payload documents/'+ str(document.folder_name)
+        elif doc_type == "InternalDocument": document.path = temp_path + 'Payload documents/'+ str(document.file_name) + str(document.file_type)
+        elif doc_type != "ExternalDocument": document.path = temp_path + 'Payload documents/'+ str(document_id)
+        return document
+
+    def open(self, icdd_path:str, temp_path: str|None = None, lazy:bool = False, workers:int|None = None, verify:bool|str = False,
+             storage: str|None = None, extract:bool = True, validate:bool = False):
+        """Read a .icdd file, extracting it to <temp_path>/<id>/.
+
+        With `lazy=True` nothing is extracted: the index and the linksets are parsed straight from the archive
+        and each document reads its payload on demand, through Document.open_payload() or a one-time
+        Document.extract() to the same path a full extraction would have used.
+        With `workers` > 1 the linksets are parsed in a pool of that many processes. Either way self.documents
+        and self.linksets are sorted by id, so their order does not depend on the process or on `lazy`.
+        With `verify=True` the payloads of the secured documents are checked against their checksums, in a
+        thread pool, and a ValueError lists the ones that do not match. With `verify='lazy'` each one is
+        checked on its first open_payload() or extract() instead.
+        With `storage`, a directory, the linksets are disk-backed: each one is decoded into <storage>/<id>.sqlite
+        (replacing any previous database there), in this process and without the parsed linkset cache.
+        With `extract=False` the archive is expected to be extracted to <temp_path>/<id>/ already.
+        The index may be index.ttl, index.nt or index.rdf, and its format becomes self.rdf_format. Each linkset
+        is read from the file name the index gives it, in the format of its extension or, for an unknown one,
+        of its content; that format becomes its rdf_format, so save() keeps it.
+        With `validate=True` the archive is first checked with validate_container(), and a ValueError lists the
+        violations, if any, before anything is read into the container.
+        """
+        if validate: _require_valid(icdd_path)
         if not temp_path:  temp_path = './' 
         self.id = icdd_path.split('/')[-1].split('.')[0] 
         temp_path += self.id + '/' 
 
-        # unpack the zip file
-        shutil.unpack_archive(icdd_path, temp_path, format = 'zip') 
-
-        def get_document(document_uri):
-            document_id = document_uri.split('/')[-1]
-            
-            query = """
-            PREFIX container: <https://standards.iso.org/iso/21597/-1/ed-1/en/Container#> 
-
-            SELECT ?attribute ?value
-            WHERE {{
-                <{}> ?attribute ?value .
-            }}""".format(str(document_uri))
-            
-            type_query = """
-            PREFIX container: <https://standards.iso.org/iso/21597/-1/ed-1/en/Container#> 
-            PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>  
-
-            SELECT ?type
-            WHERE {{
-                <{}> rdf:type ?type .
-            }}""".format(str(document_uri))
-
-            type_results  =self.index.query(type_query)
-            for item in type_results:
-                doc_type = item[0].fragment
-            
-            results = self.index.query(query)
-                      
-            if doc_type == "FolderDocument":
-                document = FolderDocument(path = '', folder_name = '', id=document_id)
-                for item in results:
-                    if item[0].fragment in document.attr_frag_map.keys():
-                        document.__setattr__(document.attr_frag_map[item[0].fragment], item[1].value)
-                document.path  = temp_path + 'Payload documents/'+ str(document.folder_name)
-                self.add_document(document)
-            
-            elif doc_type == "EncryptedDocument":
-                document = EncryptedDocument(path = '', encryption_algorithm="", id=document_id)
-                for item in results:
-                    if item[0].fragment in document.attr_frag_map.keys():
-                        document.__setattr__(document.attr_frag_map[item[0].fragment], item[1].value)
-                document.path  = temp_path + 'Payload documents/'+ str(document_uri.split('/')[-1])
-                self.add_document(document)
-                
-            elif doc_type == "ExternalDocument":
-                document = ExternalDocument(url = "", id=document_id)
-                for item in results:
-                    if item[0].fragment in document.attr_frag_map.keys():
-                        document.__setattr__(document.attr_frag_map[item[0].fragment], item[1].value)
-                self.add_document(document)
-
-            elif doc_type == "InternalDocument":
-                document = InternalDocument(path = '', id=document_id)
-                for item in results:
-                    if item[0].fragment in document.attr_frag_map.keys():
-                        document.__setattr__(document.attr_frag_map[item[0].fragment], item[1].value)
-                document.path  = temp_path + 'Payload documents/'+ str(document.file_name) + str(document.file_type)
-                self.add_document(document)
-
-            elif doc_type == "SecuredDocument":
-                document = SecuredDocument(path = '', id=document_id)
-                for item in results:
-                    if item[0].fragment in document.attr_frag_map.keys():
-                        document.__setattr__(document.attr_frag_map[item[0].fragment], item[1].value)
-                document.path  = temp_path + 'Payload documents/'+ str(document_uri.split('/')[-1])
-                self.add_document(document)
-            
+        if lazy:
+            self.close()
+            self._archive = _Archive(icdd_path)
+        elif extract:
+            # unpack the zip file
+            with _span('open.unpack') as span:
+                shutil.unpack_archive(icdd_path, temp_path, format = 'zip') 
+                if span: span.count(bytes = os.path.getsize(icdd_path))
+
+        def source(member):
+            # a member of the extracted tree or of the archive, with the base IRI its file would have
+            if not lazy: return temp_path + member, None
+            return self._archive.open(member), pathlib.Path(temp_path + member).absolute().as_uri()
+
+        def exists(member):
+            return member in self._archive.zip.NameToInfo if lazy else os.path.isfile(temp_path + member)
+
+        def head(member):
+            # first bytes of a member, to tell the RDF format of a file without a known extension
+            if lazy:
+                with self._archive.open(member) as f: return f.read(4096)
+            with open(temp_path + member, 'rb') as f: return f.read(4096)
+
+        def linkset_member(linkset_id, filename):
+            candidates = _linkset_members(linkset_id, filename)
+            return next((name for name in candidates if exists(name)), candidates[0])
+
+        # zip directory entries, the keys of the parsed linkset cache
+        members = {}
+        if _linkset_cache_dir:
+            if lazy: members = {info.filename: info for info in self._archive.zip.infolist()}
             else:
-                document = Document(path='', id=document_id)
-                for item in results:
-                    if item[0].fragment in document.attr_frag_map.keys():
-                        document.__setattr__(document.attr_frag_map[item[0].fragment], item[1].value)
-                document.path  = temp_path + 'Payload documents/'+ str(document_uri.split('/')[-1])
-                self.add_document(document)
-            
-            
-            
-        def get_linkset(linkset_uri):
-            linkset_id = linkset_uri.split('/')[-1]
-            linkset = Linkset(id = linkset_id )
-            # import Linkset graph
-            linkset.linkset.parse(temp_path + 'Payload triples/' + linkset_id + '.ttl') #TODO varios formatos
-
-            # find links, link elements and identifiers + attributes
-            query= """
-            PREFIX container: <https://standards.iso.org/iso/21597/-1/ed-1/en/Container#> 
-            PREFIX linkset: <https://standards.iso.org/iso/21597/-1/ed-1/en/Linkset#>
-            PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> 
-
-            SELECT ?link ?linkelement  
-            WHERE {{
-                ?link linkset:hasLinkElement ?linkelement .
-
-            }}"""
-
-            
-            results = linkset.linkset.query(query)
-            links = {}
-
-            for item in results:
-                link_id = str(item[0]).split('/')[-1]
-                linkelement_id = str(item[1]).split('/')[-1]
-                if link_id not in links.keys(): links[link_id] = []
-                document = None
-                identifier = None
-                query_linkelement = """
-                    PREFIX container: <https://standards.iso.org/iso/21597/-1/ed-1/en/Container#> 
-                    PREFIX linkset: <https://standards.iso.org/iso/21597/-1/ed-1/en/Linkset#>
-                    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> 
-
-                    SELECT ?document ?identifier
-                    WHERE {{
-                        OPTIONAL{{<{}> linkset:hasDocument ?document}}.
-                        OPTIONAL{{<{}> linkset:hasIdentifier ?identifier}} .
-                    }}""".format(str(item[1]), str(item[1]))
-                
-                linkelement_results = linkset.linkset.query(query_linkelement)
-                for linkelement_item in linkelement_results:
-                    identifier_type = None
-
-                    document = self.get_document_by_id(str(linkelement_item[0]).split('/')[-1])
-                    print(document)
-                    
-                    query_identifier_type = """
-                        PREFIX container: <https://standards.iso.org/iso/21597/-1/ed-1/en/Container#> 
-                        PREFIX linkset: <https://standards.iso.org/iso/21597/-1/ed-1/en/Linkset#>
-                        PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> 
-
-                        SELECT ?value
-                        WHERE {{
-                            <{}> rdf:type ?value .
-                        }}""".format(str(linkelement_item[1]))
-                    
-                    query_identifier_attributes = """
-                        PREFIX container: <https://standards.iso.org/iso/21597/-1/ed-1/en/Container#> 
-                        PREFIX linkset: <https://standards.iso.org/iso/21597/-1/ed-1/en/Linkset#>
-                        PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> 
-
-                        SELECT ?attribute ?value
-                        WHERE {{
-                            <{}> ?attribute ?value .
-                        }}""".format(str(linkelement_item[1]))
-                    
-                    identifier_type_results = linkset.linkset.query(query_identifier_type)
-                    for ids in identifier_type_results:
-                        identifier_type = ids[0].fragment
-                        
-                    if identifier_type == "URIBasedIdentifier":
-                        identifier = URIBasedIdentifier(uri = '')
-
-                        identifier_attributes_result = linkset.linkset.query(query_identifier_attributes)
-                        for identifier_attr in  identifier_attributes_result:
-                            if identifier_attr[0].fragment in identifier.attr_frag_map.keys():
-                                identifier.__setattr__(identifier.attr_frag_map[identifier_attr[0].fragment], identifier_attr[1].value)
-
-                    elif identifier_type == "StringBasedIdentifier":
-                        identifier = StringBasedIdentifier(identifier ='')
-
-                        identifier_attributes_result = linkset.linkset.query(query_identifier_attributes)
-                        for identifier_attr in  identifier_attributes_result:
-                            if identifier_attr[0].fragment in identifier.attr_frag_map.keys():
-                                identifier.__setattr__(identifier.attr_frag_map[identifier_attr[0].fragment], identifier_attr[1].value)
-
-                    elif identifier_type == "QueryBasedIdentifier":
-                        identifier = QueryBasedIdentifier(query_language='', query_exression='')
-
-                        identifier_attributes_result = linkset.linkset.query(query_identifier_attributes)
-                        for identifier_attr in  identifier_attributes_result:
-                            if identifier_attr[0].fragment in identifier.attr_frag_map.keys():
-                                identifier.__setattr__(identifier.attr_frag_map[identifier_attr[0].fragment], identifier_attr[1].value)
-                    
-                links[link_id].append(LinkElement(id = linkelement_id, document=document, identifier=identifier))
-            for link in links.keys():
-                linkset.add_link(Link(id=link, a= links[link][0], b = links[link][1]))
-            linkset.reset_graph()
-            self.add_linkset(linkset)
-
-        # read index graph
-        self.index.parse(temp_path + str('index.ttl')) # añadirpara que se pueda en otros formatos rdf (.rdf, .nt ... )
-
-        # read container information
-        query = """
-            PREFIX container: <https://standards.iso.org/iso/21597/-1/ed-1/en/Container#> 
-
-            SELECT ?attribute ?value
-            WHERE {
-                ?instance rdf:type container:ContainerDescription .
-                ?instance ?attribute ?value .
-            }"""
-        
-        results = self.index.query(query)
-        for item in results:
-            if item[0].fragment in self.attr_frag_map.keys():
-                self.__setattr__(self.attr_frag_map[item[0].fragment], item[1].value)
+                with zipfile.ZipFile(icdd_path) as archive: members = {info.filename: info for info in archive.infolist()}
+
+        def decode_linkset(member, format):
+            decoder_state = _cache_load('linkset', members.get(member))
+            if decoder_state is not None: return _LinksetDecoder.load(decoder_state)
+            linkset_source, base = source(member)
+            try: decoder = _decode_linkset(linkset_source, format = format, publicID = base)
+            finally:
+                if base: linkset_source.close()
+            _cache_store('linkset', members.get(member), decoder.dump())
+            return decoder
+
+        # read index graph (on its own, without the description this instance was initialized with)
+        self.reset_index_graph()
+        with _span('open.index') as span:
+            base_uri = pathlib.Path(temp_path).absolute().as_uri() + '/'
+            index_member = next((name for name in ('index' + extension for extension, _ in RDF_FORMATS.values()) if exists(name)), 'index.ttl')
+            self.rdf_format = _format_of(index_member)
+            rows = _cache_load('index', members.get(index_member))
+            if rows is not None: triples = _load_triples(rows, base_uri)
             else:
-                if item[0].fragment == 'containsDocument':
-                    get_document(item[1])
-        
-        for item in results:
-            if item[0].fragment == 'containsLinkset':
-                get_linkset(item[1])
+                index_source, base = source(index_member)
+                try: self.index.parse(index_source, format = RDF_FORMATS[self.rdf_format][1], publicID = base)
+                finally:
+                    if base: index_source.close()
+                triples = self.index
+                _cache_store('index', members.get(index_member), _dump_triples(triples, base_uri))
+            if span: span.count(triples = len(triples))
+
+        # read container information, documents and linksets in a single pass over the index triples
+        with _span('open.documents') as span:
+            indexed_linksets = self._decode_index(temp_path, triples)
+            span.count(documents = len(self.documents))
+        documents = self._document_index()
+        for document in self.documents:
+            if not isinstance(document, ExternalDocument):
+                if lazy: document._archive = self._archive
+                document._member = document.path[len(temp_path):] + ('/' if isinstance(document, FolderDocument) else '')
+        pool = _process_pool(workers, len(indexed_linksets))
+        with _span('open.linksets') as span:
+            linkset_ids = [linkset_uri.split('/')[-1] for linkset_uri, filename in indexed_linksets]
+            linkset_members = [linkset_member(linkset_id, filename) for linkset_id, (linkset_uri, filename) in zip(linkset_ids, indexed_linksets)]
+            formats = {member: _format_of(member, lambda: head(member)) for member in linkset_members}
+            decoders = {}
+            if storage:
+                if pool: pool.shutdown()
+                pool = None
+                os.makedirs(storage, exist_ok = True)
+            if pool:
+                # cached linksets are not sent to the workers
+                for member in linkset_members:
+                    decoder_state = _cache_load('linkset', members.get(member))
+                    if decoder_state is not None: decoders[member] = _LinksetDecoder.load(decoder_state)
+                jobs = []
+                for member in linkset_members:
+                    if member in decoders: continue
+                    if lazy: jobs.append((member, formats[member], icdd_path, pathlib.Path(temp_path + member).absolute().as_uri()))
+                    else: jobs.append((temp_path + member, formats[member], None, None))
+                if len(jobs) < 2: pool.shutdown()
+                else:
+                    with pool:
+                        for member, decoder in zip([member for member in linkset_members if member not in decoders], pool.map(_parse_linkset, *zip(*jobs))):
+                            _cache_store('linkset', members.get(member), decoder.dump())
+                            decoders[member] = decoder
+            for i, (linkset_id, member) in enumerate(zip(linkset_ids, linkset_members)):
+                if storage:
+                    database = os.path.join(storage, linkset_id + '.sqlite')
+                    for path in (database, database + '-wal', database + '-shm'):
+                        if os.path.exists(path): os.remove(path)
+                    linkset = Linkset(id = linkset_id, storage = database, documents = documents, rdf_format = formats[member])
+                    linkset_source, base = source(member)
+                    try: linkset.parse(linkset_source, format = formats[member], publicID = base)
+                    finally:
+                        if base: linkset_source.close()
+                else:
+                    linkset = Linkset(id = linkset_id, rdf_format = formats[member])
+                    linkset._add_decoded(decoders[member] if member in decoders else decode_linkset(member, formats[member]), documents)
+                self.add_linkset(linkset)
+                _progress('linksets', i + 1, len(linkset_ids))
+            if span: span.count(linksets = len(indexed_linksets), links = sum(len(linkset.links) for linkset in self.linksets))
         
         self.reset_index_graph()
+        self._mark_clean(icdd_path, dict(zip(linkset_ids, linkset_members)))
+
+        secured = [document for document in self.documents if isinstance(document, SecuredDocument) and document.checksum]
+        if verify == 'lazy':
+            for document in secured: document._verify = True
+        elif verify and secured:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor() as threads:
+                failed = [str(document.id) for document, ok in zip(secured, threads.map(SecuredDocument.verify, secured)) if not ok]
+            if failed: raise ValueError(f"checksum mismatch for documents {', '.join(failed)}")
+
+    @staticmethod
+    def iter_links(icdd_path: str, linkset_id: uuid.UUID|str|None = None, temp_path: str|None = None, window: int = 64):
+        """Yield a (linkset id, Link) pair for each link of an .icdd file, or of its linkset `linkset_id`, as the
+        linksets are read from the archive.
+
+        Nothing is extracted and no Linkset is built. Only the index is read up front, for the documents the
+        link elements refer to; they read their payloads from the archive, as after open(lazy=True) with the
+        same `temp_path`. A link is handed out once `window` more links have been read, so a linkset written
+        one link after the other (as Linkset.write() does) takes the memory of the documents and of a few links,
+        whatever its size. A linkset in another order is held until its end, like open() holds it.
+        """
+        archive = _Archive(icdd_path)
+        try:
+            if not temp_path: temp_path = './'
+            container, linksets = _read_index(archive.zip, icdd_path, temp_path + os.path.basename(icdd_path).split('.')[0] + '/')
+            if linkset_id is not None:
+                linksets = [(id, member) for id, member in linksets if id == str(linkset_id)]
+                if not linksets: raise ValueError(f"{icdd_path} has no linkset {linkset_id}")
+            for document in container.documents:
+                if not isinstance(document, ExternalDocument): document._archive = archive
+            for id, member in linksets:
+                if member not in archive.zip.NameToInfo: raise ValueError(f"linkset file {member} is not in {icdd_path}")
+                for link in _stream_links(archive.zip, member, container._document_index(), window): yield id, link
+        finally: archive.close()
+
+    def _mark_clean(self, icdd_path: str, linkset_members: dict|None = None):
+        """Record the archive as the source of save(), with the member each linkset is stored in (by default the
+        one its id and format give)."""
+        self._source_path = icdd_path
+        self._source_payloads = {document._member for document in self.documents if document._member}
+        self._source_linksets = {str(linkset.id): (linkset_members or {}).get(str(linkset.id)) or 'Payload triples/' + self._linkset_filename(linkset)
+                                 for linkset in self.linksets}
+        for document in self.documents: document._dirty = False
+        for linkset in self.linksets: linkset._mark_clean()
+
+    @property
+    def dirty(self) -> bool:
+        """True if documents or linksets were added, removed or changed since open()/save().
+        Container attributes are not tracked: save() always rewrites the index."""
+        if self._source_path is None: return True
+        return (any(document.dirty or not document._member and not isinstance(document, ExternalDocument) for document in self.documents)
+                or any(linkset.dirty for linkset in self.linksets)
+                or {document._member for document in self.documents if document._member} != self._source_payloads
+                or {str(linkset.id): 'Payload triples/' + self._linkset_filename(linkset) for linkset in self.linksets} != self._source_linksets)
+
+    def save(self, icdd_path: str|None = None, compression: dict|None = None, chunk_size:int = 1 << 20):
+        """Write the container back to an .icdd file, by default the one it was opened from, in place.
+
+        Only the index, new or dirty linksets and new payloads are written; every other member of the
+        source archive is copied as stored, without recompressing it. The modification date is updated.
+        A container that was never opened or saved is written in full, like create(direct=True).
+        """
+        import datetime
 
+        source_path = self._source_path
+        if icdd_path is None: icdd_path = source_path
+        if icdd_path is None: raise ValueError("the container was not opened from an .icdd file, pass icdd_path")
 
+        self.modification_date = datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+        self.reset_index_graph()
+        self._initialize_container()
+        payloads = self._index_documents()
+
+        if source_path is None:
+            self._write_archive(icdd_path, payloads, compression, chunk_size)
+            for document, member in payloads: document._member = member
+            self._mark_clean(icdd_path)
+            return
+
+        # members of the source archive that are replaced or gone
+        skipped = {'index' + extension for extension, _ in RDF_FORMATS.values()}
+        removed_payloads = self._source_payloads - {document._member for document in self.documents if document._member}
+        linksets = {'Payload triples/' + self._linkset_filename(linkset): linkset for linkset in self.linksets}
+        skipped.update(member for member, linkset in linksets.items() if linkset.dirty)
+        # linksets that are gone, or stored under another name (a new rdf_format)
+        skipped.update(member for member in self._source_linksets.values() if member not in linksets)
+        new_payloads = [(document, member) for document, member in payloads if not document._member]
+
+        member_info = self._member_info_factory(compression)
+        partial_path = icdd_path + '.part'
+        try:
+            with zipfile.ZipFile(source_path) as source, zipfile.ZipFile(partial_path, 'w', allowZip64 = True) as archive:
+                kept = set()
+                with _span('save.copy') as span:
+                    for info in source.infolist():
+                        name = info.filename
+                        if name in skipped or name in removed_payloads: continue
+                        if any(member.endswith('/') and name.startswith(member) for member in removed_payloads): continue
+                        _copy_member_raw(source, archive, info, chunk_size)
+                        kept.add(name)
+                        span.count(members = 1, bytes = info.compress_size)
+
+                with _span('save.payloads') as span:
+                    for i, (document, member) in enumerate(new_payloads):
+                        if member in kept: raise ValueError(f"{member} is already in the container")
+                        size = _payload_size(document)
+                        with archive.open(member_info(member, extension = document.file_type), 'w', force_zip64 = size * 1.01 > zipfile.ZIP64_LIMIT) as target:
+                            _copy_payload(document, target, chunk_size)
+                        kept.add(member)
+                        span.count(documents = 1, bytes = size)
+                        _progress('payloads', i + 1, len(new_payloads))
+
+                with _span('save.linksets') as span:
+                    written = [(member, linkset) for member, linkset in linksets.items() if member not in kept]
+                    for i, (member, linkset) in enumerate(written):
+                        with archive.open(member_info(member), 'w', force_zip64 = True) as target:
+                            linkset.write(target, format = self._linkset_format(linkset), chunk_size = chunk_size)
+                        _progress('linksets', i + 1, len(written))
+                    span.count(linksets = len(written))
+
+                self._index_checksums()
+                archive.writestr(member_info(self._index_member()), self._serialize_index())
+            if self._archive is not None: self._archive.close()
+            os.replace(partial_path, icdd_path)
+        finally:
+            if os.path.exists(partial_path): os.remove(partial_path)
+
+        for document, member in new_payloads: document._member = member
+        if self._archive is not None: self._archive.path = icdd_path
+        self._mark_clean(icdd_path)
+
+    async def acreate(self, root_path:str|None = None, direct:bool = False, compression: dict|None = None, workers:int|None = None,
+                      concurrency:int = 4, executor = None, threads:int|None = None, hardlink:bool = False, rdf_format: str|None = None):
+        """create() for asyncio code, without blocking the event loop.
+
+        The secured payloads of a direct build are hashed first, at most `concurrency` at a time, so that writing
+        the archive finds their checksums in the cache; a staged build copies and hashes `threads` (by default
+        `concurrency`) payloads at a time. The build itself runs in `executor` (a thread pool, by default the
+        loop's), and with `workers` > 1 the linksets are serialized in a process pool, as in create(), which
+        also takes `hardlink` and `rdf_format`.
+        """
+        loop = asyncio.get_running_loop()
+        if direct:
+            limit = asyncio.Semaphore(concurrency)
+            async def hash_payload(document):
+                async with limit:
+                    await loop.run_in_executor(executor, file_checksum, document.path, document.checksum_algorithm or CHECKSUM_ALGORITHM)
+            await asyncio.gather(*(hash_payload(document) for document in self.documents if isinstance(document, SecuredDocument) and not _in_archive(document)))
+        await loop.run_in_executor(executor, functools.partial(self.create, root_path, direct, compression, workers, threads = threads or concurrency,
+                                                               hardlink = hardlink, rdf_format = rdf_format))
+
+    async def aopen(self, icdd_path:str, temp_path: str|None = None, lazy:bool = False, workers:int|None = None,
+                    verify:bool|str = False, storage: str|None = None, concurrency:int = 4, executor = None, validate:bool = False):
+        """open() for asyncio code, without blocking the event loop.
+
+        The archive members are extracted, and the secured payloads verified, at most `concurrency` at a time.
+        Validating the archive with `validate=True` (before anything is extracted) and decoding the index and
+        the linksets run in `executor` (a thread pool, by default the loop's), and with `workers` > 1 the
+        linksets are parsed in a process pool, as in open().
+        """
+        loop = asyncio.get_running_loop()
+        limit = asyncio.Semaphore(concurrency)
+        async def bounded(function, *args):
+            async with limit: return await loop.run_in_executor(executor, function, *args)
+
+        if validate: await loop.run_in_executor(executor, _require_valid, icdd_path)
+
+        if not lazy:
+            target = (temp_path or './') + icdd_path.split('/')[-1].split('.')[0] + '/'
+            with _span('open.unpack'):
+                archive = _Archive(icdd_path)
+                try:
+                    members = await loop.run_in_executor(executor, archive.zip.infolist)
+                    for info in members:
+                        # same rule as shutil.unpack_archive: nothing outside the target folder
+                        if os.path.isabs(info.filename) or '..' in info.filename.split('/'): raise ValueError(f"unsafe member {info.filename} in {icdd_path}")
+                    os.makedirs(target, exist_ok = True)
+                    await asyncio.gather(*(bounded(archive.extract, info.filename, os.path.join(target, info.filename))
+                                           for info in members if not info.is_dir()))
+                    for info in members:
+                        if info.is_dir(): os.makedirs(os.path.join(target, info.filename), exist_ok = True)
+                finally: archive.close()
+
+        await loop.run_in_executor(executor, functools.partial(self.open, icdd_path, temp_path, lazy, workers,
+                                                               verify = 'lazy' if verify == 'lazy' else False, storage = storage, extract = False))
+        if verify and verify != 'lazy':
+            secured = [document for document in self.documents if isinstance(document, SecuredDocument) and document.checksum]
+            results = await asyncio.gather(*(bounded(document.verify) for document in secured))
+            failed = [str(document.id) for document, ok in zip(secured, results) if not ok]
+            if failed: raise ValueError(f"checksum mismatch for documents {', '.join(failed)}")
+
+    def diff(self, other: 'Container', payloads: bool = False) -> dict:
+        """What changed from this container to `other`, a newer version of it.
+
+        Returns {'documents': Diff, 'linksets': Diff, 'links': {linkset id: Diff}}. Documents are matched by
+        id and changed when their document_fingerprint() differs, which covers their payload bytes with
+        `payloads=True`. Linksets are matched by id and changed when their links differ, see Linkset.diff();
+        'links' holds the link differences of the changed ones.
+        """
+        def fingerprints(container):
+            return {str(document.id): document_fingerprint(document, payloads) for document in container.documents}
+
+        with _span('container.diff'):
+            old, new = fingerprints(self), fingerprints(other)
+            documents = Diff([document_id for document_id in new if document_id not in old],
+                             [document_id for document_id in old if document_id not in new],
+                             [document_id for document_id, fingerprint in new.items() if old.get(document_id, fingerprint) != fingerprint])
+            old_linksets = {str(linkset.id): linkset for linkset in self.linksets}
+            new_linksets = {str(linkset.id): linkset for linkset in other.linksets}
+            links = {}
+            for linkset_id, linkset in new_linksets.items():
+                if linkset_id in old_linksets:
+                    diff = old_linksets[linkset_id].diff(linkset)
+                    if diff: links[linkset_id] = diff
+            linksets = Diff([linkset_id for linkset_id in new_linksets if linkset_id not in old_linksets],
+                            [linkset_id for linkset_id in old_linksets if linkset_id not in new_linksets], list(links))
+        return {'documents': documents, 'linksets': linksets, 'links': links}
+
+    def merge(self, other: 'Container') -> 'Container':
+        """A new Container with the documents and linksets of this container and of `other`.
+
+        It keeps the id, attributes and RDF format of this container. Documents are merged by id, the one of
+        `other` replacing one with the same id here. A linkset in only one of the two is taken over as it is;
+        the links of one in both are merged by link_fingerprint(), so that identical links are kept once (with
+        the id they have here), and a link of `other` replaces the one with its id here if their content differs.
+        The documents stay the objects of the inputs: create() copies the payloads of a lazily opened input from
+        its archive, which must stay open until then.
+        """
+        merged = Container(conformance_indicator = self.conformance_indicator, id = self.container_id)
+        for attribute in set(self.attr_frag_map.values()): setattr(merged, attribute, getattr(self, attribute))
+        merged.rdf_format = self.rdf_format
+        merged.reset_index_graph()
+        merged._initialize_container()
+
+        documents = {str(document.id): document for document in self.documents}
+        documents.update((str(document.id), document) for document in other.documents)
+        for document in documents.values(): merged.add_document(document)
+
+        with _span('container.merge') as span:
+            other_linksets = {str(linkset.id): linkset for linkset in other.linksets}
+            merged_ids = set()
+            for linkset in self.linksets:
+                newer = other_linksets.get(str(linkset.id))
+                merged.add_linkset(linkset if newer is None else self._merge_linkset(linkset, newer, documents))
+                merged_ids.add(str(linkset.id))
+            for linkset_id, linkset in other_linksets.items():
+                if linkset_id not in merged_ids: merged.add_linkset(linkset)
+            span.count(documents = len(merged.documents), linksets = len(merged.linksets))
+        return merged
+
+    @staticmethod
+    def _merge_linkset(linkset: Linkset, other: Linkset, documents: dict) -> Linkset:
+        """One linkset with the links of `linkset` and `other`, identical links once, see merge()."""
+        replaced = other.fingerprints()
+        # the merged rows go straight into columns: millions of kept row tuples would keep the garbage collector busy
+        columns = [[] for _ in _LINK_COLUMNS]
+        appends = [column.append for column in columns]
+        seen = set()
+        for source in (linkset, other):
+            for row in source._rows():
+                fingerprint = _row_fingerprint(row)
+                if fingerprint in seen: continue
+                if source is linkset and replaced.get(str(row[0]), fingerprint) != fingerprint: continue
+                seen.add(fingerprint)
+                for append, value in zip(appends, row): append(value)
+
+        merged = Linkset(id = linkset.id, rdf_format = linkset.rdf_format, intern = linkset.intern or other.intern)
+        if columns[0]: merged._columns.append(_LinkColumns(_text_columns(columns), dict(documents)))
+        return merged
+
+    def close(self):
+        """Release the archive kept open by open(lazy=True)."""
+        if self._archive is not None: self._archive.close()
+
+
+# Batch processing
+# `python -m ICDD stats|validate|metadata|repack` runs one command over many .icdd files in a process pool. Each
+# worker loads the ontologies (and the compiled validation schema) once, in its initializer, and then handles one
+# file at a time. stats, validate and metadata read the archives in place; repack extracts each one into its own
+# directory below a batch temp directory, removed as soon as the file is done, so temp space never exceeds
+# workers x max_temp. A failing file becomes a record with its error, and the batch goes on.
+BATCH_COMMANDS = ('stats', 'validate', 'metadata', 'repack')
+
+def _batch_init():
+    try: _schema()
+    except FileNotFoundError: pass   # validate reports it for each file
+
+def _batch_paths(patterns) -> list:
+    """The .icdd files of directories (searched recursively), glob patterns and plain paths, each once, sorted."""
+    import glob
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for folder, _, names in os.walk(pattern):
+                paths.update(os.path.join(folder, name) for name in names if name.lower().endswith('.icdd'))
+        elif glob.has_magic(pattern): paths.update(path for path in glob.glob(pattern, recursive = True) if os.path.isfile(path))
+        else: paths.add(pattern)
+    return sorted(paths)
+
+def _parse_size(text: str) -> int:
+    """A byte count written as 1048576, 512K, 200M or 2G."""
+    text = text.strip().upper().removesuffix('B')
+    factor = 1 << {'K': 10, 'M': 20, 'G': 30, 'T': 40}.get(text[-1:], 0)
+    return int(float(text[:-1] if factor > 1 else text) * factor)
+
+def _json_value(value):
+    # dates read from an index are datetime objects, and ids may be UUIDs
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+def _read_index(archive: zipfile.ZipFile, icdd_path: str, temp_path: str = '') -> tuple:
+    """A Container with the attributes and documents of an archive's index, their paths below `temp_path`, and
+    the (linkset id, member) pairs the index lists, without reading the linksets or payloads."""
+    names = archive.NameToInfo
+    index_member = next((name for name in ('index' + extension for extension, _ in RDF_FORMATS.values()) if name in names), None)
+    if index_member is None: raise ValueError(f"{icdd_path} has no index.ttl, index.nt or index.rdf")
+    container = Container()
+    container.id = os.path.basename(icdd_path).split('.')[0]
+    container.reset_index_graph()
+    container.rdf_format = _format_of(index_member)
+    with archive.open(index_member) as stream:
+        container.index.parse(stream, format = RDF_FORMATS[container.rdf_format][1], publicID = 'file:///')
+    indexed_linksets = container._decode_index(temp_path)
+    for document in container.documents:
+        if not isinstance(document, ExternalDocument):
+            document._member = document.path[len(temp_path):] + ('/' if isinstance(document, FolderDocument) else '')
+    linksets = []
+    for linkset_uri, filename in indexed_linksets:
+        linkset_id = linkset_uri.split('/')[-1]
+        candidates = _linkset_members(linkset_id, filename)
+        linksets.append((linkset_id, next((name for name in candidates if name in names), candidates[0])))
+    container.reset_index_graph()
+    return container, linksets
+
+def _batch_stats(icdd_path: str, temp_path: str, options: dict) -> dict:
+    with zipfile.ZipFile(icdd_path) as archive:
+        container, linksets = _read_index(archive, icdd_path)
+        document_types = {}
+        for document in container.documents:
+            name = type(document).__name__
+            document_types[name] = document_types.get(name, 0) + 1
+        links = link_elements = 0
+        for linkset_id, member in linksets:
+            def head():
+                with archive.open(member) as stream: return stream.read(4096)
+            with archive.open(member) as stream:
+                decoder = _decode_linkset(stream, _format_of(member, head), 'file:///' + member.replace(' ', '%20'))
+            links += len(decoder.link_elements)
+            # distinct ones: a link element may have no document, or be shared by several links
+            link_elements += len({element for elements in decoder.link_elements.values() for element in elements})
+        infos = archive.infolist()
+        return {'size': os.path.getsize(icdd_path), 'members': len(infos), 'uncompressed': sum(info.file_size for info in infos),
+                'documents': len(container.documents), 'document_types': document_types, 'linksets': len(linksets),
+                'links': links, 'link_elements': link_elements}
+
+def _batch_validate(icdd_path: str, temp_path: str, options: dict) -> dict:
+    violations = validate_container(icdd_path)
+    return {'valid': not violations, 'violations': [str(violation) for violation in violations]}
+
+def _batch_metadata(icdd_path: str, temp_path: str, options: dict) -> dict:
+    with zipfile.ZipFile(icdd_path) as archive: container, linksets = _read_index(archive, icdd_path)
+    def attributes(target, attr_frag_map):
+        return {attribute: getattr(target, attribute) for attribute in attr_frag_map.values() if getattr(target, attribute, None) is not None}
+    documents = []
+    for document in container.documents:
+        record = {'id': str(document.id), 'type': type(document).__name__}
+        if document._member is not None: record['member'] = document._member
+        record.update(attributes(document, document.attr_frag_map))
+        documents.append(record)
+    return {'container': {'id': container.id, **attributes(container, container.attr_frag_map)}, 'documents': documents,
+            'linksets': [{'id': linkset_id, 'member': member} for linkset_id, member in linksets]}
+
+def _batch_repack(icdd_path: str, temp_path: str, options: dict) -> dict:
+    with zipfile.ZipFile(icdd_path) as archive:
+        infos = archive.infolist()
+    needed = sum(info.file_size for info in infos)
+    if options.get('max_temp') and needed > options['max_temp']:
+        raise ValueError(f"extracting it takes {needed} bytes, over the temp space limit of {options['max_temp']}")
+    container = Container()
+    container.open(icdd_path, temp_path + '/')
+    if options.get('rdf_format'):
+        container.rdf_format = _rdf_format(options['rdf_format'])
+        for linkset in container.linksets: linkset.rdf_format = None
+    compression = None
+    if options.get('compression'):
+        compress_type = zipfile.ZIP_STORED if options['compression'] == 'stored' else zipfile.ZIP_DEFLATED
+        extensions = {os.path.splitext(info.filename)[1] for info in infos} | {extension for extension, _ in RDF_FORMATS.values()}
+        compression = {extension: compress_type for extension in extensions}
+    target = os.path.join(options['output_dir'], os.path.basename(icdd_path))
+    container.reset_index_graph()
+    container._initialize_container()
+    # everything else (folder documents, other files) is copied from the source archive
+    skipped = {'index' + extension for extension, _ in RDF_FORMATS.values()} | set(container._source_linksets.values())
+    with zipfile.ZipFile(icdd_path) as source:
+        container._write_archive(target, container._index_documents(), compression, source = source, skipped = skipped)
+    with zipfile.ZipFile(target) as archive: missing = {info.filename for info in infos} - skipped - set(archive.namelist())
+    if missing:
+        os.remove(target)
+        raise ValueError(f"the repacked container lacks {', '.join(sorted(missing))}")
+    return {'output': target, 'size': os.path.getsize(icdd_path), 'new_size': os.path.getsize(target)}
+
+_BATCH_JOBS = {'stats': _batch_stats, 'validate': _batch_validate, 'metadata': _batch_metadata, 'repack': _batch_repack}
+
+def _batch_job(command: str, icdd_path: str, temp_root: str, options: dict) -> dict:
+    """Run one batch command on one file, in a directory of its own below temp_root that is removed afterwards.
+    Never raises: a failure is reported in the record."""
+    import tempfile
+    start = time.perf_counter()
+    temp_path = tempfile.mkdtemp(dir = temp_root)
+    record = {'path': icdd_path, 'ok': True, 'seconds': None}
+    try: record.update(_BATCH_JOBS[command](icdd_path, temp_path, options))
+    except Exception as error:
+        record['ok'] = False
+        record['error'] = f"{type(error).__name__}: {error}"
+    finally:
+        shutil.rmtree(temp_path, ignore_errors = True)
+    record['seconds'] = round(time.perf_counter() - start, 4)
+    return record
+
+def batch(command: str, paths, workers: int|None = None, temp_dir: str|None = None, max_temp: int|None = None, **options):
+    """Run a batch command ('stats', 'validate', 'metadata' or 'repack') over .icdd files, yielding one record
+    (a dict with 'path', 'ok', 'seconds' and either the command's results or an 'error') per file, as the files
+    are done.
+
+    `paths` are files, directories (searched recursively for .icdd files) or glob patterns. The files are
+    processed in a pool of `workers` processes (by default one per CPU). repack needs `output_dir`, takes
+    `rdf_format` and `compression` ('stored' or 'deflated', for every member), copies every member besides the
+    index and the linksets over from the source archive, and extracts each archive into a directory below
+    `temp_dir` that is removed when the file is done; a file that would extract to more than `max_temp` bytes
+    fails instead.
+    """
+    import tempfile
+    if command not in BATCH_COMMANDS: raise ValueError(f"unknown batch command {command}, expected one of {', '.join(BATCH_COMMANDS)}")
+    if command == 'repack':
+        if not options.get('output_dir'): raise ValueError("repack needs an output_dir")
+        os.makedirs(options['output_dir'], exist_ok = True)
+    options['max_temp'] = max_temp
+    files = _batch_paths([paths] if isinstance(paths, str) else paths)
+    with tempfile.TemporaryDirectory(prefix = 'icdd-batch-', dir = temp_dir) as temp_root:
+        pool = _process_pool(workers or os.cpu_count(), len(files), _batch_init)
+        if pool is None:
+            _batch_init()
+            for icdd_path in files: yield _batch_job(command, icdd_path, temp_root, options)
+            return
+        from concurrent.futures import as_completed
+        try:
+            futures = [pool.submit(_batch_job, command, icdd_path, temp_root, options) for icdd_path in files]
+            for future in as_completed(futures): yield future.result()
+        finally: pool.shutdown(cancel_futures = True)
+
+def main(argv: list|None = None) -> int:
+    import argparse
+    import json
+    import sys
+    parser = argparse.ArgumentParser(prog = 'python -m ICDD', description = 'Run a command over many .icdd files, one JSON line per file.')
+    parser.add_argument('command', choices = BATCH_COMMANDS)
+    parser.add_argument('paths', nargs = '+', help = '.icdd files, directories or glob patterns')
+    parser.add_argument('--workers', type = int, help = 'worker processes (default: one per CPU)')
+    parser.add_argument('--output', help = 'write the JSON lines to this file instead of stdout')
+    parser.add_argument('--temp-dir', help = 'where repack extracts the archives (default: the system temp dir)')
+    parser.add_argument('--max-temp', type = _parse_size, help = 'largest extraction per worker, e.g. 2G; bigger files fail')
+    parser.add_argument('--output-dir', help = 'repack: where the repacked files go, under their own names')
+    parser.add_argument('--rdf-format', choices = sorted(RDF_FORMATS), help = 'repack: format of the index and linksets')
+    parser.add_argument('--compression', choices = ('stored', 'deflated'), help = 'repack: compression of every member')
+    args = parser.parse_args(argv)
+    if args.command == 'repack' and not args.output_dir: parser.error('repack needs --output-dir')
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    start = time.perf_counter()
+    files = failed = invalid = 0
+    try:
+        for record in batch(args.command, args.paths, args.workers, args.temp_dir, args.max_temp, output_dir = args.output_dir,
+                            rdf_format = args.rdf_format, compression = args.compression):
+            output.write(json.dumps(record, default = _json_value) + '\n')
+            output.flush()
+            files += 1
+            if not record['ok']:
+                failed += 1
+                print(f"{record['path']}: {record['error']}", file = sys.stderr)
+            elif record.get('valid') is False: invalid += 1
+    finally:
+        if output is not sys.stdout: output.close()
+    summary = f"{files} files in {time.perf_counter() - start:.1f} s, {failed} failed"
+    if args.command == 'validate': summary += f", {invalid} invalid"
+    print(summary, file = sys.stderr)
+    return 1 if failed or invalid else 0
+
+if __name__ == '__main__':
+    # run the module imported under its own name, so the worker processes find the same functions and classes
+    import sys
+    import ICDD
+    sys.exit(ICDD.main())
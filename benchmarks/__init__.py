@@ -0,0 +1,9 @@
+"""Offline benchmarks for the ICDD library.
+
+    python -m benchmarks --scenario small --save small
+    python -m benchmarks --scenario small --compare small
+
+See generator.py for the synthetic containers and runner.py for the measurements.
+"""
+from .generator import generate_container, write_payloads, SCENARIOS
+from .runner import run, compare, save_baseline, load_baseline
@@ -0,0 +1,37 @@
+import argparse
+import sys
+
+from .generator import SCENARIOS
+from .runner import CASES, run, compare, machine, save_baseline, load_baseline, format_results
+
+
+def main(argv: list|None = None) -> int:
+    parser = argparse.ArgumentParser(prog = 'python -m benchmarks', description = 'Benchmark the ICDD library on a synthetic container.')
+    parser.add_argument('--scenario', default = 'small', choices = sorted(SCENARIOS))
+    parser.add_argument('--cases', nargs = '+', default = list(CASES), choices = CASES)
+    parser.add_argument('--repeat', type = int, default = 3, help = 'runs per case, the best wall time is kept')
+    parser.add_argument('--workdir', help = 'where the temporary files go (default: the system temp dir)')
+    parser.add_argument('--save', metavar = 'NAME', help = 'store the results as baseline NAME (or a .json path)')
+    parser.add_argument('--compare', metavar = 'NAME', help = 'fail if the results regress against baseline NAME')
+    parser.add_argument('--tolerance', type = float, default = 0.25, help = 'allowed relative wall time increase')
+    parser.add_argument('--rss-tolerance', type = float, default = 0.25, help = 'allowed relative peak RSS increase')
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(args.compare) if args.compare else None
+    if baseline and baseline['scenario'] != args.scenario:
+        parser.error(f"baseline {args.compare} was measured on scenario {baseline['scenario']}, not {args.scenario}")
+    if baseline and baseline.get('machine') != machine():
+        print(f"warning: baseline {args.compare} was measured on another machine ({baseline.get('machine')}), save a local one with --save", file = sys.stderr)
+
+    try: results = run(args.scenario, tuple(args.cases), args.repeat, args.workdir)
+    except FileNotFoundError as error: parser.exit(2, f"{error}\n")   # no published ontologies for create()
+    print(format_results(results, baseline))
+    if args.save: print(f"baseline saved: {save_baseline(args.save, args.scenario, results)}")
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance, args.rss_tolerance)
+        for regression in regressions: print(f"REGRESSION {regression}", file = sys.stderr)
+        if regressions: return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Synthetic ICDD containers, fully determined by their parameters and a seed."""
+import os
+import random
+import uuid
+
+from ICDD import (Container, Document, FolderDocument, EncryptedDocument, ExternalDocument, InternalDocument,
+                  SecuredDocument, URIBasedIdentifier, StringBasedIdentifier, QueryBasedIdentifier,
+                  LinkElement, Link, Linkset)
+
+DOCUMENT_TYPES = ('InternalDocument', 'ExternalDocument', 'FolderDocument', 'EncryptedDocument', 'SecuredDocument')
+IDENTIFIER_TYPES = ('URIBasedIdentifier', 'StringBasedIdentifier', 'QueryBasedIdentifier', None)
+
+# parameters of generate_container(), by scenario name
+SCENARIOS = {
+    'small': {
+        'documents': 20, 'document_types': {'InternalDocument': 3, 'ExternalDocument': 1, 'FolderDocument': 1, 'EncryptedDocument': 1, 'SecuredDocument': 1},
+        'payload_size': 64 << 10, 'linksets': 2, 'links_per_linkset': 2000,
+        'identifier_types': {'URIBasedIdentifier': 2, 'StringBasedIdentifier': 2, 'QueryBasedIdentifier': 1, None: 1},
+    },
+    'medium': {
+        'documents': 200, 'document_types': {'InternalDocument': 3, 'ExternalDocument': 1, 'FolderDocument': 1, 'EncryptedDocument': 1, 'SecuredDocument': 1},
+        'payload_size': 1 << 20, 'linksets': 4, 'links_per_linkset': 25000,
+        'identifier_types': {'URIBasedIdentifier': 2, 'StringBasedIdentifier': 2, 'QueryBasedIdentifier': 1, None: 1},
+    },
+    'large': {
+        'documents': 1000, 'document_types': {'InternalDocument': 3, 'ExternalDocument': 1, 'FolderDocument': 1, 'EncryptedDocument': 1, 'SecuredDocument': 1},
+        'payload_size': 4 << 20, 'linksets': 8, 'links_per_linkset': 125000,
+        'identifier_types': {'URIBasedIdentifier': 2, 'StringBasedIdentifier': 2, 'QueryBasedIdentifier': 1, None: 1},
+    },
+}
+
+FOLDER_FILES = 4
+
+
+def _pick(rng: random.Random, weights: dict, count: int) -> list:
+    choices, values = list(weights), list(weights.values())
+    return rng.choices(choices, values, k = count)
+
+def _document_types(documents: int, document_types: dict, seed: int) -> list:
+    return _pick(random.Random(seed), document_types, documents)
+
+def _payload_path(root: str, index: int, document_type: str) -> str:
+    if document_type == 'FolderDocument': return os.path.join(root, f'folder_{index}')
+    return os.path.join(root, f'payload_{index}.bin')
+
+def write_payloads(root: str, documents: int = 10, document_types: dict|None = None, payload_size: int = 1 << 16, seed: int = 0, **_) -> int:
+    """Write the payload files of a generated container to `root`, returning their total size in bytes.
+
+    Payloads are random, so they do not compress. Files that already have the right size are kept.
+    """
+    document_types = document_types or {'InternalDocument': 1}
+    rng = random.Random(seed + 1)
+    total = 0
+    os.makedirs(root, exist_ok = True)
+    for index, document_type in enumerate(_document_types(documents, document_types, seed)):
+        if document_type == 'ExternalDocument': continue
+        path = _payload_path(root, index, document_type)
+        if document_type == 'FolderDocument':
+            os.makedirs(path, exist_ok = True)
+            paths = [os.path.join(path, f'part_{i}.bin') for i in range(FOLDER_FILES)]
+            size = payload_size // FOLDER_FILES
+        else: paths, size = [path], payload_size
+        for path in paths:
+            if not (os.path.exists(path) and os.path.getsize(path) == size):
+                with open(path, 'wb') as f: f.write(rng.randbytes(size))
+            total += size
+    return total
+
+def _identifier(identifier_type: str|None, rng: random.Random):
+    if identifier_type == 'URIBasedIdentifier': return URIBasedIdentifier(uri = f'http://example.org/element/{rng.getrandbits(64):016x}')
+    if identifier_type == 'StringBasedIdentifier': return StringBasedIdentifier(identifier = f'{rng.getrandbits(128):032x}', identifier_field = 'GlobalId')
+    if identifier_type == 'QueryBasedIdentifier': return QueryBasedIdentifier(query_language = 'SPARQL', query_exression = f'SELECT ?e WHERE {{ ?e <http://example.org/id> "{rng.getrandbits(64):x}" }}')
+    return None
+
+def generate_linkset(documents: list, links: int, identifier_types: dict|None = None, seed: int = 0) -> Linkset:
+    """A linkset of `links` links between random pairs of `documents`."""
+    identifier_types = identifier_types or {None: 1}
+    rng = random.Random(seed)
+    linkset = Linkset(id = uuid.UUID(int = rng.getrandbits(128)))
+    kinds = _pick(rng, identifier_types, 2 * links)
+    for i in range(links):
+        a, b = rng.choice(documents), rng.choice(documents)
+        linkset.add_link(Link(LinkElement(a, _identifier(kinds[2 * i], rng), id = uuid.UUID(int = rng.getrandbits(128))),
+                              LinkElement(b, _identifier(kinds[2 * i + 1], rng), id = uuid.UUID(int = rng.getrandbits(128))),
+                              id = uuid.UUID(int = rng.getrandbits(128))))
+    return linkset
+
+def generate_container(root: str, documents: int = 10, document_types: dict|None = None, payload_size: int = 1 << 16,
+                       linksets: int = 1, links_per_linkset: int = 1000, identifier_types: dict|None = None,
+                       seed: int = 0, payloads: bool = True) -> Container:
+    """An in-memory Container whose documents point to payload files under `root`.
+
+    `document_types` and `identifier_types` map type names (see DOCUMENT_TYPES and IDENTIFIER_TYPES, where None
+    is a link element on the whole document) to relative weights. The payload files are written unless
+    `payloads` is False, in which case write_payloads() must have been called with the same parameters.
+    """
+    document_types = document_types or {'InternalDocument': 1}
+    if payloads: write_payloads(root, documents, document_types, payload_size, seed)
+
+    rng = random.Random(seed)
+    container = Container(id = uuid.UUID(int = rng.getrandbits(128)))
+    for index, document_type in enumerate(_document_types(documents, document_types, seed)):
+        path = os.path.abspath(_payload_path(root, index, document_type))
+        document_id = uuid.UUID(int = rng.getrandbits(128))
+        if document_type == 'InternalDocument': document = InternalDocument(path, id = document_id)
+        elif document_type == 'ExternalDocument': document = ExternalDocument(url = f'https://example.org/documents/{index}.pdf', id = document_id)
+        elif document_type == 'FolderDocument': document = FolderDocument(path, folder_name = os.path.basename(path), id = document_id)
+        elif document_type == 'EncryptedDocument': document = EncryptedDocument(path, encryption_algorithm = 'AES-256', id = document_id)
+        elif document_type == 'SecuredDocument': document = SecuredDocument(path, id = document_id)
+        else: document = Document(path, id = document_id)
+        container.add_document(document)
+
+    for i in range(linksets):
+        container.add_linkset(generate_linkset(container.documents, links_per_linkset, identifier_types, seed = seed + 100 + i))
+    return container
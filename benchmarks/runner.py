@@ -0,0 +1,166 @@
+"""Wall time, peak RSS and throughput of the main ICDD operations on a generated container.
+
+Each case runs in a fresh process, so its peak RSS is not inflated by the cases before it.
+"""
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+from .generator import generate_container, write_payloads, SCENARIOS
+
+CASES = ('create', 'create_staged', 'open', 'open_lazy', 'serialize', 'parse')
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+
+def _reset_peak_rss() -> bool:
+    # Linux resets the VmHWM high-water mark when 5 is written to clear_refs
+    try:
+        with open('/proc/self/clear_refs', 'w') as f: f.write('5')
+        return True
+    except OSError: return False
+
+def _peak_rss() -> float|None:
+    """Peak resident set size of this process in MB, None where it cannot be read."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'): return int(line.split()[1]) / 1024
+    except OSError: pass
+    try: import resource
+    except ImportError: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+def _measure(case: str, params: dict, workdir: str, repeat: int) -> dict:
+    """Run one case `repeat` times in this (fresh) process: best wall time, highest peak RSS."""
+    from ICDD import Container, Linkset, _ontology_resources
+
+    payload_dir = os.path.join(workdir, 'payloads')
+    links = params['linksets'] * params['links_per_linkset']
+    # loaded once per process, as in any process that creates more than one container: not part of a run
+    _ontology_resources()
+    size = 0
+    if case in ('create', 'create_staged', 'serialize'):
+        container = generate_container(payload_dir, payloads = False, **params)
+    if case in ('create', 'create_staged'):
+        out = os.path.join(workdir, case)
+        os.makedirs(out, exist_ok = True)
+        size = write_payloads(payload_dir, **params)
+        run = lambda: container.create(out, direct = case == 'create')
+    elif case in ('open', 'open_lazy'):
+        icdd_path = os.path.join(workdir, 'container.icdd')
+        size = os.path.getsize(icdd_path)
+        def run():
+            opened = Container()
+            opened.open(icdd_path, os.path.join(workdir, case) + '/', lazy = case == 'open_lazy')
+            opened.close()
+    elif case == 'serialize':
+        out = os.path.join(workdir, case)
+        os.makedirs(out, exist_ok = True)
+        def run():
+            for linkset in container.linksets: linkset.serialize(os.path.join(out, str(linkset.id) + '.ttl'), 'ttl')
+        run()
+        size = sum(os.path.getsize(os.path.join(out, name)) for name in os.listdir(out))
+    elif case == 'parse':
+        linkset_dir = os.path.join(workdir, 'linksets')
+        paths = [os.path.join(linkset_dir, name) for name in sorted(os.listdir(linkset_dir))]
+        size = sum(os.path.getsize(path) for path in paths)
+        def run():
+            for path in paths: Linkset().parse(path, format = 'turtle')
+    else: raise ValueError(f"unknown benchmark case {case}")
+
+    wall, peak = None, None
+    for _ in range(repeat):
+        reset = _reset_peak_rss()
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        rss = _peak_rss() if reset or peak is None else None
+        wall = elapsed if wall is None else min(wall, elapsed)
+        if rss is not None: peak = rss if peak is None else max(peak, rss)
+    return {
+        'wall_s': round(wall, 4),
+        'peak_rss_mb': None if peak is None else round(peak, 1),
+        'links_per_s': round(links / wall, 1) if wall else None,
+        'mb_per_s': round(size / (1 << 20) / wall, 2) if wall else None,
+    }
+
+def _prepare(params: dict, workdir: str):
+    """Write the payloads, a container and its linksets once, as inputs of the open and parse cases."""
+    from ICDD import Container
+
+    payload_dir = os.path.join(workdir, 'payloads')
+    container = generate_container(payload_dir, **params)
+    container.create(workdir, direct = True)
+    os.replace(os.path.join(workdir, container.container_id + '.icdd'), os.path.join(workdir, 'container.icdd'))
+    linkset_dir = os.path.join(workdir, 'linksets')
+    os.makedirs(linkset_dir, exist_ok = True)
+    for linkset in container.linksets: linkset.write(os.path.join(linkset_dir, str(linkset.id) + '.ttl'), format = 'ttl')
+
+def run(scenario: str|dict = 'small', cases: tuple = CASES, repeat: int = 3, workdir: str|None = None) -> dict:
+    """Measure `cases` on a scenario (a name in SCENARIOS or generate_container() parameters).
+
+    Returns {case: {'wall_s', 'peak_rss_mb', 'links_per_s', 'mb_per_s'}}, with the best wall time of `repeat` runs.
+    """
+    params = SCENARIOS[scenario] if isinstance(scenario, str) else scenario
+    with tempfile.TemporaryDirectory(dir = workdir) as tmp:
+        _prepare(params, tmp)
+        results = {}
+        context = multiprocessing.get_context('spawn')
+        for case in cases:
+            with ProcessPoolExecutor(max_workers = 1, mp_context = context) as process:
+                results[case] = process.submit(_measure, case, params, tmp, repeat).result()
+    return results
+
+def _baseline_path(name: str) -> str:
+    return name if name.endswith('.json') else os.path.join(BASELINE_DIR, name + '.json')
+
+def machine() -> dict:
+    """What a baseline was measured on; timings only compare on the same machine."""
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+def save_baseline(name: str, scenario: str|dict, results: dict) -> str:
+    """Store results as a baseline, in benchmarks/baselines/<name>.json unless `name` is a .json path."""
+    path = _baseline_path(name)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok = True)
+    baseline = {
+        'scenario': scenario,
+        'machine': machine(),
+        'results': results,
+    }
+    with open(path + '.part', 'w') as f: json.dump(baseline, f, indent = 2, sort_keys = True)
+    os.replace(path + '.part', path)
+    return path
+
+def load_baseline(name: str) -> dict:
+    with open(_baseline_path(name)) as f: return json.load(f)
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.25, rss_tolerance: float = 0.25, slack: float = 0.02) -> list:
+    """Regressions of `results` against a baseline's results, as messages; an empty list means none.
+
+    A case regresses when its wall time exceeds the baseline by more than `tolerance` (relative) plus `slack`
+    seconds, which absorbs timer noise on very short cases, or its peak RSS by more than `rss_tolerance`.
+    """
+    regressions = []
+    for case, old in baseline.get('results', baseline).items():
+        new = results.get(case)
+        if new is None: continue
+        if new['wall_s'] > old['wall_s'] * (1 + tolerance) + slack:
+            regressions.append(f"{case}: wall time {new['wall_s']:.3f} s, baseline {old['wall_s']:.3f} s")
+        if new['peak_rss_mb'] and old['peak_rss_mb'] and new['peak_rss_mb'] > old['peak_rss_mb'] * (1 + rss_tolerance):
+            regressions.append(f"{case}: peak RSS {new['peak_rss_mb']:.1f} MB, baseline {old['peak_rss_mb']:.1f} MB")
+    return regressions
+
+def format_results(results: dict, baseline: dict|None = None) -> str:
+    old = (baseline or {}).get('results', {})
+    lines = [f"{'case':<14}{'wall s':>10}{'peak MB':>10}{'links/s':>12}{'MB/s':>10}" + ('   baseline s' if old else '')]
+    for case, result in results.items():
+        line = f"{case:<14}{result['wall_s']:>10.3f}{result['peak_rss_mb'] or 0:>10.1f}{result['links_per_s'] or 0:>12.0f}{result['mb_per_s'] or 0:>10.2f}"
+        if case in old: line += f"{old[case]['wall_s']:>13.3f}"
+        lines.append(line)
+    return '\n'.join(lines)
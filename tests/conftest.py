@@ -0,0 +1,47 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ICDD
+
+
+ONTOLOGIES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ontologies')
+
+
+@pytest.fixture(autouse=True)
+def ontology_cache(monkeypatch):
+    """Run every test offline, with tests/ontologies (standing in for the published ontologies) as the ontology
+    cache directory, whatever ICDD_ONTOLOGY_CACHE says."""
+    def offline(name):
+        raise OSError('no network in the tests')
+    monkeypatch.setattr(ICDD, '_download_ontology', offline)
+    ICDD.set_ontology_cache_dir(ONTOLOGIES)
+    yield
+    ICDD.set_ontology_cache_dir(None)
+
+
+def build_container(folder, documents=2, links=10, intern=False, linksets=1):
+    """A Container with `documents` internal documents (payload files in `folder`) and `linksets` linksets of
+    `links` links each, alternating URI, string and query based identifiers."""
+    container = ICDD.Container()
+    payloads = []
+    for i in range(documents):
+        path = os.path.join(str(folder), f'doc{i}.txt')
+        with open(path, 'w') as f: f.write(f'payload {i}\n' * 100)
+        document = ICDD.InternalDocument(path=path, format='text/plain')
+        container.add_document(document)
+        payloads.append(document)
+    for _ in range(linksets):
+        linkset = ICDD.Linkset(intern=intern)
+        for i in range(links):
+            identifiers = (ICDD.URIBasedIdentifier(f'http://example.org/element/{i % 7}'),
+                           ICDD.StringBasedIdentifier(f'GUID{i % 5}', 'GlobalId'),
+                           ICDD.QueryBasedIdentifier('SPARQL', f'SELECT ?x WHERE {{ ?x ?p {i % 3} }}'))
+            a = ICDD.LinkElement(payloads[i % documents], identifiers[i % 3])
+            b = ICDD.LinkElement(payloads[(i + 1) % documents], identifiers[(i + 1) % 3])
+            linkset.add_link(ICDD.Link(a, b))
+        container.add_linkset(linkset)
+    return container
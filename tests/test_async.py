@@ -0,0 +1,34 @@
+import asyncio
+import os
+import zipfile
+
+import pytest
+
+import ICDD
+from conftest import build_container
+
+
+def test_acreate_forwards_create_options(tmp_path):
+    container = build_container(tmp_path, linksets=2)
+    asyncio.run(container.acreate(str(tmp_path), direct=False, hardlink=True, rdf_format='nt', concurrency=2))
+    main_folder = tmp_path / container.container_id
+    # staged payloads hard-linked to their sources
+    staged = main_folder / 'Payload documents' / 'doc0.txt'
+    assert os.path.samefile(str(staged), container.documents[0].path)
+    with zipfile.ZipFile(str(tmp_path / (container.container_id + '.icdd'))) as archive: names = archive.namelist()
+    assert 'index.nt' in names
+    assert sorted(name for name in names if name.startswith('Payload triples/') and not name.endswith('/')) == \
+        sorted('Payload triples/' + str(linkset.id) + '.nt' for linkset in container.linksets)
+
+
+def test_aopen_validate(tmp_path):
+    container = build_container(tmp_path)
+    container.create(str(tmp_path), direct=True)
+    icdd_path = str(tmp_path / (container.container_id + '.icdd'))
+    broken_path = str(tmp_path / 'broken.icdd')
+    with zipfile.ZipFile(icdd_path) as source, zipfile.ZipFile(broken_path, 'w') as target:
+        for info in source.infolist():
+            if not info.filename.startswith('Payload triples/') or info.is_dir(): target.writestr(info, source.read(info))
+    with pytest.raises(ValueError, match='not a valid container'):
+        asyncio.run(ICDD.Container().aopen(broken_path, str(tmp_path / 'broken') + '/', validate=True))
+    assert not os.path.exists(str(tmp_path / 'broken'))
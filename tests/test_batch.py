@@ -0,0 +1,91 @@
+import zipfile
+
+import pytest
+from rdflib import RDF, Graph, Literal, URIRef
+
+import ICDD
+from conftest import build_container
+
+FOLDER_FILES = {'Payload documents/model/': b'', 'Payload documents/model/part1.txt': b'part one ' * 2000,
+                'Payload documents/model/sub/part2.bin': bytes(range(256)) * 50, 'readme.txt': b'not in the index'}
+
+
+def container_with_folder(tmp_path):
+    """A container whose index lists a folder document, with its files (and one unlisted file) in the archive."""
+    container = build_container(tmp_path, documents=2, links=10)
+    container.create(str(tmp_path), direct=True)
+    icdd_path = str(tmp_path / (container.container_id + '.icdd'))
+    with zipfile.ZipFile(icdd_path) as archive: index = archive.read('index.ttl')
+    graph = Graph().parse(data=index, format='turtle', publicID='file:///')
+    folder = URIRef('file:///index#folder')
+    graph.add((URIRef('file:///'), URIRef(ICDD.CONTAINER_NAMESPACE + 'containsDocument'), folder))
+    graph.add((folder, RDF.type, URIRef(ICDD.CONTAINER_NAMESPACE + 'FolderDocument')))
+    graph.add((folder, URIRef(ICDD.CONTAINER_NAMESPACE + 'foldername'), Literal('model')))
+    with zipfile.ZipFile(icdd_path) as source, zipfile.ZipFile(str(tmp_path / 'folder.icdd'), 'w', zipfile.ZIP_DEFLATED) as target:
+        for info in source.infolist():
+            target.writestr(info, graph.serialize(format='turtle', encoding='utf-8') if info.filename == 'index.ttl' else source.read(info))
+        for name, data in FOLDER_FILES.items(): target.writestr(name, data)
+    return str(tmp_path / 'folder.icdd')
+
+
+@pytest.mark.parametrize('options', [{}, {'compression': 'stored'}, {'rdf_format': 'nt'}])
+def test_repack_keeps_every_member(tmp_path, options):
+    icdd_path = container_with_folder(tmp_path)
+    record, = ICDD.batch('repack', icdd_path, workers=1, output_dir=str(tmp_path / 'out'), **options)
+    assert record['ok'], record
+    with zipfile.ZipFile(icdd_path) as source, zipfile.ZipFile(record['output']) as repacked:
+        assert repacked.testzip() is None
+        # the index and the linksets change format, the ontologies stay Turtle
+        renamed = lambda name: name.replace('.ttl', '.nt') if options.get('rdf_format') and not name.startswith('Ontology resources/') else name
+        assert sorted(repacked.namelist()) == sorted(renamed(name) for name in source.namelist())
+        for name, data in FOLDER_FILES.items():
+            assert repacked.read(name) == data
+            if options.get('compression') == 'stored' and data: assert repacked.getinfo(name).compress_type == zipfile.ZIP_STORED
+    opened = ICDD.Container()
+    opened.open(record['output'], str(tmp_path / 'open') + '/')
+    assert sorted(type(document).__name__ for document in opened.documents) == ['FolderDocument', 'InternalDocument', 'InternalDocument']
+    assert (tmp_path / 'open' / 'folder' / 'Payload documents' / 'model' / 'sub' / 'part2.bin').read_bytes() == FOLDER_FILES['Payload documents/model/sub/part2.bin']
+
+
+# three links over four link elements: e1 is shared by two links, e3 has an identifier but no document
+HAND_WRITTEN_LINKSET = '''@prefix inst: <./> .
+@prefix linkset: <https://standards.iso.org/iso/21597/-1/ed-1/en/Linkset#> .
+@prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+
+inst:l1 rdf:type linkset:Link .
+inst:l1 linkset:hasLinkElement inst:e1 .
+inst:l1 linkset:hasLinkElement inst:e2 .
+inst:l2 rdf:type linkset:Link .
+inst:l2 linkset:hasLinkElement inst:e1 .
+inst:l2 linkset:hasLinkElement inst:e3 .
+inst:l3 rdf:type linkset:Link .
+inst:l3 linkset:hasLinkElement inst:e2 .
+inst:l3 linkset:hasLinkElement inst:e4 .
+inst:e1 rdf:type linkset:LinkElement .
+inst:e1 linkset:hasDocument inst:{document} .
+inst:e2 rdf:type linkset:LinkElement .
+inst:e2 linkset:hasDocument inst:{document} .
+inst:e3 rdf:type linkset:LinkElement .
+inst:e3 linkset:hasIdentifier inst:i3 .
+inst:i3 rdf:type linkset:URIBasedIdentifier .
+inst:i3 linkset:uri "http://example.org/element"^^xsd:anyURI .
+inst:e4 rdf:type linkset:LinkElement .
+inst:e4 linkset:hasDocument inst:{document} .
+'''
+
+
+def test_stats_counts_hand_written_linkset(tmp_path):
+    container = build_container(tmp_path, documents=2, links=1)
+    container.create(str(tmp_path), direct=True)
+    icdd_path = str(tmp_path / (container.container_id + '.icdd'))
+    member = 'Payload triples/' + str(container.linksets[0].id) + '.ttl'
+    stats_path = str(tmp_path / 'stats.icdd')
+    with zipfile.ZipFile(icdd_path) as source, zipfile.ZipFile(stats_path, 'w') as target:
+        for info in source.infolist():
+            if info.filename == member: target.writestr(info, HAND_WRITTEN_LINKSET.format(document=container.documents[0].id))
+            else: target.writestr(info, source.read(info))
+    record, = ICDD.batch('stats', stats_path, workers=1)
+    assert record['ok'], record
+    assert (record['documents'], record['linksets'], record['links'], record['link_elements']) == (2, 1, 3, 4)
+    assert record['document_types'] == {'InternalDocument': 2}
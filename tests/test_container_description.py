@@ -0,0 +1,95 @@
+import datetime
+import zipfile
+
+from rdflib import Graph, URIRef
+
+import ICDD
+from conftest import build_container
+
+ATTRIBUTES = {
+    'address': 'Jordi Girona 1-3, Barcelona',
+    'checksum': '0123abcd',
+    'checksum_algorithm': 'SHA-256',
+    'description': 'a container\nover two lines',
+    'name': 'test container',
+    'published_by': 'UPC',
+    'user_id': 'user-42',
+    'version_id': '2.1',
+    'version_description': 'second revision',
+    'website': 'https://example.org/',
+}
+
+
+def icdd_path_of(tmp_path, container):
+    return str(tmp_path / (container.container_id + '.icdd'))
+
+
+def index_predicates(icdd_path):
+    with zipfile.ZipFile(icdd_path) as archive: data = archive.read('index.ttl')
+    graph = Graph().parse(data=data, format='turtle', publicID='file:///')
+    return {str(p).split('#')[-1] for p in graph.predicates(URIRef('file:///'))}
+
+
+def test_create_writes_every_attribute(tmp_path):
+    container = build_container(tmp_path)
+    for attribute, value in ATTRIBUTES.items(): setattr(container, attribute, value)
+    container.create(str(tmp_path), direct=True)
+    icdd_path = icdd_path_of(tmp_path, container)
+    assert set(container.attr_frag_map) - {'modificationDate'} <= index_predicates(icdd_path)
+    assert 'version' not in index_predicates(icdd_path)
+    opened = ICDD.Container()
+    opened.open(icdd_path, str(tmp_path / 'open') + '/')
+    for attribute, value in ATTRIBUTES.items(): assert getattr(opened, attribute) == value, attribute
+
+
+def test_open_modify_save_open(tmp_path):
+    container = build_container(tmp_path)
+    container.create(str(tmp_path), direct=True)
+    icdd_path = icdd_path_of(tmp_path, container)
+
+    opened = ICDD.Container()
+    opened.open(icdd_path, str(tmp_path / 'open') + '/')
+    creation_date = opened.creation_date
+    for attribute, value in ATTRIBUTES.items(): setattr(opened, attribute, value)
+    opened.save()
+
+    reopened = ICDD.Container()
+    reopened.open(icdd_path, str(tmp_path / 'reopen') + '/')
+    for attribute, value in ATTRIBUTES.items(): assert getattr(reopened, attribute) == value, attribute
+    assert reopened.creation_date == creation_date
+    assert isinstance(reopened.modification_date, datetime.datetime)
+    assert set(ICDD.Container.attr_frag_map) <= index_predicates(icdd_path)
+
+    # and once more, with values read back from the index
+    reopened.name = 'renamed'
+    reopened.save()
+    again = ICDD.Container()
+    again.open(icdd_path, str(tmp_path / 'again') + '/')
+    assert again.name == 'renamed' and again.version_id == '2.1' and again.creation_date == creation_date
+
+
+def test_published_by_party_node(tmp_path):
+    container = build_container(tmp_path)
+    container.published_by = URIRef('https://example.org/parties/upc')
+    container.create(str(tmp_path), direct=True)
+    opened = ICDD.Container()
+    opened.open(icdd_path_of(tmp_path, container), str(tmp_path / 'open') + '/')
+    assert opened.published_by == URIRef('https://example.org/parties/upc')
+
+
+def test_reads_container_version_of_earlier_releases(tmp_path):
+    container = build_container(tmp_path)
+    container.create(str(tmp_path), direct=True)
+    icdd_path = icdd_path_of(tmp_path, container)
+    legacy_path = str(tmp_path / 'legacy.icdd')
+    with zipfile.ZipFile(icdd_path) as source, zipfile.ZipFile(legacy_path, 'w') as target:
+        for info in source.infolist():
+            data = source.read(info)
+            if info.filename == 'index.ttl':
+                graph = Graph().parse(data=data, format='turtle', publicID='file:///')
+                graph.add((URIRef('file:///'), URIRef(ICDD.CONTAINER_NAMESPACE + 'version'), ICDD.Literal('1.0')))
+                data = graph.serialize(format='turtle', encoding='utf-8')
+            target.writestr(info, data)
+    opened = ICDD.Container()
+    opened.open(legacy_path, str(tmp_path / 'open') + '/')
+    assert opened.version_id == '1.0'
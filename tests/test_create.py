@@ -0,0 +1,90 @@
+import os
+import zipfile
+
+import pytest
+
+import ICDD
+from conftest import build_container
+
+
+@pytest.mark.parametrize('direct, workers', [(True, None), (True, 2), (False, None)])
+def test_create_in_a_directory_that_does_not_exist(tmp_path, direct, workers):
+    container = build_container(tmp_path, linksets=2)
+    root = tmp_path / 'out' / 'nested'
+    container.create(str(root), direct=direct, workers=workers)
+    icdd_path = root / (container.container_id + '.icdd')
+    with zipfile.ZipFile(icdd_path) as archive:
+        assert archive.testzip() is None
+        assert 'index.ttl' in archive.namelist()
+    assert sorted(path.name for path in root.iterdir() if path.is_file()) == [icdd_path.name]
+
+
+@pytest.mark.parametrize('direct', [True, False])
+def test_create_from_a_lazily_opened_container(tmp_path, direct):
+    (tmp_path / 'src').mkdir()
+    container = build_container(tmp_path / 'src')
+    secured_path = tmp_path / 'src' / 'secured.bin'
+    secured_path.write_bytes(bytes(range(256)) * 40)
+    secured = ICDD.SecuredDocument(path=str(secured_path))
+    container.add_document(secured)
+    container.create(str(tmp_path / 'src'), direct=True)
+    icdd_path = str(tmp_path / 'src' / (container.container_id + '.icdd'))
+    with zipfile.ZipFile(icdd_path) as archive:
+        payloads = {name: archive.read(name) for name in archive.namelist() if name.startswith('Payload documents/') and not name.endswith('/')}
+
+    opened = ICDD.Container()
+    opened.open(icdd_path, str(tmp_path / 'lazy') + '/', lazy=True)
+    assert not any((tmp_path / 'lazy').rglob('*.txt'))
+    opened.create(str(tmp_path / 'copy'), direct=direct)
+
+    with zipfile.ZipFile(tmp_path / 'copy' / (opened.container_id + '.icdd')) as archive:
+        assert archive.testzip() is None
+        assert {name: archive.read(name) for name in payloads} == payloads
+    reopened = ICDD.Container()
+    reopened.open(str(tmp_path / 'copy' / (opened.container_id + '.icdd')), str(tmp_path / 'reopen') + '/', verify=True)
+    assert sorted(str(document.id) for document in reopened.documents) == sorted(str(document.id) for document in container.documents)
+    assert reopened.get_document_by_id(secured.id).checksum == secured.checksum
+
+
+def test_payload_view_maps_the_archive_and_the_file(tmp_path):
+    container = build_container(tmp_path)
+    image = tmp_path / 'image.png'
+    image.write_bytes(bytes(range(256)) * 40)
+    document = ICDD.InternalDocument(path=str(image))
+    container.add_document(document)
+    container.create(str(tmp_path), direct=True)
+    icdd_path = str(tmp_path / (container.container_id + '.icdd'))
+
+    opened = ICDD.Container()
+    opened.open(icdd_path, str(tmp_path / 'lazy') + '/', lazy=True)
+    stored, compressed = opened.get_document_by_id(document.id), opened.get_document_by_id(container.documents[0].id)
+    # a stored member is mapped from the archive, without extracting it
+    view = stored.payload_view()
+    assert view.readonly and view == image.read_bytes() and not os.path.exists(stored.path)
+    with pytest.raises(ValueError, match='compressed'): compressed.payload_view()
+    # an extracted or plain payload is mapped from its file
+    compressed.extract()
+    assert compressed.payload_view() == open(container.documents[0].path, 'rb').read()
+    assert document.payload_view() == image.read_bytes()
+
+
+@pytest.mark.parametrize('unavailable', [(), ('reflink',), ('reflink', 'copy_file_range')])
+def test_stage_payload_falls_back(tmp_path, monkeypatch, unavailable):
+    import fcntl
+    calls = []
+    def failing(name, function):
+        def call(*args):
+            calls.append(name)
+            if name in unavailable: raise OSError(95, 'Operation not supported')
+            return function(*args)
+        return call
+    monkeypatch.setattr(fcntl, 'ioctl', failing('reflink', fcntl.ioctl))
+    if hasattr(os, 'copy_file_range'): monkeypatch.setattr(os, 'copy_file_range', failing('copy_file_range', os.copy_file_range))
+    source = tmp_path / 'source.bin'
+    source.write_bytes(bytes(range(256)) * 4000)
+    target = tmp_path / 'staged.bin'
+    target.write_bytes(b'an older payload')
+    ICDD._stage_payload(ICDD.InternalDocument(path=str(source)), str(target))
+    assert target.read_bytes() == source.read_bytes()
+    assert calls[0] == 'reflink'
+    if 'reflink' in unavailable and hasattr(os, 'copy_file_range'): assert 'copy_file_range' in calls
@@ -0,0 +1,55 @@
+import os
+import zipfile
+
+import pytest
+
+import ICDD
+from conftest import build_container
+
+
+def linkset_members(icdd_path):
+    with zipfile.ZipFile(icdd_path) as archive:
+        return {name: archive.read(name) for name in archive.namelist() if name.startswith('Payload triples/') and not name.endswith('/')}
+
+
+def linkset_members_of(container, folder, rdf_format):
+    folder.mkdir()
+    container.create(str(folder), direct=True, rdf_format=rdf_format)
+    return next(iter(linkset_members(str(folder / (container.container_id + '.icdd'))).values()))
+
+
+def interned_container(folder, storage=None):
+    container = build_container(folder, documents=3, links=200, intern=True, linksets=2)
+    documents = container.documents
+    # a block of columns, and a disk-backed linkset
+    container.linksets[0].add_links([documents[i % 3] for i in range(100)], [documents[(i + 1) % 3] for i in range(100)],
+                                    'uri', [f'http://example.org/{i % 4}' for i in range(100)], 'string', [f'G{i % 6}' for i in range(100)])
+    if storage:
+        linkset = ICDD.Linkset(storage=os.path.join(str(storage), 'links.sqlite'), intern=True)
+        for link in container.linksets[1].links: linkset.add_link(link)
+        container.linksets[1] = linkset
+    return container
+
+
+@pytest.mark.parametrize('rdf_format', ['ttl', 'nt'])
+@pytest.mark.parametrize('direct', [True, False])
+def test_pool_writes_interned_linksets_like_serial(tmp_path, rdf_format, direct):
+    container = interned_container(tmp_path, storage=tmp_path)
+    serial, pooled = tmp_path / 'serial', tmp_path / 'pooled'
+    serial.mkdir(), pooled.mkdir()
+    container.create(str(serial), direct=direct, rdf_format=rdf_format)
+    container.create(str(pooled), direct=direct, rdf_format=rdf_format, workers=2)
+    name = container.container_id + '.icdd'
+    serial_members, pooled_members = linkset_members(str(serial / name)), linkset_members(str(pooled / name))
+    assert len(serial_members) == 2
+    assert serial_members == pooled_members
+
+    # shared link elements were written once, and stream back
+    plain = build_container(tmp_path, documents=3, links=200, linksets=1)
+    plain.linksets[0].add_links([container.documents[i % 3] for i in range(100)], [container.documents[(i + 1) % 3] for i in range(100)],
+                                'uri', [f'http://example.org/{i % 4}' for i in range(100)], 'string', [f'G{i % 6}' for i in range(100)])
+    plain_size = len(linkset_members_of(plain, tmp_path / 'plain', rdf_format))
+    interned_size = len(pooled_members['Payload triples/' + str(container.linksets[0].id) + '.' + rdf_format])
+    assert interned_size < plain_size / 2
+    links = list(ICDD.Container.iter_links(str(pooled / name), temp_path=str(tmp_path / 'stream') + '/'))
+    assert len(links) == 300 + 200
@@ -0,0 +1,318 @@
+import hashlib
+import io
+import os
+import zipfile
+
+import pytest
+from rdflib import Graph, Literal, URIRef
+
+import ICDD
+from conftest import build_container
+
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+# values the writer has to escape, or that only a \u escape can carry
+AWKWARD = ['quote " and backslash \\', 'new\nline and carriage\rreturn', 'tab\tand ünïcödé ✓ 𝄞', 'ends with a dot .', '"']
+
+
+def rows(linkset):
+    # the two link elements of a link are not ordered in RDF
+    text = lambda values: tuple(None if value is None else str(value) for value in values)
+    return sorted((str(row[0]), sorted([text(row[1:7]), text(row[7:13])], key=str)) for row in linkset._rows())
+
+
+def awkward_linkset():
+    documents = [ICDD.InternalDocument(path=f'/tmp/doc{i}.txt') for i in range(2)]
+    linkset = ICDD.Linkset()
+    for i, value in enumerate(AWKWARD):
+        linkset.add_link(ICDD.Link(ICDD.LinkElement(documents[0], ICDD.StringBasedIdentifier(value, value)),
+                                   ICDD.LinkElement(documents[1], ICDD.QueryBasedIdentifier(value, value))))
+        linkset.add_link(ICDD.Link(ICDD.LinkElement(documents[1], ICDD.URIBasedIdentifier('http://example.org/' + str(i))),
+                                   ICDD.LinkElement(None)))
+    return linkset, {str(document.id): document for document in documents}
+
+
+def read_lines(data):
+    triples = []
+    ICDD._read_lines(io.BytesIO(data.encode('utf-8')), lambda s, p, o: triples.append((s, str(p), o)))
+    return triples
+
+
+@pytest.mark.parametrize('format', ['nt', 'ttl'])
+def test_write_parse_round_trip(format):
+    linkset, documents = awkward_linkset()
+    stream = io.BytesIO()
+    linkset.write(stream, format=format)
+    stream.seek(0)
+    parsed = ICDD.Linkset()
+    parsed.parse(stream, format=format, documents=documents)
+    assert rows(parsed) == rows(linkset)
+
+
+@pytest.mark.parametrize('format', ['nt', 'ttl'])
+def test_write_matches_the_rdflib_graph(format):
+    # the streamed triples are the ones serialize() used to build in a graph
+    linkset, documents = awkward_linkset()
+    stream = io.BytesIO()
+    linkset.write(stream, format=format)
+    written = Graph().parse(data=stream.getvalue().decode('utf-8'), format=ICDD.RDF_FORMATS[format][1], publicID='file:///')
+    expected = Graph().parse(data=''.join(ICDD._nt_lines(linkset._add_triples(Graph()))), format='nt')
+    assert written.isomorphic(expected)
+
+
+@pytest.mark.parametrize('format', ['nt', 'ttl'])
+def test_fast_path_agrees_with_rdflib(format):
+    linkset, documents = awkward_linkset()
+    stream = io.BytesIO()
+    linkset.write(stream, format=format)
+    fast = ICDD._decode_linkset(io.BytesIO(stream.getvalue()), format)
+    slow = ICDD._LinksetDecoder()
+    ICDD._TripleSink(slow.add).parse(io.BytesIO(stream.getvalue()), format=ICDD.RDF_FORMATS[format][1], publicID='file:///')
+    as_rows = lambda decoder: sorted(tuple(None if value is None else str(value) for value in ICDD._element_values(element))
+                                     for link in decoder.links(documents) for element in (link.a, link.b))
+    assert as_rows(fast) == as_rows(slow)
+
+
+def test_read_lines_escapes_and_literals():
+    triples = read_lines(
+        '@prefix ex: <http://example.org/> .\n'
+        '@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .\n'
+        '# a comment\n'
+        'ex:s ex:p "caf\\u00e9 \\U0001D11E \\"q\\" \\\\ \\n \\t" .\n'
+        'ex:s ex:p "hello"@en-GB .\n'
+        'ex:s ex:p "42"^^xsd:integer .\n'
+        'ex:s ex:p "text"^^xsd:string .\n'
+        '<http://example.org/s> a ex:C .\n'
+        '_:b0 <http://example.org/p> "x"^^<http://www.w3.org/2001/XMLSchema#anyURI> .\n')
+    assert triples == [
+        ('http://example.org/s', 'http://example.org/p', 'café 𝄞 "q" \\ \n \t'),
+        ('http://example.org/s', 'http://example.org/p', Literal('hello', lang='en-GB')),
+        ('http://example.org/s', 'http://example.org/p', Literal('42', datatype=URIRef(XSD + 'integer'))),
+        ('http://example.org/s', 'http://example.org/p', 'text'),
+        ('http://example.org/s', 'http://www.w3.org/1999/02/22-rdf-syntax-ns#type', 'http://example.org/C'),
+        ('b0', 'http://example.org/p', 'x'),
+    ]
+
+
+def test_read_lines_across_chunks():
+    linkset, documents = awkward_linkset()
+    stream = io.BytesIO()
+    linkset.write(stream, format='ttl', chunk_size=10)
+    whole, chunked = [], []
+    ICDD._read_lines(io.BytesIO(stream.getvalue()), lambda *triple: whole.append(triple))
+    # lines, and multi-byte characters, split between chunks
+    ICDD._read_lines(io.BytesIO(stream.getvalue()), lambda *triple: chunked.append(triple), chunk_size=7)
+    assert chunked == whole and len(whole) > len(AWKWARD) * 10
+
+
+def test_read_lines_plain_literal_wrapper():
+    triples = []
+    ICDD._read_lines(io.BytesIO(b'<http://a> <http://p> "v" .\n<http://a> <http://p> <http://v> .\n'),
+                     lambda s, p, o: triples.append(o), literal=ICDD._PlainLiteral)
+    assert [type(o) for o in triples] == [ICDD._PlainLiteral, str]
+
+
+@pytest.mark.parametrize('data', [
+    '@prefix ex: <http://example.org/> .\nex:s ex:p "a" ;\n    ex:q "b" .\n',
+    '@prefix ex: <http://example.org/> .\nex:s ex:p "a", "b" .\n',
+    '@prefix ex: <http://example.org/> .\nex:s ex:p """multi\nline""" .\n',
+    '@prefix ex: <http://example.org/> .\nex:s ex:p 42 .\n',
+    'ex:s ex:p "undefined prefix" .\n',
+])
+def test_read_lines_rejects_non_flat_turtle(data):
+    with pytest.raises(ICDD._NotLineBased):
+        read_lines(data)
+
+
+def test_non_flat_turtle_falls_back_to_rdflib(tmp_path):
+    linkset, documents = awkward_linkset()
+    graph = linkset._add_triples(Graph())
+    # rdflib's pretty Turtle groups predicates with ';', which the line reader does not take
+    data = graph.serialize(format='turtle', encoding='utf-8')
+    with pytest.raises(ICDD._NotLineBased):
+        ICDD._read_lines(io.BytesIO(data), lambda s, p, o: None)
+    path = tmp_path / 'linkset.ttl'
+    path.write_bytes(data)
+    for source in (str(path), io.BytesIO(data)):
+        parsed = ICDD.Linkset()
+        parsed.parse(source, format='ttl', documents=documents)
+        assert rows(parsed) == rows(linkset)
+
+
+def test_copy_member_raw(tmp_path):
+    source_path, target_path = str(tmp_path / 'source.zip'), str(tmp_path / 'target.zip')
+    with zipfile.ZipFile(source_path, 'w') as archive:
+        archive.writestr('folder/', b'')
+        archive.writestr(zipfile.ZipInfo('deflated.txt'), b'deflated ' * 10000, compress_type=zipfile.ZIP_DEFLATED)
+        archive.writestr(zipfile.ZipInfo('stored.bin'), bytes(range(256)) * 100, compress_type=zipfile.ZIP_STORED)
+        # written through a stream: sizes in a data descriptor after the data
+        with archive.open('streamed.txt', 'w') as member: member.write(b'streamed ' * 5000)
+    with zipfile.ZipFile(source_path) as source, zipfile.ZipFile(target_path, 'w') as target:
+        for info in source.infolist(): ICDD._copy_member_raw(source, target, info, chunk_size=1000)
+        target.writestr('after.txt', b'written after the copies')
+    with zipfile.ZipFile(source_path) as source, zipfile.ZipFile(target_path) as target:
+        assert target.testzip() is None
+        assert target.namelist() == source.namelist() + ['after.txt']
+        for info in source.infolist():
+            copied = target.getinfo(info.filename)
+            assert (copied.compress_type, copied.compress_size, copied.CRC) == (info.compress_type, info.compress_size, info.CRC)
+            assert target.read(info.filename) == source.read(info.filename)
+
+
+def test_save_rewrites_only_what_changed(tmp_path):
+    container = build_container(tmp_path, links=20)
+    container.create(str(tmp_path), direct=True)
+    icdd_path = str(tmp_path / (container.container_id + '.icdd'))
+    with zipfile.ZipFile(icdd_path) as archive: before = {info.filename: info for info in archive.infolist()}
+
+    opened = ICDD.Container()
+    opened.open(icdd_path, str(tmp_path / 'open') + '/')
+    assert not opened.dirty
+    linkset = opened.linksets[0]
+    document = opened.documents[0]
+    linkset.add_link(ICDD.Link(ICDD.LinkElement(document, ICDD.URIBasedIdentifier('http://example.org/new')), ICDD.LinkElement(document)))
+    payload = tmp_path / 'new.txt'
+    payload.write_text('a new payload')
+    opened.add_document(ICDD.InternalDocument(path=str(payload)))
+    assert opened.dirty
+    saved_path = str(tmp_path / 'saved.icdd')
+    opened.save(saved_path)
+
+    linkset_member = 'Payload triples/' + str(linkset.id) + '.ttl'
+    with zipfile.ZipFile(saved_path) as archive:
+        assert archive.testzip() is None
+        after = {info.filename: info for info in archive.infolist()}
+    assert set(after) == set(before) | {'Payload documents/new.txt'}
+    for name, info in before.items():
+        if name in ('index.ttl', linkset_member): continue
+        assert (after[name].compress_type, after[name].compress_size, after[name].CRC) == (info.compress_type, info.compress_size, info.CRC)
+    assert after[linkset_member].CRC != before[linkset_member].CRC
+
+    reopened = ICDD.Container()
+    reopened.open(saved_path, str(tmp_path / 'reopen') + '/')
+    assert len(reopened.documents) == 3
+    assert len(reopened.linksets[0].links) == 21
+    assert reopened.modification_date is not None
+
+
+@pytest.mark.parametrize('edit', ['pop_add', 'replace', 'reorder', 'assign'])
+def test_save_after_an_edit_that_keeps_the_link_count(tmp_path, edit):
+    container = build_container(tmp_path, links=20)
+    container.create(str(tmp_path), direct=True)
+    icdd_path = str(tmp_path / (container.container_id + '.icdd'))
+    opened = ICDD.Container()
+    opened.open(icdd_path, str(tmp_path / 'open') + '/')
+    linkset, document = opened.linksets[0], opened.documents[0]
+    new = ICDD.Link(ICDD.LinkElement(document, ICDD.URIBasedIdentifier('http://example.org/new')), ICDD.LinkElement(document))
+    removed = linkset.links[0].id
+    if edit == 'pop_add':
+        linkset.links.pop(0)
+        linkset.add_link(new)
+    elif edit == 'replace': linkset.links[0] = new
+    elif edit == 'reorder':
+        linkset.links.reverse()
+        new, removed = None, None
+    else: linkset.links = [new] + linkset.links[1:]
+    assert linkset.dirty and opened.dirty
+    expected = [str(link.id) for link in linkset.links]
+    opened.save()
+
+    reopened = ICDD.Container()
+    reopened.open(icdd_path, str(tmp_path / 'reopen') + '/')
+    ids = {str(link.id) for link in reopened.linksets[0].links}
+    assert ids == set(expected) and len(ids) == 20
+    if new is not None: assert str(new.id) in ids and str(removed) not in ids
+    assert not reopened.dirty
+
+
+def test_checksum_cache_follows_size_and_mtime(tmp_path, monkeypatch):
+    path = tmp_path / 'payload.bin'
+    path.write_bytes(b'first')
+    reads = []
+    copy_hashing = ICDD._copy_hashing
+    monkeypatch.setattr(ICDD, '_copy_hashing', lambda *args, **kwargs: reads.append(1) or copy_hashing(*args, **kwargs))
+    first = ICDD.file_checksum(str(path))
+    assert ICDD.file_checksum(str(path)) == first and len(reads) == 1
+    # same size, new modification time
+    stat = os.stat(path)
+    path.write_bytes(b'other')
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    second = ICDD.file_checksum(str(path))
+    assert second != first and len(reads) == 2
+    # new size, modification time put back
+    path.write_bytes(b'longer payload')
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert ICDD.file_checksum(str(path)) == hashlib.sha256(b'longer payload').hexdigest() and len(reads) == 3
+
+
+def test_linkset_cache_follows_the_member(tmp_path):
+    container = build_container(tmp_path, links=20)
+    container.create(str(tmp_path), direct=True)
+    icdd_path = str(tmp_path / (container.container_id + '.icdd'))
+    ICDD.set_linkset_cache(str(tmp_path / 'cache'))
+    try:
+        opened = ICDD.Container()
+        opened.open(icdd_path, str(tmp_path / 'first') + '/')
+        assert os.listdir(tmp_path / 'cache')
+        cached = ICDD.Container()
+        cached.open(icdd_path, str(tmp_path / 'second') + '/')
+        assert rows(cached.linksets[0]) == rows(opened.linksets[0])
+        # an edited linkset member is decoded again, not taken from the cache
+        linkset, document = cached.linksets[0], cached.documents[0]
+        linkset.add_link(ICDD.Link(ICDD.LinkElement(document, ICDD.URIBasedIdentifier('http://example.org/new')), ICDD.LinkElement(document)))
+        cached.save()
+        reopened = ICDD.Container()
+        reopened.open(icdd_path, str(tmp_path / 'third') + '/')
+        assert rows(reopened.linksets[0]) == rows(linkset) and len(reopened.linksets[0].links) == 21
+    finally: ICDD.set_linkset_cache(None)
+
+
+def test_disk_backed_linkset_matches_the_in_memory_one(tmp_path):
+    container = build_container(tmp_path, links=20)
+    memory, documents = container.linksets[0], container.documents
+    disk = ICDD.Linkset(storage=str(tmp_path / 'links.sqlite'))
+    for link in memory.links: disk.add_link(link)
+    assert rows(disk) == rows(memory) and len(disk.links) == 20
+    ids = lambda links: sorted(str(link.id) for link in links)
+    assert ids(disk.get_links_by_document(documents[0])) == ids(memory.get_links_by_document(documents[0]))
+    container.add_linkset(disk)
+    container.create(str(tmp_path), direct=True)
+    icdd_path = str(tmp_path / (container.container_id + '.icdd'))
+
+    # after a save, the linkset reads back the same whether it is opened in memory or on disk
+    opened = ICDD.Container()
+    opened.open(icdd_path, str(tmp_path / 'open') + '/', storage=str(tmp_path / 'storage'))
+    linkset = next(linkset for linkset in opened.linksets if str(linkset.id) == str(disk.id))
+    linkset.add_link(ICDD.Link(ICDD.LinkElement(opened.documents[0], ICDD.URIBasedIdentifier('http://example.org/new')),
+                               ICDD.LinkElement(opened.documents[1])))
+    assert linkset.dirty
+    opened.save()
+    for linkset in opened.linksets: linkset.close()
+    on_disk, in_memory = ICDD.Container(), ICDD.Container()
+    on_disk.open(icdd_path, str(tmp_path / 'disk') + '/', storage=str(tmp_path / 'storage'))
+    in_memory.open(icdd_path, str(tmp_path / 'memory') + '/')
+    assert [rows(linkset) for linkset in on_disk.linksets] == [rows(linkset) for linkset in in_memory.linksets]
+    assert sorted(len(linkset.links) for linkset in in_memory.linksets) == [20, 21]
+    assert all(linkset.storage for linkset in on_disk.linksets) and not any(linkset.storage for linkset in in_memory.linksets)
+
+
+def test_add_links_matches_add_link(tmp_path):
+    documents = [ICDD.InternalDocument(path=str(tmp_path / f'doc{i}.txt')) for i in range(3)]
+    kinds, values, extras = ['uri', 'string', None, 'query'], ['http://example.org/a', 'GUID1', None, 'SELECT ?x'], [None, 'GlobalId', None, 'SPARQL']
+    columns = ICDD.Linkset()
+    ids = columns.add_links(documents[:2] * 2, documents[1:] + documents[:1] + documents[1:2], a_kinds=kinds, a_values=values,
+                            a_extras=extras, b_kinds='uri', b_values=['http://example.org/b'] * 4)
+    single = ICDD.Linkset()
+    for i, link in enumerate(columns.links):
+        identifier = {'uri': lambda: ICDD.URIBasedIdentifier(values[i]), 'string': lambda: ICDD.StringBasedIdentifier(values[i], extras[i]),
+                      'query': lambda: ICDD.QueryBasedIdentifier(extras[i], values[i]), None: lambda: None}[kinds[i]]()
+        single.add_link(ICDD.Link(ICDD.LinkElement(link.a.document, identifier), ICDD.LinkElement(link.b.document, ICDD.URIBasedIdentifier('http://example.org/b')), id=link.id))
+    assert [link.id for link in columns.links] == ids
+    # link element and identifier ids are generated by each linkset
+    strip = lambda linkset: [(str(row[0]), str(row[2]), row[4:7], str(row[8]), row[10:13]) for row in linkset._rows()]
+    assert strip(columns) == strip(single)
+    written = []
+    for linkset in (columns, single):
+        stream = io.BytesIO()
+        linkset.write(stream, format='nt')
+        written.append(len(Graph().parse(data=stream.getvalue(), format='nt')))
+    assert written[0] == written[1]
@@ -0,0 +1,46 @@
+import ICDD
+from conftest import build_container
+
+
+def test_get_document_by_id_after_remove_and_replace(tmp_path):
+    container = build_container(tmp_path, documents=3)
+    first, second, third = container.documents
+    assert container.get_document_by_id(first.id) is first
+    container.documents.remove(first)
+    assert container.get_document_by_id(first.id) is None
+    replacement = ICDD.InternalDocument(path=str(tmp_path / 'doc0.txt'))
+    container.documents[0] = replacement
+    assert container.get_document_by_id(second.id) is None
+    assert container.get_document_by_id(replacement.id) is replacement
+    assert container.get_document_by_id(third.id) is third
+    container.add_document(first)
+    assert container.get_document_by_id(first.id) is first
+    container.documents = [second]
+    assert container.get_document_by_id(second.id) is second and container.get_document_by_id(first.id) is None
+
+
+def test_link_lookups_after_remove_and_replace(tmp_path):
+    container = build_container(tmp_path, documents=2, links=6)
+    linkset = container.linksets[0]
+    uri = 'http://example.org/element/0'
+    found = linkset.get_links_by_identifier(uri)
+    assert found
+    for link in found: linkset.links.remove(link)
+    assert linkset.get_links_by_identifier(uri) == []
+
+    document = container.documents[0]
+    replacement = ICDD.Link(ICDD.LinkElement(document, ICDD.URIBasedIdentifier('http://example.org/replaced')), ICDD.LinkElement(document))
+    replaced = linkset.links[0]
+    before = linkset.get_links_by_document(document)
+    linkset.links[0] = replacement
+    assert linkset.get_links_by_identifier('http://example.org/replaced') == [replacement]
+    after = linkset.get_links_by_document(document)
+    assert replaced not in after and replacement in after
+    assert len(after) == len(before) - (replaced in before) + 1
+
+    # and kept up to date by add_link()
+    added = ICDD.Link(ICDD.LinkElement(document, ICDD.URIBasedIdentifier('http://example.org/added')), ICDD.LinkElement(document))
+    linkset.add_link(added)
+    assert linkset.get_links_by_identifier('http://example.org/added') == [added]
+    expected = {link.id for link in linkset.links if document in (link.a.document, link.b.document)}
+    assert {link.id for link in linkset.get_links_by_document(document)} == expected
@@ -0,0 +1,46 @@
+import zipfile
+
+import pytest
+
+import ICDD
+from conftest import build_container
+
+
+@pytest.mark.parametrize('direct', [True, False])
+def test_merge_lazily_opened_containers(tmp_path, direct):
+    container = build_container(tmp_path, documents=2, links=10)
+    container.create(str(tmp_path), direct=True)
+    old_path = str(tmp_path / (container.container_id + '.icdd'))
+
+    newer = ICDD.Container()
+    newer.open(old_path, str(tmp_path / 'newer') + '/')
+    payload = tmp_path / 'added.txt'
+    payload.write_text('added payload\n' * 50)
+    added = ICDD.InternalDocument(path=str(payload))
+    newer.add_document(added)
+    newer.linksets[0].add_link(ICDD.Link(ICDD.LinkElement(added, ICDD.URIBasedIdentifier('http://example.org/added')),
+                                         ICDD.LinkElement(newer.documents[0])))
+    new_path = str(tmp_path / 'new.icdd')
+    newer.save(new_path)
+
+    old, new = ICDD.Container(), ICDD.Container()
+    old.open(old_path, str(tmp_path / 'old_lazy') + '/', lazy=True)
+    new.open(new_path, str(tmp_path / 'new_lazy') + '/', lazy=True)
+    changes = old.diff(new, payloads=True)
+    assert changes['documents'].added == [str(added.id)] and changes['links'][str(container.linksets[0].id)].added
+
+    merged = old.merge(new)
+    merged.create(str(tmp_path / 'merged'), direct=direct)
+    old.close()
+    new.close()
+
+    merged_path = str(tmp_path / 'merged' / (merged.container_id + '.icdd'))
+    with zipfile.ZipFile(merged_path) as archive, zipfile.ZipFile(new_path) as source:
+        assert archive.testzip() is None
+        payloads = [name for name in source.namelist() if name.startswith('Payload documents/') and not name.endswith('/')]
+        assert len(payloads) == 3
+        for name in payloads: assert archive.read(name) == source.read(name)
+    reopened = ICDD.Container()
+    reopened.open(merged_path, str(tmp_path / 'reopen') + '/')
+    assert len(reopened.documents) == 3
+    assert len(reopened.linksets[0].links) == 11
@@ -0,0 +1,60 @@
+import os
+import zipfile
+
+import pytest
+from rdflib import Graph
+
+import ICDD
+from conftest import ONTOLOGIES, build_container
+
+
+def ontology_members(icdd_path):
+    with zipfile.ZipFile(icdd_path) as archive:
+        return {name: archive.read(name) for name in archive.namelist() if name.startswith('Ontology resources/') and not name.endswith('/')}
+
+
+@pytest.mark.parametrize('direct', [True, False])
+def test_create_writes_the_published_ontologies(tmp_path, direct):
+    container = build_container(tmp_path)
+    container.create(str(tmp_path), direct=direct)
+    members = ontology_members(str(tmp_path / (container.container_id + '.icdd')))
+    assert sorted(members) == ['Ontology resources/Container.ttl', 'Ontology resources/Linkset.ttl']
+    for name in ('Container', 'Linkset'):
+        written = Graph().parse(data=members['Ontology resources/' + name + '.ttl'], format='turtle')
+        assert written.isomorphic(Graph().parse(os.path.join(ONTOLOGIES, name + '.ttl'), format='turtle'))
+
+
+@pytest.mark.parametrize('direct', [True, False])
+def test_create_without_the_ontologies_writes_nothing(tmp_path, direct):
+    ICDD.set_ontology_cache_dir(None)
+    container = build_container(tmp_path)
+    with pytest.raises(FileNotFoundError, match='fetch_ontologies'):
+        container.create(str(tmp_path / 'out'), direct=direct)
+    assert not (tmp_path / 'out').exists()
+    with pytest.raises(FileNotFoundError):
+        container.container_ont
+
+
+def test_downloaded_ontologies_are_cached(tmp_path, monkeypatch):
+    downloads = []
+    def download(name):
+        downloads.append(name)
+        return Graph().parse(os.path.join(ONTOLOGIES, name + '.ttl'), format='turtle')
+    monkeypatch.setattr(ICDD, '_download_ontology', download)
+    cache = tmp_path / 'cache'
+    ICDD.set_ontology_cache_dir(str(cache))
+    graph = ICDD.get_ontology('Linkset')
+    assert ICDD.get_ontology('Linkset') is graph and downloads == ['Linkset']
+    assert (cache / 'Linkset.nt').is_file()
+    ICDD.set_ontology_cache_dir(str(cache))
+    assert ICDD.get_ontology('Linkset').isomorphic(graph) and downloads == ['Linkset']
+
+
+def test_repack_keeps_the_ontologies_of_the_source(tmp_path):
+    container = build_container(tmp_path)
+    container.create(str(tmp_path), direct=True)
+    icdd_path = str(tmp_path / (container.container_id + '.icdd'))
+    ICDD.set_ontology_cache_dir(None)
+    record, = ICDD.batch('repack', icdd_path, workers=1, output_dir=str(tmp_path / 'out'), rdf_format='nt')
+    assert record['ok'], record
+    assert ontology_members(record['output']) == ontology_members(icdd_path)
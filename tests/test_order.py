@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+
+import ICDD
+from conftest import build_container
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = '''
+import sys
+import ICDD
+container = ICDD.Container()
+container.open(sys.argv[1], sys.argv[2], lazy=sys.argv[3] == 'lazy')
+print(' '.join(str(document.id) for document in container.documents))
+print(' '.join(str(linkset.id) for linkset in container.linksets))
+'''
+
+
+def open_order(icdd_path, temp_path, lazy, seed):
+    result = subprocess.run([sys.executable, '-c', SCRIPT, icdd_path, temp_path, 'lazy' if lazy else 'full'], cwd=ROOT,
+                            env={**os.environ, 'PYTHONHASHSEED': str(seed)}, capture_output=True, text=True, check=True)
+    return result.stdout
+
+
+def test_open_order_is_deterministic(tmp_path):
+    container = build_container(tmp_path, documents=8, links=5, linksets=6)
+    container.create(str(tmp_path), direct=True)
+    icdd_path = str(tmp_path / (container.container_id + '.icdd'))
+    orders = {open_order(icdd_path, str(tmp_path / f'open{seed}') + '/', lazy, seed) for seed in range(4) for lazy in (False, True)}
+    assert len(orders) == 1
+    documents, linksets = orders.pop().splitlines()
+    assert documents.split() == sorted(str(document.id) for document in container.documents)
+    assert linksets.split() == sorted(str(linkset.id) for linkset in container.linksets)
+
+
+def test_open_order_with_workers(tmp_path):
+    container = build_container(tmp_path, documents=3, links=5, linksets=4)
+    container.create(str(tmp_path), direct=True)
+    icdd_path = str(tmp_path / (container.container_id + '.icdd'))
+    serial, pooled = ICDD.Container(), ICDD.Container()
+    serial.open(icdd_path, str(tmp_path / 'serial') + '/')
+    pooled.open(icdd_path, str(tmp_path / 'pooled') + '/', workers=2)
+    assert [str(linkset.id) for linkset in pooled.linksets] == [str(linkset.id) for linkset in serial.linksets]
+    assert [len(linkset.links) for linkset in pooled.linksets] == [5] * 4
+
+
+def test_iter_links_matches_open(tmp_path):
+    container = build_container(tmp_path, documents=3, links=200, linksets=3)
+    container.create(str(tmp_path), direct=True)
+    icdd_path = str(tmp_path / (container.container_id + '.icdd'))
+    opened = ICDD.Container()
+    opened.open(icdd_path, str(tmp_path / 'open') + '/')
+    side = lambda element: (str(element.document.id), type(element.identifier).__name__, getattr(element.identifier, 'uri', None),
+                            getattr(element.identifier, 'identifier', None), getattr(element.identifier, 'query_expression', None))
+    expected = {str(linkset.id): sorted((str(link.id), side(link.a), side(link.b)) for link in linkset.links) for linkset in opened.linksets}
+
+    for window in (1, 64):
+        streamed = {}
+        for linkset_id, link in ICDD.Container.iter_links(icdd_path, temp_path=str(tmp_path / 'stream') + '/', window=window):
+            streamed.setdefault(str(linkset_id), []).append((str(link.id), side(link.a), side(link.b)))
+        assert {linkset_id: sorted(links) for linkset_id, links in streamed.items()} == expected
+    selected = opened.linksets[1].id
+    assert sorted(str(link.id) for _, link in ICDD.Container.iter_links(icdd_path, selected)) == [row[0] for row in expected[str(selected)]]
+    assert not (tmp_path / 'stream').exists()
@@ -0,0 +1,17 @@
+from rdflib import Graph, Literal, URIRef
+
+import ICDD
+
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+
+
+def test_nt_lines_writes_valid_ntriples():
+    graph = Graph()
+    subject, predicate = URIRef('./container'), URIRef('http://example.org/p')
+    literals = [Literal('two\nlines, "quotes" and \\'), Literal('carriage\rreturn', datatype=URIRef(XSD + 'string')),
+                Literal('hello', lang='en'), Literal('2024-01-01T00:00:00', datatype=URIRef(XSD + 'dateTime'))]
+    for literal in literals: graph.add((subject, predicate, literal))
+    data = ''.join(ICDD._nt_lines(graph, base='file:///root/'))
+    parsed = Graph().parse(data=data, format='nt')
+    assert set(parsed.subjects()) == {URIRef('file:///root/container')}
+    assert sorted(parsed.objects()) == sorted(literals)
@@ -0,0 +1,161 @@
+import zipfile
+
+import pytest
+from rdflib import BNode, Graph, Literal, URIRef
+
+import ICDD
+from conftest import build_container
+
+CT = ICDD.CONTAINER_NAMESPACE
+LS = ICDD.LINKSET_NAMESPACE
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+RDF_TYPE = URIRef('http://www.w3.org/1999/02/22-rdf-syntax-ns#type')
+
+
+@pytest.fixture
+def icdd_path(tmp_path):
+    container = build_container(tmp_path, documents=2, links=6)
+    container.version_id = '1.0'
+    container.create(str(tmp_path), direct=True)
+    return str(tmp_path / (container.container_id + '.icdd'))
+
+
+def edited(icdd_path, member_prefix, edit, drop=False):
+    """A copy of the archive with `edit(graph)` applied to its index or (first) linkset file, or that file dropped."""
+    target = icdd_path[:-len('.icdd')] + '-edited.icdd'
+    with zipfile.ZipFile(icdd_path) as source, zipfile.ZipFile(target, 'w') as archive:
+        done = False
+        for info in source.infolist():
+            data = source.read(info)
+            if not done and info.filename.startswith(member_prefix) and not info.is_dir():
+                done = True
+                if drop: continue
+                graph = Graph().parse(data=data, format='turtle', publicID='file:///')
+                edit(graph)
+                data = graph.serialize(format='turtle', encoding='utf-8')
+            archive.writestr(info, data)
+    assert done
+    return target
+
+
+def messages(path):
+    return [str(violation) for violation in ICDD.validate_container(path)]
+
+
+def first(graph, cls):
+    return next(iter(graph.subjects(RDF_TYPE, URIRef(cls))))
+
+
+def test_library_output_is_valid(icdd_path):
+    assert messages(icdd_path) == []
+
+
+def test_needs_the_published_ontologies(tmp_path):
+    container = build_container(tmp_path)
+    container.create(str(tmp_path), direct=True)
+    ICDD.set_ontology_cache_dir(None)
+    with pytest.raises(FileNotFoundError):
+        ICDD.validate_container(str(tmp_path / (container.container_id + '.icdd')))
+
+
+def test_container_version_is_unknown(icdd_path):
+    path = edited(icdd_path, 'index.ttl', lambda graph: graph.add((URIRef('file:///'), URIRef(CT + 'version'), Literal('1.0'))))
+    assert messages(path) == ['index.ttl: file:///: unknown property container:version']
+
+
+def test_wrong_datatypes(icdd_path):
+    def edit(graph):
+        description = URIRef('file:///')
+        graph.remove((description, URIRef(CT + 'creationDate'), None))
+        graph.add((description, URIRef(CT + 'creationDate'), Literal('yesterday', datatype=URIRef(XSD + 'string'))))
+        graph.add((description, URIRef(CT + 'modificationDate'), Literal('soon', datatype=URIRef(XSD + 'dateTime'))))
+        document = first(graph, CT + 'InternalDocument')
+        graph.remove((document, URIRef(CT + 'filename'), None))
+        graph.add((document, URIRef(CT + 'filename'), URIRef('http://example.org/not-a-literal')))
+    found = messages(edited(icdd_path, 'index.ttl', edit))
+    assert "index.ttl: file:///: container:creationDate value 'yesterday' is not an xsd:dateTime" in found
+    assert "index.ttl: file:///: container:modificationDate value 'soon' is not a valid xsd:dateTime" in found
+    assert any(message.endswith("container:filename has the resource 'http://example.org/not-a-literal' as value, not a literal") for message in found)
+    assert len(found) == 3
+
+
+def test_three_element_link(icdd_path):
+    def edit(graph):
+        link = first(graph, LS + 'Link')
+        element = URIRef('file:///extra-element')
+        graph.add((element, RDF_TYPE, URIRef(LS + 'LinkElement')))
+        graph.add((element, URIRef(LS + 'hasDocument'), next(graph.objects(None, URIRef(LS + 'hasDocument')))))
+        graph.add((link, URIRef(LS + 'hasLinkElement'), element))
+    found = messages(edited(icdd_path, 'Payload triples/', edit))
+    assert len(found) == 1 and found[0].endswith('has 3 link elements, only binary links are supported')
+
+
+def test_one_element_link(icdd_path):
+    def edit(graph):
+        link = first(graph, LS + 'Link')
+        graph.remove((link, URIRef(LS + 'hasLinkElement'), next(graph.objects(link, URIRef(LS + 'hasLinkElement')))))
+    found = messages(edited(icdd_path, 'Payload triples/', edit))
+    assert len(found) == 1 and found[0].endswith('has 1 linkset:hasLinkElement, expected at least 2')
+
+
+def test_missing_linkset_member(icdd_path):
+    found = messages(edited(icdd_path, 'Payload triples/', None, drop=True))
+    assert len(found) == 1 and found[0].startswith('index.ttl: ') and found[0].endswith('is not in the archive')
+
+
+def test_classes_and_ranges(icdd_path):
+    def edit(graph):
+        document = first(graph, CT + 'InternalDocument')
+        graph.add((document, RDF_TYPE, URIRef(CT + 'ExternalDocument')))
+        graph.add((URIRef('file:///'), URIRef(CT + 'containsDocument'), URIRef('file:///not-a-document')))
+        graph.add((URIRef('file:///not-a-document'), RDF_TYPE, URIRef(CT + 'Linkset')))
+        graph.add((BNode(), RDF_TYPE, URIRef(CT + 'NoSuchClass')))
+    found = messages(edited(icdd_path, 'index.ttl', edit))
+    assert any(message.endswith('is both a container:InternalDocument and a container:ExternalDocument') for message in found)
+    assert 'index.ttl: not-a-document: is the container:containsDocument of another node but not a container:Document' in found
+    assert any(message.endswith('unknown class container:NoSuchClass') for message in found)
+
+
+def test_open_validate(icdd_path, tmp_path):
+    path = edited(icdd_path, 'Payload triples/', None, drop=True)
+    with pytest.raises(ValueError, match='is not in the archive'):
+        ICDD.Container().open(path, str(tmp_path / 'open') + '/', validate=True)
+
+
+def test_union_domain(icdd_path):
+    edit = lambda graph: graph.add((URIRef('file:///'), URIRef(CT + 'filename'), Literal('stray.txt')))
+    found = messages(edited(icdd_path, 'index.ttl', edit))
+    assert found == ['index.ttl: file:///: has container:filename but is not a container:InternalDocument or a container:Linkset']
+
+
+SCHEMA = '''@prefix ex: <http://example.org/#> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+
+ex:A a owl:Class ; rdfs:subClassOf ex:Base ,
+    [ a owl:Restriction ; owl:onProperty ex:part ; owl:minQualifiedCardinality "2"^^xsd:nonNegativeInteger ; owl:onClass ex:Base ] ,
+    [ a owl:Restriction ; owl:onProperty ex:part ; owl:maxQualifiedCardinality "1"^^xsd:nonNegativeInteger ; owl:onClass ex:Special ] ,
+    [ a owl:Restriction ; owl:onProperty ex:label ; owl:qualifiedCardinality "1"^^xsd:nonNegativeInteger ; owl:onDataRange xsd:string ] ,
+    [ a owl:Restriction ; owl:onProperty ex:label ; owl:maxQualifiedCardinality "0"^^xsd:nonNegativeInteger ; owl:onDataRange xsd:integer ] .
+ex:B a owl:Class ; rdfs:subClassOf ex:Base .
+ex:Base a owl:Class .
+ex:Special a owl:Class ; rdfs:subClassOf ex:A .
+[] a owl:AllDisjointClasses ; owl:members ( ex:A ex:B ex:Special ) .
+
+ex:part a owl:ObjectProperty ; rdfs:domain ex:Base , [ owl:unionOf ( ex:A ex:B ) ] ; rdfs:range [ owl:unionOf ( ex:A ex:B ) ] .
+ex:label a owl:DatatypeProperty ; rdfs:domain ex:A ; rdfs:domain ex:Base ; rdfs:range xsd:string .
+'''
+
+
+def test_schema_shapes():
+    schema = ICDD._Schema([Graph().parse(data=SCHEMA, format='turtle')])
+    ex = 'http://example.org/#'
+    # every domain is kept, a union is one alternative
+    assert set(schema.domains[ex + 'part']) == {frozenset({ex + 'Base'}), frozenset({ex + 'A', ex + 'B'})}
+    assert set(schema.domains[ex + 'label']) == {frozenset({ex + 'A'}), frozenset({ex + 'Base'})}
+    assert schema.ranges[ex + 'part'] == [frozenset({ex + 'A', ex + 'B'})]
+    assert schema.datatypes == {ex + 'label': XSD + 'string'}
+    # qualified restrictions on a class or datatype every value has are checked, the others skipped
+    assert schema.cardinalities[ex + 'A'] == {ex + 'part': (2, None), ex + 'label': (1, 1)}
+    assert {(ex + 'A', ex + 'B'), (ex + 'A', ex + 'Special'), (ex + 'B', ex + 'Special')} <= schema.disjoint